@@ -0,0 +1,18 @@
+"""Figures for papers and presentations.
+
+Submodules are imported on first access, so that importing the package does not import
+matplotlib until they are used.
+"""
+import importlib
+
+__all__ = ['batch', 'makefig']
+
+
+def __getattr__(name: str):
+    if name in __all__:
+        return importlib.import_module(f'{__name__}.{name}')
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
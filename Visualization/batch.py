@@ -0,0 +1,177 @@
+"""Render the figures of many records to files on a process pool.
+
+Each worker creates one figure per kind of plot and reuses it for all the records it renders:
+the data of the lines or images is replaced, and the axes, labels and color bar are kept.
+"""
+import multiprocessing
+import os
+import time
+
+import numpy as np
+from matplotlib.image import AxesImage
+
+from Visualization import makefig
+
+KINDS = ('line', 'spectrogram', 'image')
+
+_worker = {}
+
+
+def _init_worker(config: dict):
+    _worker.clear()
+    _worker['config'] = config
+
+
+def _load(record: any) -> np.ndarray:
+    if isinstance(record, (str, os.PathLike)):
+        return np.load(record, mmap_mode='r')
+    return np.asarray(record)
+
+
+def _image(x: np.ndarray, config: dict) -> tuple:
+    """Return the image of a record and its coordinates."""
+    if config['kind'] == 'image':
+        return x, np.arange(x.shape[1]), np.arange(x.shape[0])
+    from signal_processing import signal
+    img = signal.stft(x, config['winsize'], config['overlap'], config['nfft'])
+    shift = int(config['winsize'] - int(config['winsize'] * config['overlap']))
+    return img, np.arange(img.shape[1]) * shift / config['fs'], np.arange(img.shape[0]) * config['fs'] / config['nfft']
+
+
+def _draw(x: np.ndarray, config: dict):
+    """Draw a record into a new figure and return the template holding its artists."""
+    if config['kind'] == 'line':
+        fig, ax = makefig.figure1d()
+        lines = makefig.draw1d(ax, x, config['fs'], **config['kwargs'])
+        return {'fig': fig, 'ax': ax, 'artist': lines[0]}
+    fig, ax, cax = makefig.figure2d()
+    mappable = makefig.draw2d(ax, cax, *_image(x, config), **config['kwargs'])
+    return {'fig': fig, 'ax': ax, 'cax': cax, 'artist': mappable}
+
+
+def _update(template: dict, x: np.ndarray, config: dict) -> bool:
+    """Replace the data of the template by a record. Return False if the figure must be drawn again."""
+    ax = template['ax']
+    if config['kind'] == 'line':
+        t = np.linspace(0, len(x) / config['fs'], len(x))
+        xlim = config['kwargs'].get('xlim') or (t[0], t[-1])
+        n_pixels = int(np.ceil(ax.get_window_extent().width)) if config['kwargs'].get('decimate', True) else len(x)
+        template['artist'].set_data(*makefig.m4(*makefig._visible(t, x, xlim), n_pixels))
+        ax.set_xlim(xlim)
+        ax.relim()
+        ax.autoscale_view(scalex=False)
+        return True
+    img, _, _, extent = makefig._image_grid(ax, *_image(x, config), config['kwargs'].get('downsample', True))
+    if extent is None or not isinstance(template['artist'], AxesImage):
+        return False
+    template['artist'].set_data(img)
+    template['artist'].set_extent(extent)
+    template['artist'].autoscale()
+    return True
+
+
+def _render(task: tuple) -> str:
+    name, record = task
+    config = _worker['config']
+    x = _load(record)
+    path = os.path.join(config['out_dir'], f'{name}.{config["fmt"]}')
+    with makefig.style(**config['kwargs']):
+        template = _worker.get('template')
+        if template is None or not config['reuse'] or not _update(template, x, config):
+            template = _worker['template'] = _draw(x, config)
+        template['fig'].savefig(path, dpi=config['dpi'])
+    return path
+
+
+def render_batch(
+        records: list,
+        out_dir: str,
+        kind: str = 'line',
+        fmt: str = 'png',
+        names: list = None,
+        fs: int = 128,
+        winsize: float = 16,
+        overlap: float = 0.92,
+        nfft: int = 128,
+        dpi: int = 100,
+        reuse: bool = True,
+        n_workers: int = None,
+        chunksize: int = 4,
+        **kwargs
+) -> dict:
+    """Render one figure per record to files, on a process pool.
+
+    Parameters
+    ----------
+    records: list
+        1-D signals ('line' and 'spectrogram') or 2-D images ('image'), as arrays or paths of .npy files,
+        which the workers memory-map.
+
+    out_dir: str
+        Directory the figures are written to, created if it does not exist.
+
+    kind: str, optional
+        'line' for makefig.draw1d of the signal, 'spectrogram' for makefig.draw2d of its STFT,
+        or 'image' for makefig.draw2d of the record. Defaults to 'line'.
+
+    fmt: str, optional
+        File format, such as 'png' or 'pdf'. Defaults to 'png'.
+
+    names: list, optional
+        File name of each figure, without extension. Defaults to the names of the .npy files,
+        or to record_00000, record_00001, ... for arrays.
+
+    fs: int, optional
+        Sampling frequency. Defaults to 128.
+
+    winsize, overlap, nfft: optional
+        STFT parameters of 'spectrogram', as signal_processing.signal.stft.
+
+    dpi: int, optional
+        Resolution of raster formats. Defaults to 100.
+
+    reuse: bool, optional
+        If True (default), each worker keeps its figure and only replaces the data between records.
+        Images whose grid is not uniform are drawn again.
+
+    n_workers: int, optional
+        Number of worker processes. Defaults to os.cpu_count(). With 1, figures are rendered in this process.
+
+    chunksize: int, optional
+        Number of records sent to a worker at a time. Defaults to 4.
+
+    kwargs: properties, optional
+        Format of the figures, as makefig.draw1d, makefig.draw2d and makefig.style.
+
+    Returns
+    -------
+    report: dict
+        'paths' of the figures, 'n_figures', 'seconds' and 'figures_per_second'.
+    """
+    assert kind in KINDS, f"kind must be one of {KINDS}."
+    if names is None:
+        names = [os.path.splitext(os.path.basename(r))[0] if isinstance(r, (str, os.PathLike)) else f'record_{i:05d}'
+                 for i, r in enumerate(records)]
+    assert len(names) == len(records), "names and records must have the same length."
+    if kind == 'spectrogram':
+        kwargs.setdefault('ylabel', 'Frequency [Hz]')
+    os.makedirs(out_dir, exist_ok=True)
+    config = {'kind': kind, 'fmt': fmt, 'out_dir': out_dir, 'fs': fs, 'winsize': winsize, 'overlap': overlap,
+              'nfft': nfft, 'dpi': dpi, 'reuse': reuse, 'kwargs': kwargs}
+    tasks = list(zip(names, records))
+    n_workers = os.cpu_count() if n_workers is None else n_workers
+
+    start = time.perf_counter()
+    if n_workers == 1:
+        _init_worker(config)
+        try:
+            paths = [_render(task) for task in tasks]
+        finally:
+            _worker.clear()
+    else:
+        ctx = multiprocessing.get_context('spawn')  # TensorFlow is not fork-safe
+        with ctx.Pool(n_workers, initializer=_init_worker, initargs=(config,)) as pool:
+            paths = pool.map(_render, tasks, chunksize=chunksize)
+    seconds = time.perf_counter() - start
+    return {'paths': paths, 'n_figures': len(paths), 'seconds': seconds,
+            'figures_per_second': len(paths) / seconds if seconds > 0 else float('inf')}
@@ -1,7 +1,18 @@
+import matplotlib
 import matplotlib.pyplot as plt
 import warnings
 import numpy as np
 import copy
+from matplotlib.figure import Figure
+from matplotlib.ticker import FormatStrFormatter
+
+_M4_POINTS = 4  # points kept per pixel column by m4
+
+FIGSIZE_1D = (10, 3)
+AXES_1D = (.092, .22, .887, .75)
+FIGSIZE_2D = (10, 3.5)
+AXES_2D = (.092, .184, .887, .57)
+COLORBAR_2D = (.092, .77, .887, .0185)
 
 
 def figsizepx(width: int, height: int, dpi: int = 100) -> tuple:
@@ -28,28 +39,52 @@ def figsizepx(width: int, height: int, dpi: int = 100) -> tuple:
     ax_margin_inch = (0.5, 0.5, 0.5, 0.5)  # Left,Top,Right,Bottom [inch]
     fig_w_inch = ax_w_inch + ax_margin_inch[0] + ax_margin_inch[2]
     fig_h_inch = ax_h_inch + ax_margin_inch[1] + ax_margin_inch[3]
-    return tuple(fig_w_inch, fig_h_inch)
+    return fig_w_inch, fig_h_inch
 
 
-def set_rc(**kwargs):
-    if kwargs.get('fontsize') is not None and isinstance(kwargs.get('fontsize'), int):
-        plt.rcParams['font.size'] = kwargs.get('fontsize')
-    else:
-        plt.rcParams['font.size'] = 20
+def rc_params(**kwargs) -> dict:
+    """Return the rcParams of the journal format.
 
-    if kwargs.get('fontname') is not None and isinstance(kwargs.get('fontname'), str):
-        plt.rcParams['font.family'] = kwargs.get('fontname')
-    else:
-        plt.rcParams['font.family'] = "Times New Roman"
+    Parameters
+    ----------
+    kwargs: properties, optional
+        fontsize (defaults to 20), fontname (defaults to "Times New Roman"),
+        xtick_direction and ytick_direction (default to "in").
 
+    Returns
+    -------
+    rc: dict
+        rcParams, to be used with matplotlib.rc_context or style.
+    """
+    rc = {'font.size': 20, 'font.family': "Times New Roman", 'xtick.direction': "in", 'ytick.direction': "in"}
+    if kwargs.get('fontsize') is not None and isinstance(kwargs.get('fontsize'), int):
+        rc['font.size'] = kwargs.get('fontsize')
+    if kwargs.get('fontname') is not None and isinstance(kwargs.get('fontname'), str):
+        rc['font.family'] = kwargs.get('fontname')
     if kwargs.get('xtick_direction') is not None and isinstance(kwargs.get('xtick_direction'), str):
-        plt.rcParams['xtick.direction'] = str(kwargs.get('xtick_direction'))
-    else:
-        plt.rcParams['xtick.direction'] = "in"
+        rc['xtick.direction'] = str(kwargs.get('xtick_direction'))
     if kwargs.get('ytick_direction') is not None and isinstance(kwargs.get('ytick_direction'), str):
-        plt.rcParams['ytick.direction'] = str(kwargs.get('ytick_direction'))
-    else:
-        plt.rcParams['ytick.direction'] = "in"
+        rc['ytick.direction'] = str(kwargs.get('ytick_direction'))
+    return rc
+
+
+def style(**kwargs):
+    """Return a context manager applying the journal format, restoring the rcParams on exit.
+
+    Text is laid out when a figure is drawn, so figures should be both created and saved inside the context.
+
+    Examples
+    --------
+    >>> with makefig.style(fontsize=16):
+    ...     fig, ax = makefig.figure1d()
+    ...     makefig.draw1d(ax, x, fs=128)
+    ...     fig.savefig('record.png')
+    """
+    return matplotlib.rc_context(rc_params(**kwargs))
+
+
+def set_rc(**kwargs):
+    plt.rcParams.update(rc_params(**kwargs))
 
     if kwargs.get('no_warnings') is not None and type(kwargs.get('no_warnings')) == bool:
         if kwargs.get('no_warnings'):
@@ -82,11 +117,158 @@ def close_all():
     plt.close()
 
 
-def plot1d_journal(x: any, fs: int = 128, **kwargs):
-    """Plot x in line with format of journal.
+def use_headless():
+    """Switch pyplot to the non-interactive Agg backend, to render figures to files without a display."""
+    plt.switch_backend('Agg')
+
+
+def savefig(path: str, dpi: int = 100, **kwargs):
+    """Save the current figure to path and close it, so that rendering many figures does not accumulate them.
+
+    Parameters
+    ----------
+    path: str
+        Output file. The format is given by its extension, such as .png or .pdf.
+
+    dpi: int, optional
+        Resolution of raster formats. Defaults to 100.
+
+    kwargs: properties, optional
+        Passed to matplotlib.pyplot.savefig.
+    """
+    fig = plt.gcf()
+    fig.savefig(path, dpi=dpi, **kwargs)
+    plt.close(fig)
+
+
+def _visible(t: any, x: any, xlim: tuple) -> tuple:
+    """Return the samples of a line within xlim, and the sample beyond each limit, so the line reaches the edges.
+
+    Decimating only these samples keeps the extrema of a zoomed window.
+    """
+    t = np.asarray(t)
+    x = np.asarray(x)
+    start = max(int(np.searchsorted(t, min(xlim), 'left')) - 1, 0)
+    stop = min(int(np.searchsorted(t, max(xlim), 'right')) + 1, len(t))
+    return t[start:stop], x[start:stop]
+
+
+def m4(t: any, x: any, n_pixels: int) -> tuple:
+    """Decimate a line to the points that a plot n_pixels wide can show.
+
+    The samples are split into n_pixels buckets, and the first, last, minimum and maximum
+    samples of each bucket are kept (M4 aggregation). The line rasterized from the kept points
+    is the same as from all the points, for at most 4 * n_pixels points.
 
     Parameters
     ----------
+    t: any, array_like
+        1-D coordinates of the samples, increasing.
+
+    x: any, array_like
+        1-D samples.
+
+    n_pixels: int
+        Width of the plot area in pixels.
+
+    Returns
+    -------
+    t, x: ndarray
+        The kept coordinates and samples. The input is returned when it has at most 4 * n_pixels samples.
+    """
+    x = np.asarray(x)
+    t = np.asarray(t)
+    assert len(t) == len(x), "t and x must have the same length."
+    if len(x) <= _M4_POINTS * n_pixels:
+        return t, x
+    size = -(-len(x) // n_pixels)
+    n_full = len(x) // size
+    buckets = x[0:n_full * size].reshape(n_full, size)
+    starts = np.arange(n_full) * size
+    index = [starts, starts + size - 1, starts + np.argmin(buckets, axis=1), starts + np.argmax(buckets, axis=1)]
+    if n_full * size < len(x):
+        tail = x[n_full * size:]
+        index.append(n_full * size + np.array([0, len(tail) - 1, np.argmin(tail), np.argmax(tail)]))
+    index = np.unique(np.concatenate(index))
+    return t[index], x[index]
+
+
+def _bucket_mean(a: np.ndarray, n: int, axis: int) -> np.ndarray:
+    """Average a along axis over n buckets of consecutive elements."""
+    edges = np.linspace(0, a.shape[axis], n + 1).astype(int)[0:-1]
+    counts = np.diff(np.r_[edges, a.shape[axis]])
+    shape = [1] * a.ndim
+    shape[axis] = n
+    return np.add.reduceat(a, edges, axis=axis) / counts.reshape(shape)
+
+
+def _image_grid(ax, img: any, x: any, y: any, downsample: bool = True) -> tuple:
+    """Return img, x and y averaged down to the pixel size of ax, and the extent of the image if its grid is uniform."""
+    x, y, img = np.asarray(x, dtype=float), np.asarray(y, dtype=float), np.asarray(img)
+    if downsample:
+        extent = ax.get_window_extent()
+        if img.shape[1] > extent.width:
+            n = int(np.ceil(extent.width))
+            img, x = _bucket_mean(img, n, axis=1), _bucket_mean(x, n, axis=0)
+        if img.shape[0] > extent.height:
+            n = int(np.ceil(extent.height))
+            img, y = _bucket_mean(img, n, axis=0), _bucket_mean(y, n, axis=0)
+    dx, dy = np.diff(x), np.diff(y)
+    if len(x) > 1 and len(y) > 1 and np.allclose(dx, dx[0]) and np.allclose(dy, dy[0]):
+        return img, x, y, (x[0] - dx[0] / 2, x[-1] + dx[0] / 2, y[0] - dy[0] / 2, y[-1] + dy[0] / 2)
+    return img, x, y, None
+
+
+def figure1d() -> tuple:
+    """Create a figure for draw1d, without pyplot.
+
+    The figure is not managed by pyplot, so it is freed when it is no longer referenced
+    and it can be created in any thread. It should be created inside style.
+
+    Returns
+    -------
+    fig: matplotlib.figure.Figure
+        The figure.
+
+    ax: matplotlib.axes.Axes
+        The axis of the signal.
+    """
+    fig = Figure(figsize=FIGSIZE_1D)
+    return fig, fig.add_axes(AXES_1D)
+
+
+def figure2d() -> tuple:
+    """Create a figure for draw2d, without pyplot.
+
+    Returns
+    -------
+    fig: matplotlib.figure.Figure
+        The figure.
+
+    ax: matplotlib.axes.Axes
+        The axis of the image.
+
+    cax: matplotlib.axes.Axes
+        The axis of the color bar.
+
+    See Also
+    --------
+    figure1d: figure for draw1d.
+    """
+    fig = Figure(figsize=FIGSIZE_2D)
+    return fig, fig.add_axes(AXES_2D), fig.add_axes(COLORBAR_2D)
+
+
+def draw1d(ax, x: any, fs: int = 128, **kwargs) -> list:
+    """Plot x into ax in line with format of journal.
+
+    Only ax and its figure are modified, so figures can be drawn concurrently.
+
+    Parameters
+    ----------
+    ax: matplotlib.axes.Axes
+        Axis drawn into.
+
     x: any
         1D-data points.
 
@@ -94,55 +276,67 @@ def plot1d_journal(x: any, fs: int = 128, **kwargs):
         Sampling frequency. Defaults to 128.
 
     kwargs: properties, optional
+        decimate: if True (default), long signals are reduced by m4 to the points visible at the axis width.
 
+    Returns
+    -------
+    lines: list
+        The Line2D of x, followed by the one of x2 if given.
     """
-    set_rc(**kwargs)
     args = __general_kwargs(**kwargs)
     if args.get('label1') is None:
         args['label1'] = ''
 
-    plt.figure(figsize=(10, 3))
-    ax = plt.axes([.092, .22, .887, .75])
     if args.get('axis') is None:
         args['axis'] = np.linspace(0, len(x)/fs, len(x))
-    ax.plot(args['axis'], x, args['color'], linewidth=args['linewidth'],
-            label=args['label1'])
-
     if args.get('xlim') is None:
         args['xlim'] = (args['axis'][0], args['axis'][-1])
+    n_pixels = int(np.ceil(ax.get_window_extent().width)) if args.get('decimate', True) else len(x)
+    lines = ax.plot(*m4(*_visible(args['axis'], x, args['xlim']), n_pixels), args['color'],
+                    linewidth=args['linewidth'], label=args['label1'])
     ax.set_xlim(args['xlim'])
 
     ax.set_xlabel(args['xlabel'])
     ax.set_ylabel(args['ylabel'])
-    ax.xaxis.set_major_formatter(plt.FormatStrFormatter('%.f'))
-    ax.yaxis.set_major_formatter(plt.FormatStrFormatter('%.1f'))
+    ax.xaxis.set_major_formatter(FormatStrFormatter('%.f'))
+    ax.yaxis.set_major_formatter(FormatStrFormatter('%.1f'))
     ax.minorticks_on()
     if kwargs.get('grid'):
-        plt.grid()
+        ax.grid()
 
     if args.get('x2') is not None:
         if args.get('color2') is None:
             args['color2'] = 'r'
         if args.get('linewidth2') is None:
             args['linewidth2'] = copy.copy(args['linewidth'])
-        if args['label2'] is None:
+        if args.get('label2') is None:
             args['label2'] = ''
         if args.get('legend') is None:
             args['legend'] = True
 
-        ax.plot(np.linspace(0, len(x)/fs, len(x)), args['x2'], args['color2'], linewidth=args['linewidth2'],
-                label=args['label2'])
+        t2 = np.linspace(0, len(x)/fs, len(x))
+        lines += ax.plot(*m4(*_visible(t2, args['x2'], args['xlim']), n_pixels), args['color2'],
+                         linewidth=args['linewidth2'], label=args['label2'])
         if args['legend']:
-            plt.legend(loc='lower right',
-                       fancybox=False, edgecolor="black",
-                       borderpad=0.35, fontsize=17)
+            ax.legend(loc='lower right',
+                      fancybox=False, edgecolor="black",
+                      borderpad=0.35, fontsize=17)
+    return lines
 
 
-def plot2d_journal(img: any, x: any = None, y: any = None, **kwargs):
-    """Create a pseudo-color plot in line with format of journal.
+def draw2d(ax, cax, img: any, x: any = None, y: any = None, **kwargs):
+    """Create a pseudo-color plot into ax, with its color bar in cax, in line with format of journal.
+
+    Only ax, cax and their figure are modified, so figures can be drawn concurrently.
 
     Parameters
     ----------
+    ax: matplotlib.axes.Axes
+        Axis of the image.
+
+    cax: matplotlib.axes.Axes
+        Axis of the color bar.
+
     img: any
         A scalar 2-D array. The values will be color-mapped.
 
@@ -153,8 +347,14 @@ def plot2d_journal(img: any, x: any = None, y: any = None, **kwargs):
         1-D arrays or column vectors as coordinate y.
 
     kwargs: properties, optional
-    """
+        downsample: if True (default), img is averaged down to the pixel size of the axis.
+        Images on uniform grids are drawn with imshow, others with pcolormesh.
 
+    Returns
+    -------
+    mappable: matplotlib.image.AxesImage or matplotlib.collections.QuadMesh
+        The image.
+    """
     if x is None:
         x = np.linspace(0, img.shape[1], img.shape[1])
     if y is None:
@@ -163,27 +363,79 @@ def plot2d_journal(img: any, x: any = None, y: any = None, **kwargs):
     assert len(img.shape) == 2, "shape of argument img must be 2 dim."
     assert len(x) == img.shape[1] and len(y) == img.shape[0], "x or y dimensions did not match img."
 
-    set_rc(**kwargs)
     args = __general_kwargs(**kwargs)
 
     if args.get('clabel') is None:
         args['clabel'] = ''
 
-    plt.figure(figsize=(10, 3.5))
-    ax = plt.axes([.092, .184, .887, .57])
-    cax = plt.gcf().add_axes([.092, .77, .887, .0185])
-    mappable = ax.pcolor(x, y, img,
-                         shading='auto',
-                         cmap=args['cmap']
-                         )
+    img, x, y, extent = _image_grid(ax, img, x, y, args.get('downsample', True))
+    if extent is not None:
+        mappable = ax.imshow(img, cmap=args['cmap'], aspect='auto', origin='lower', interpolation='nearest',
+                             extent=extent)
+    else:
+        mappable = ax.pcolormesh(x, y, img, shading='auto', cmap=args['cmap'], rasterized=True)
     ax.set_xlabel(args['xlabel'])
     ax.set_ylabel(args['ylabel'])
-    ax.xaxis.set_major_formatter(plt.FormatStrFormatter('%.f'))
-    ax.yaxis.set_major_formatter(plt.FormatStrFormatter('%.f'))
-    cax.xaxis.set_major_formatter(plt.FormatStrFormatter('%.1f'))
+    ax.xaxis.set_major_formatter(FormatStrFormatter('%.f'))
+    ax.yaxis.set_major_formatter(FormatStrFormatter('%.f'))
+    cax.xaxis.set_major_formatter(FormatStrFormatter('%.1f'))
     ax.minorticks_on()
 
-    plt.colorbar(mappable=mappable, cax=cax, orientation='horizontal')
+    ax.figure.colorbar(mappable=mappable, cax=cax, orientation='horizontal')
     cax.tick_params(bottom=False, top=False, direction='out')
     cax.xaxis.set_ticks_position('top')
-    plt.title(args['clabel'], fontsize=18)
+    cax.set_title(args['clabel'], fontsize=18)
+    return mappable
+
+
+def plot1d_journal(x: any, fs: int = 128, **kwargs):
+    """Plot x in line with format of journal.
+
+    Parameters
+    ----------
+    x: any
+        1D-data points.
+
+    fs: int, optional
+        Sampling frequency. Defaults to 128.
+
+    kwargs: properties, optional
+        decimate: if True (default), long signals are reduced by m4 to the points visible at the axis width.
+
+    See Also
+    --------
+    draw1d: the same plot into given axes, without changing the global state of pyplot.
+    """
+    set_rc(**kwargs)
+    plt.figure(figsize=FIGSIZE_1D)
+    ax = plt.axes(AXES_1D)
+    draw1d(ax, x, fs, **kwargs)
+
+
+def plot2d_journal(img: any, x: any = None, y: any = None, **kwargs):
+    """Create a pseudo-color plot in line with format of journal.
+
+    Parameters
+    ----------
+    img: any
+        A scalar 2-D array. The values will be color-mapped.
+
+    x: any
+        1-D arrays or column vectors as coordinate x.
+
+    y: any
+        1-D arrays or column vectors as coordinate y.
+
+    kwargs: properties, optional
+        downsample: if True (default), img is averaged down to the pixel size of the axis.
+        Images on uniform grids are drawn with imshow, others with pcolormesh.
+
+    See Also
+    --------
+    draw2d: the same plot into given axes, without changing the global state of pyplot.
+    """
+    set_rc(**kwargs)
+    plt.figure(figsize=FIGSIZE_2D)
+    ax = plt.axes(AXES_2D)
+    cax = plt.gcf().add_axes(COLORBAR_2D)
+    draw2d(ax, cax, img, x, y, **kwargs)
@@ -0,0 +1,35 @@
+import os
+import tempfile
+
+import matplotlib.image
+import numpy as np
+
+from manage import testing
+from Visualization import batch
+
+
+class Tests(object):
+    def test_reuse(self):
+        records = [np.random.normal(0, 1, 128 * 60) * (i + 1) for i in range(3)]
+        for kind in ('line', 'spectrogram'):
+            with tempfile.TemporaryDirectory() as directory:
+                fresh = batch.render_batch(records, os.path.join(directory, 'fresh'), kind=kind, reuse=False,
+                                           n_workers=1, no_warnings=False)
+                reused = batch.render_batch(records, os.path.join(directory, 'reused'), kind=kind, n_workers=1,
+                                            no_warnings=False)
+                assert reused['n_figures'] == 3 and reused['figures_per_second'] > 0
+                for a, b in zip(fresh['paths'], reused['paths']):
+                    assert np.array_equal(matplotlib.image.imread(a), matplotlib.image.imread(b))
+
+    def test_pool(self):
+        with tempfile.TemporaryDirectory() as directory:
+            paths = []
+            for i in range(4):
+                paths.append(os.path.join(directory, f'r{i}.npy'))
+                np.save(paths[-1], np.random.rand(20, 30))
+            report = batch.render_batch(paths, os.path.join(directory, 'out'), kind='image', fmt='pdf', n_workers=2)
+            assert [os.path.basename(p) for p in report['paths']] == ['r0.pdf', 'r1.pdf', 'r2.pdf', 'r3.pdf']
+            assert all(os.path.getsize(p) > 0 for p in report['paths'])
+
+
+testing.do_test(Tests)
@@ -1 +1,63 @@
-from visualization import makefig
+import os
+import tempfile
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+from manage import testing
+from Visualization import makefig
+
+makefig.use_headless()
+
+
+class Tests(object):
+    def test_figsizepx(self):
+        assert makefig.figsizepx(800, 300) == (9., 4.)
+
+    def test_m4(self):
+        x = np.random.normal(0, 1, 10007)
+        t = np.arange(len(x))
+        td, xd = makefig.m4(t, x, 100)
+        assert len(xd) <= 4 * 101
+        assert np.all(np.diff(td) > 0)
+        assert xd.min() == x.min() and xd.max() == x.max()
+        assert td[0] == 0 and td[-1] == len(x) - 1
+        assert np.array_equal(x[td], xd)
+        short = x[0:50]
+        assert makefig.m4(t[0:50], short, 100)[1] is short
+
+    def test_zoom(self):
+        x = np.zeros(1000000)
+        x[500003] = 1  # a peak lost by decimating the whole signal to the axis width
+        fig, ax = makefig.figure1d()
+        line = makefig.draw1d(ax, x, fs=1000, xlim=(500, 501))[0]
+        t, y = line.get_data()
+        assert y.max() == 1 and 1000 <= len(y) <= 1003
+        assert t[0] < 500 and t[-1] > 501
+
+    def test_render(self):
+        with tempfile.TemporaryDirectory() as directory:
+            makefig.plot1d_journal(np.random.normal(0, 1, 100000), no_warnings=False)
+            makefig.savefig(os.path.join(directory, 'line.png'))
+            makefig.plot2d_journal(np.random.rand(65, 5000), no_warnings=False)
+            makefig.savefig(os.path.join(directory, 'image.png'))
+            makefig.plot2d_journal(np.random.rand(10, 20), np.sort(np.random.rand(20)), no_warnings=False)
+            makefig.savefig(os.path.join(directory, 'mesh.pdf'))
+            assert sorted(os.listdir(directory)) == ['image.png', 'line.png', 'mesh.pdf']
+
+    def test_state_free(self):
+        rc = dict(plt.rcParams)
+        figures = plt.get_fignums()
+        with tempfile.TemporaryDirectory() as directory:
+            with makefig.style(fontsize=12):
+                fig, ax = makefig.figure1d()
+                lines = makefig.draw1d(ax, np.random.normal(0, 1, 1000), x2=np.zeros(1000))
+                fig.savefig(os.path.join(directory, 'line.png'))
+                fig, ax, cax = makefig.figure2d()
+                makefig.draw2d(ax, cax, np.random.rand(10, 20))
+                fig.savefig(os.path.join(directory, 'image.png'))
+        assert len(lines) == 2
+        assert dict(plt.rcParams) == rc and plt.get_fignums() == figures
+
+
+testing.do_test(Tests)
@@ -0,0 +1,82 @@
+"""Compare the vectorized features against the former numba loop implementations.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_feature_extraction
+"""
+import timeit
+
+import numpy as np
+from numba import jit
+
+from signal_processing import feature_extraction, signal
+
+
+@jit
+def legacy_pse(spg, fmin=0, fmax=64):
+    se = np.zeros(spg.shape[1])
+    for i in range(spg.shape[0]):
+        p_k = spg[i, :] / np.sum(spg, axis=0)
+        p_k = np.where((p_k == 0), 0.0001, p_k)
+        se += p_k * np.log2(p_k)
+    return -se / np.log2(fmax + 1 - fmin)
+
+
+@jit
+def legacy_pcent(spg, fmin=0, fmax=64):
+    res = spg.shape[-2] // fmax
+    f = np.arange(spg.shape[-2], fmin+1, -res) - 1
+    den = np.sum(spg[0:-1, :], axis=0)
+    num = np.zeros_like(den)
+    for i in range(len(num)):
+        num[i] = np.sum(f*spg[0:-1, i], axis=0)
+    return num/den
+
+
+@jit
+def legacy_pflux(spg):
+    flux = np.zeros(spg.shape[-1])
+    for i in range(len(flux) - 1):
+        flux[i] = (np.sum(spg[:, i + 1]) - np.sum(spg[:, i])) ** 2
+    return flux
+
+
+@jit
+def legacy_zero_crossing(x, winsize=16, overlap=0.92):
+    overlaps = int(winsize * overlap)
+    zero_crossing_rate = np.zeros(int((len(x) - overlaps) / (winsize - overlaps)))
+    shift = int(winsize - overlaps)
+    for i in range(len(zero_crossing_rate)):
+        frame = x[shift * i:shift * i + int(winsize)]
+        next_frame = np.zeros_like(frame)
+        next_frame[1:-1] = frame[0:-2]
+        zero_crossing_rate[i] = 1/(2*len(frame)) * np.sum(np.abs(np.sign(frame)-np.sign(next_frame)))
+    return zero_crossing_rate
+
+
+def main(minutes: float = 10, fs: int = 128, repeat: int = 3):
+    x = np.random.normal(0, 1, int(minutes * 60 * fs))
+    spg = signal.stft(x)
+    print(f'spectrogram {spg.shape}, {minutes} min at {fs} Hz')
+    print(f'{"feature":<8}{"legacy [s]":>12}{"current [s]":>13}{"speedup":>10}')
+    for legacy, current in [(legacy_pse, feature_extraction.pse),
+                            (legacy_pcent, feature_extraction.pcent),
+                            (legacy_pflux, feature_extraction.pflux)]:
+        assert np.allclose(legacy(spg), current(spg), equal_nan=True)
+        t_legacy = min(timeit.repeat(lambda: legacy(spg), number=1, repeat=repeat))
+        t_current = min(timeit.repeat(lambda: current(spg), number=1, repeat=repeat))
+        print(f'{current.__name__:<8}{t_legacy:>12.4f}{t_current:>13.4f}{t_legacy / t_current:>9.1f}x')
+
+    winsizes = (16, 32, 64, 128, 256)
+    legacy_zero_crossing(x)
+    feature_extraction.zero_crossing(x)
+    assert np.array_equal(legacy_zero_crossing(x), feature_extraction.zero_crossing(x))
+    t_legacy = min(timeit.repeat(lambda: [legacy_zero_crossing(x, w) for w in winsizes], number=1, repeat=repeat))
+    t_current = min(timeit.repeat(lambda: feature_extraction.zero_crossing_sweep(x, winsizes), number=1,
+                                  repeat=repeat))
+    print(f'zero crossing sweep {winsizes}: legacy {t_legacy:.4f} s, current {t_current:.4f} s, '
+          f'{t_legacy / t_current:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""Benchmark suite of the signal processing and machine learning hot paths.
+
+Each case is timed (best of several runs) and its peak memory measured with tracemalloc,
+for every combination of recording duration and sampling frequency. Results are written to JSON
+and compared against a baseline; the exit status is 1 if a case regressed beyond the threshold.
+
+Run from the repository root::
+
+    python -m benchmarks.suite --output bench.json --save-baseline benchmarks/baseline.json
+    python -m benchmarks.suite --output bench.json --baseline benchmarks/baseline.json --threshold 0.2
+    python -m benchmarks.suite --durations 1 60 1440 --fs 128 256 500 --cases stft pse
+    python -m benchmarks.suite --cases stft --fft auto --fft-workers -1
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from machine_learning import preprocessing
+from signal_processing import feature_extraction, fft, signal, wavelet
+
+DURATIONS = (1, 60)  # minutes; pass 1440 for 24 h recordings
+FREQUENCIES = (128, 256, 500)
+SWEEP_WINSIZES = (8, 16, 32, 64)
+
+
+def _signal(n_samples: int) -> np.ndarray:
+    return np.random.RandomState(0).normal(0, 1, n_samples)
+
+
+def _spectrogram(n_samples: int, fs: int) -> tuple:
+    return signal.stft(_signal(n_samples)),
+
+
+def _lenet(n_samples: int, fs: int) -> tuple:
+    from machine_learning import convolutional_nn, inference
+    segments = preprocessing.seqseg(_signal(n_samples), length=10, fs=fs)[..., np.newaxis]
+    runner = inference.InferenceRunner(convolutional_nn.lenet_1d(input_shape=segments.shape[1:], num_of_class=2))
+    runner.predict(segments[0:1])
+    return runner, segments
+
+
+def _normalizer(x: np.ndarray, normalizer: type) -> np.ndarray:
+    norm = normalizer()
+    for chunk in np.array_split(x, 16):
+        norm.partial_fit(chunk)
+    return norm.transform(x)
+
+
+# name: (setup(n_samples, fs) -> args, function(*args), maximum number of samples or None)
+CASES = {
+    'stft': (lambda n, fs: (_signal(n),), signal.stft, None),
+    'ssa': (lambda n, fs: (_signal(n),), signal.ssa, 2 ** 15),
+    'diff': (lambda n, fs: (_signal(n),), signal.diff, None),
+    'pse': (_spectrogram, feature_extraction.pse, None),
+    'pcent': (_spectrogram, feature_extraction.pcent, None),
+    'pflux': (_spectrogram, feature_extraction.pflux, None),
+    'zero_crossing': (lambda n, fs: (_signal(n),), feature_extraction.zero_crossing, None),
+    'grad_change': (lambda n, fs: (_signal(n),), feature_extraction.grad_change, None),
+    'grad_change_rate': (lambda n, fs: (_signal(n),), feature_extraction.grad_change_rate, None),
+    'zero_crossing_sweep': (lambda n, fs: (_signal(n), SWEEP_WINSIZES), feature_extraction.zero_crossing_sweep, None),
+    'grad_change_sweep': (lambda n, fs: (_signal(n), SWEEP_WINSIZES), feature_extraction.grad_change_sweep, None),
+    'multi_resolution_analysis': (lambda n, fs: (_signal(n),), wavelet.multi_resolution_analysis, None),
+    'seqseg': (lambda n, fs: (_signal(n), 10, fs), preprocessing.seqseg, None),
+    'zscore': (lambda n, fs: (_signal(n),), preprocessing.zscore, None),
+    'min_max': (lambda n, fs: (_signal(n),), preprocessing.min_max, None),
+    'ZScoreNormalizer': (lambda n, fs: (_signal(n), preprocessing.ZScoreNormalizer), _normalizer, None),
+    'MinMaxNormalizer': (lambda n, fs: (_signal(n), preprocessing.MinMaxNormalizer), _normalizer, None),
+    'lenet_1d_inference': (_lenet, lambda runner, segments: runner.predict(segments), 2 ** 22),
+}
+
+
+def measure(function: any, args: tuple, repeat: int = 3) -> dict:
+    """Return the best wall time in seconds and the peak traced memory in bytes of function(*args)."""
+    function(*args)  # warm up caches and JIT compilation
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        function(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'time': min(times), 'peak_bytes': peak}
+
+
+def run(cases: list = None, durations: tuple = DURATIONS, frequencies: tuple = FREQUENCIES, repeat: int = 3) -> dict:
+    """Run the benchmark cases and return the results keyed by 'case/minutes min/fs Hz'."""
+    results = {}
+    for name in (list(CASES) if cases is None else cases):
+        setup, function, max_samples = CASES[name]
+        for minutes in durations:
+            for fs in frequencies:
+                n_samples = int(minutes * 60 * fs)
+                if max_samples is not None and n_samples > max_samples:
+                    continue
+                key = f'{name}/{minutes:g}min/{fs}Hz'
+                results[key] = measure(function, setup(n_samples, fs), repeat)
+                results[key]['n_samples'] = n_samples
+                print(f'{key:<45}{results[key]["time"]:>12.5f} s{results[key]["peak_bytes"] / 2 ** 20:>12.1f} MiB',
+                      flush=True)
+    return {'meta': {'python': platform.python_version(), 'numpy': np.__version__,
+                     'machine': platform.machine(), 'processor': platform.processor(), 'time': time.time(),
+                     'fft': fft.get_backend().name},
+            'results': results}
+
+
+def compare(current: dict, baseline: dict, threshold: float = 0.2, min_time: float = 1e-3,
+            min_bytes: int = 2 ** 20) -> list:
+    """Return the cases of current whose time or peak memory exceeds the baseline by more than threshold.
+
+    Times under min_time seconds and peaks under min_bytes are too noisy to be compared and are ignored.
+
+    Returns
+    -------
+    regressions: list
+        (key, metric, baseline value, current value) tuples.
+    """
+    regressions = []
+    for key, result in current['results'].items():
+        if key not in baseline['results']:
+            continue
+        for metric, floor in (('time', min_time), ('peak_bytes', min_bytes)):
+            before = baseline['results'][key][metric]
+            if result[metric] > max(before * (1 + threshold), floor):
+                regressions.append((key, metric, before, result[metric]))
+    return regressions
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cases', nargs='+', choices=list(CASES))
+    parser.add_argument('--durations', nargs='+', type=float, default=DURATIONS, help='recording durations in minutes')
+    parser.add_argument('--fs', nargs='+', type=int, default=FREQUENCIES, help='sampling frequencies in Hz')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='JSON file the results are written to')
+    parser.add_argument('--baseline', help='JSON results to compare against')
+    parser.add_argument('--save-baseline', help='JSON file the results are also written to as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.2, help='tolerated relative increase (0.2 = 20%%)')
+    parser.add_argument('--fft', choices=list(fft.BACKENDS) + ['auto'], help='FFT backend, auto for the fastest')
+    parser.add_argument('--fft-workers', type=int, default=1, help='threads per FFT, -1 for all CPUs')
+    args = parser.parse_args(argv)
+
+    if args.fft:
+        fft.set_backend(args.fft, args.fft_workers)
+        print(f'FFT backend: {fft.get_backend().name}', flush=True)
+
+    current = run(args.cases, args.durations, args.fs, args.repeat)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(current, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(current, json.load(f), args.threshold)
+        for key, metric, before, after in regressions:
+            print(f'REGRESSION {key} {metric}: {before:.6g} -> {after:.6g} ({after / before - 1:+.0%})')
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
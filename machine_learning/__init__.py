@@ -0,0 +1,18 @@
+"""Preprocessing, models and evaluation.
+
+Submodules are imported on first access, so that importing the package does not import
+Keras or TensorFlow until they are used.
+"""
+import importlib
+
+__all__ = ['convolutional_nn', 'dataset', 'evaluation', 'inference', 'pipeline', 'preprocessing', 'search']
+
+
+def __getattr__(name: str):
+    if name in __all__:
+        return importlib.import_module(f'{__name__}.{name}')
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
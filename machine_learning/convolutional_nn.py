@@ -1,5 +1,19 @@
+import numpy as np
 from keras.models import Model, Sequential
-from keras.layers import Conv1D, Conv2D, Activation, MaxPooling1D, MaxPooling2D, Flatten, Dense, Dropout
+from keras.layers import Input, Conv1D, Conv2D, SeparableConv1D, SeparableConv2D, DepthwiseConv1D, DepthwiseConv2D, \
+    Activation, MaxPooling1D, MaxPooling2D, GlobalAveragePooling1D, GlobalAveragePooling2D, Flatten, Dense, Dropout
+
+from manage.profiling import instrument
+
+LENET_CONV = [{'filters': 16, 'kernel_size': 6}, {'filters': 32, 'kernel_size': 4}]
+LENET_DENSE = [64, 32]
+
+_LAYERS = {
+    1: {'conv': Conv1D, 'separable': SeparableConv1D, 'depthwise': DepthwiseConv1D,
+        'pool': MaxPooling1D, 'gap': GlobalAveragePooling1D},
+    2: {'conv': Conv2D, 'separable': SeparableConv2D, 'depthwise': DepthwiseConv2D,
+        'pool': MaxPooling2D, 'gap': GlobalAveragePooling2D},
+}
 
 
 def __set_kwargs(**kwargs):
@@ -14,47 +28,120 @@ def __set_kwargs(**kwargs):
     return kwargs
 
 
-def lenet_2d(input_shape: tuple, num_of_class: int, **kwargs):
-    args = __set_kwargs(**kwargs)
-    hyper_params = {'filters': [16, 32], 'kernel_size': [6, 4], 'dense': [64, 32]}
+@instrument
+def build_cnn(
+        input_shape: tuple,
+        num_of_class: int,
+        conv_layers: list = None,
+        dense: list = None,
+        head: str = 'flatten',
+        dtype_policy: str = None,
+        **kwargs
+):
+    """Build a convolutional neural network from a layer specification.
 
-    model = Sequential()
-    for n_layers in range(len(hyper_params['filters'])):
-        model.add(Conv2D(filters=hyper_params['filters'][n_layers],
-                         kernel_size=(hyper_params['kernel_size'][n_layers], hyper_params['kernel_size'][n_layers]),
-                         strides=(1, 1), padding='same', input_shape=input_shape))
-        model.add(Activation(args.get('hidden_activation')))
-        model.add(MaxPooling2D(pool_size=(2, 2), padding='same'))
-    model.add(Flatten())
-
-    for n_mlp in range(len(hyper_params['dense'])):
-        model.add(Dense(hyper_params['dense'][n_mlp]))
-        model.add(Activation(args.get('hidden_activation')))
-    if args.get('dropout'):
-        model.add(Dropout(args.get('droprate')))
-    model.add(Dense(num_of_class))
-    model.add(Activation(args.get('output_activation')))
-    return model
+    Parameters
+    ----------
+    input_shape: tuple
+        Shape of a sample, (samples, channels) for 1-D or (height, width, channels) for 2-D convolutions.
 
+    num_of_class: int
+        Number of output units.
 
-def lenet_1d(input_shape: tuple, num_of_class: int, **kwargs):
+    conv_layers: list, optional
+        One dict per convolution block, with the keys
+        'filters' (ignored by depthwise convolutions), 'kernel_size',
+        'strides' (defaults to 1), 'type' ('conv', 'separable' or 'depthwise', defaults to 'conv'),
+        'depth_multiplier' (separable and depthwise only, defaults to 1)
+        and 'pool' (max pooling size after the block, 0 for none, defaults to 2).
+        Defaults to LENET_CONV.
+
+    dense: list, optional
+        Number of units of the hidden dense layers. Defaults to LENET_DENSE.
+
+    head: str, optional
+        'flatten' to flatten the feature maps, or 'gap' for global average pooling,
+        whose number of parameters does not grow with the input length. Defaults to 'flatten'.
+
+    dtype_policy: str, optional
+        Keras dtype policy of the hidden layers, such as 'mixed_float16' or 'mixed_bfloat16'.
+        The output activation always runs in float32.
+
+    kwargs: properties, optional
+        hidden_activation, output_activation, dropout and droprate.
+
+    Returns
+    -------
+    model: keras.Sequential
+        The model.
+
+    See Also
+    --------
+    model_cost: number of parameters and FLOPs of a model.
+    """
+    assert head in ('flatten', 'gap'), "head must be 'flatten' or 'gap'."
     args = __set_kwargs(**kwargs)
-    hyper_params = {'filters': [16, 32], 'kernel_size': [6, 4], 'dense': [64, 32]}
+    layers = _LAYERS[len(input_shape) - 1]
+    conv_layers = LENET_CONV if conv_layers is None else conv_layers
+    dense = LENET_DENSE if dense is None else dense
 
     model = Sequential()
-    for n_layers in range(len(hyper_params['filters'])):
-        model.add(Conv1D(filters=hyper_params['filters'][n_layers],
-                         kernel_size=hyper_params['kernel_size'][n_layers],
-                         strides=1, padding='same', input_shape=input_shape))
-        model.add(Activation(args.get('hidden_activation')))
-        model.add(MaxPooling1D(pool_size=2, padding='same'))
-    model.add(Flatten())
-
-    for n_mlp in range(len(hyper_params['dense'])):
-        model.add(Dense(hyper_params['dense'][n_mlp]))
-        model.add(Activation(args.get('hidden_activation')))
+    model.add(Input(shape=input_shape))
+    for spec in conv_layers:
+        kind = spec.get('type', 'conv')
+        options = {'kernel_size': spec['kernel_size'], 'strides': spec.get('strides', 1),
+                   'padding': 'same', 'dtype': dtype_policy}
+        if kind != 'conv':
+            options['depth_multiplier'] = spec.get('depth_multiplier', 1)
+        if kind != 'depthwise':
+            options['filters'] = spec['filters']
+        model.add(layers[kind](**options))
+        model.add(Activation(args.get('hidden_activation'), dtype=dtype_policy))
+        if spec.get('pool', 2):
+            model.add(layers['pool'](pool_size=spec.get('pool', 2), padding='same', dtype=dtype_policy))
+    model.add(Flatten(dtype=dtype_policy) if head == 'flatten' else layers['gap'](dtype=dtype_policy))
+
+    for units in dense:
+        model.add(Dense(units, dtype=dtype_policy))
+        model.add(Activation(args.get('hidden_activation'), dtype=dtype_policy))
     if args.get('dropout'):
-        model.add(Dropout(args.get('droprate')))
-    model.add(Dense(num_of_class))
-    model.add(Activation(args.get('output_activation')))
+        model.add(Dropout(args.get('droprate'), dtype=dtype_policy))
+    model.add(Dense(num_of_class, dtype=dtype_policy))
+    model.add(Activation(args.get('output_activation'), dtype='float32'))
     return model
+
+
+def model_cost(model) -> dict:
+    """Count the parameters and estimate the floating point operations of a model.
+
+    FLOPs count a multiply-add as 2 operations and cover the convolution and dense kernels,
+    which dominate the inference cost of these models.
+
+    Parameters
+    ----------
+    model: keras.Model
+        Built model.
+
+    Returns
+    -------
+    cost: dict
+        'params', the number of parameters, and 'flops', the FLOPs for one sample.
+    """
+    flops = 0
+    for layer in model.layers:
+        positions = int(np.prod(layer.output.shape[1:-1]))
+        for name in ('kernel', 'depthwise_kernel', 'pointwise_kernel'):
+            kernel = getattr(layer, name, None)
+            if kernel is not None:
+                flops += 2 * int(np.prod(kernel.shape)) * positions
+    return {'params': int(model.count_params()), 'flops': flops}
+
+
+def lenet_2d(input_shape: tuple, num_of_class: int, **kwargs):
+    assert len(input_shape) == 3, "input_shape must be (height, width, channels)."
+    return build_cnn(input_shape, num_of_class, [dict(spec) for spec in LENET_CONV], list(LENET_DENSE), **kwargs)
+
+
+def lenet_1d(input_shape: tuple, num_of_class: int, **kwargs):
+    assert len(input_shape) == 2, "input_shape must be (samples, channels)."
+    return build_cnn(input_shape, num_of_class, [dict(spec) for spec in LENET_CONV], list(LENET_DENSE), **kwargs)
@@ -0,0 +1,152 @@
+import numpy as np
+import tensorflow as tf
+
+from machine_learning import preprocessing
+from signal_processing import signal
+
+
+def input_shape(
+        length: float,
+        fs: int = 128,
+        model: str = 'lenet_2d',
+        winsize: int = 16,
+        overlap: float = 0.92,
+        nfft: int = 128
+) -> tuple:
+    """Return the input_shape of lenet_1d or lenet_2d for segments built by make_dataset.
+
+    Parameters
+    ----------
+    length: int or float
+        Segment length. Unit is second.
+
+    fs: int, optional
+        Sampling frequency of the signal. Defaults to 128.
+
+    model: str, optional
+        'lenet_1d' for raw segments or 'lenet_2d' for spectrograms. Defaults to 'lenet_2d'.
+
+    winsize, overlap, nfft: optional
+        STFT parameters, see signal_processing.signal.stft.
+
+    Returns
+    -------
+    shape: tuple
+        (samples, 1) for lenet_1d, (nfft/2+1, frames, 1) for lenet_2d.
+    """
+    assert model in ('lenet_1d', 'lenet_2d'), "model must be 'lenet_1d' or 'lenet_2d'."
+    size = int(length * fs)
+    if model == 'lenet_1d':
+        return size, 1
+    overlaps = int(winsize * overlap)
+    return int(nfft/2+1), int((size - overlaps) / (winsize - overlaps)), 1
+
+
+def make_dataset(
+        paths: list,
+        labels: list,
+        length: float,
+        fs: int = 128,
+        model: str = 'lenet_2d',
+        winsize: int = 16,
+        overlap: float = 0.92,
+        nfft: int = 128,
+        num_of_class: int = None,
+        batch_size: int = 32,
+        shuffle: bool = True,
+        shuffle_buffer: int = 1024,
+        cache: str = None,
+        seed: int = None
+) -> tf.data.Dataset:
+    """Build a tf.data input pipeline streaming records from disk for lenet_1d or lenet_2d.
+
+    Records are memory-mapped and cut into segments with seqseg, several records being read in parallel.
+    Segments are batched first, and each batch is normalized with zscore per segment, after the batched
+    stft for lenet_2d, in one call of a parallel map, so the GIL is taken once per batch rather than
+    once per segment. Batches are prefetched while the model trains, so the whole dataset never has to
+    fit in memory.
+
+    Parameters
+    ----------
+    paths: list
+        Paths to .npy files holding one 1-D record each.
+
+    labels: list
+        Class of each record, given to all its segments.
+
+    length: int or float
+        Segment length. Unit is second.
+
+    fs: int, optional
+        Sampling frequency of the signal. Defaults to 128.
+
+    model: str, optional
+        'lenet_1d' for raw segments or 'lenet_2d' for spectrograms. Defaults to 'lenet_2d'.
+
+    winsize, overlap, nfft: optional
+        STFT parameters, see signal_processing.signal.stft.
+
+    num_of_class: int, optional
+        If given, labels are one-hot encoded with this number of classes.
+
+    batch_size: int, optional
+        Number of segments per batch. Defaults to 32.
+
+    shuffle: bool, optional
+        If True, records and segments are shuffled. Defaults to True.
+
+    shuffle_buffer: int, optional
+        Number of segments in the shuffle buffer. Defaults to 1024.
+
+    cache: str, optional
+        If given, preprocessed segments are cached after the first epoch,
+        in memory for '' or in files with this prefix otherwise.
+
+    seed: int, optional
+        Seed of the shuffles.
+
+    Returns
+    -------
+    dataset: tf.data.Dataset
+        Dataset of (segments, labels) batches, segments shaped as input_shape returns.
+
+    See Also
+    --------
+    input_shape: shape of a segment, to build the model.
+    """
+    shape = input_shape(length, fs, model, winsize, overlap, nfft)
+    autotune = tf.data.experimental.AUTOTUNE
+
+    def load(path):
+        return np.asarray(preprocessing.seqseg_file(path.decode(), length, fs), dtype=np.float32)
+
+    def segments(path, label):
+        x = tf.numpy_function(load, [path], tf.float32)
+        x.set_shape((None, int(length * fs)))
+        return tf.data.Dataset.from_tensor_slices((x, tf.fill(tf.shape(x)[0:1], label)))
+
+    def features(x):
+        # one call per batch: the batch of segments goes through the batched stft and zscore at once
+        if model == 'lenet_2d':
+            x = signal.stft(x, winsize, overlap, nfft, axis=-1)
+        return preprocessing.zscore(x, axis=tuple(range(1, x.ndim)))[..., np.newaxis].astype(np.float32)
+
+    def transform(x, label):
+        x = tf.numpy_function(features, [x], tf.float32)
+        x.set_shape((None,) + shape)
+        if num_of_class is not None:
+            label = tf.one_hot(label, num_of_class)
+        return x, label
+
+    ds = tf.data.Dataset.from_tensor_slices(([str(p) for p in paths], list(labels)))
+    if shuffle:
+        ds = ds.shuffle(len(paths), seed=seed, reshuffle_each_iteration=True)
+    ds = ds.interleave(segments, cycle_length=autotune, num_parallel_calls=autotune, deterministic=not shuffle)
+    if shuffle and cache is None:
+        ds = ds.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+    ds = ds.batch(batch_size).map(transform, num_parallel_calls=autotune, deterministic=not shuffle)
+    if cache is not None:
+        ds = ds.cache(cache)
+        if shuffle:  # segments are shuffled after the cache, so the batches differ between epochs
+            ds = ds.unbatch().shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True).batch(batch_size)
+    return ds.prefetch(autotune)
@@ -0,0 +1,254 @@
+import numpy as np
+
+from manage.profiling import instrument
+
+
+@instrument
+def confusion_matrix(y_true: any, y_pred: any, n_classes: int = None) -> np.ndarray:
+    """Compute the confusion matrix of integer class labels.
+
+    Parameters
+    ----------
+    y_true: array_like
+        True classes.
+
+    y_pred: array_like
+        Predicted classes.
+
+    n_classes: int, optional
+        Number of classes. Defaults to the largest label plus one.
+
+    Returns
+    -------
+    cm: ndarray
+        Matrix of shape (n_classes, n_classes) whose element [i, j] counts the samples of class i predicted as j.
+
+    Raises
+    ------
+    ValueError
+        If a label is negative or not smaller than n_classes.
+    """
+    y_true = np.asarray(y_true, dtype=np.int64).ravel()
+    y_pred = np.asarray(y_pred, dtype=np.int64).ravel()
+    assert len(y_true) == len(y_pred), "y_true and y_pred must have the same length."
+    if n_classes is None:
+        n_classes = int(max(y_true.max(initial=-1), y_pred.max(initial=-1))) + 1
+    for name, y in (('y_true', y_true), ('y_pred', y_pred)):
+        bad = (y < 0) | (y >= n_classes)
+        if bad.any():
+            raise ValueError(f"{name} has label {y[bad][0]}, which is not in [0, {n_classes}).")
+    counts = np.bincount(y_true * n_classes + y_pred, minlength=n_classes * n_classes)
+    return counts.reshape(n_classes, n_classes)
+
+
+class ConfusionMatrix(object):
+    """Confusion matrix accumulated over batches of predictions.
+
+    Batches can be added with update without keeping the predictions,
+    and matrices accumulated by several workers can be combined with merge.
+
+    Parameters
+    ----------
+    n_classes: int
+        Number of classes.
+
+    Examples
+    --------
+    >>> cm = ConfusionMatrix(2)
+    >>> for y_true, y_pred in batches:
+    ...     cm.update(y_true, y_pred)
+    >>> cm.sensitivity()[1]
+    """
+
+    def __init__(self, n_classes: int):
+        self.n_classes = n_classes
+        self.matrix = np.zeros((n_classes, n_classes), dtype=np.int64)
+
+    def update(self, y_true: any, y_pred: any):
+        """Add a batch of true and predicted classes."""
+        self.matrix += confusion_matrix(y_true, y_pred, self.n_classes)
+        return self
+
+    def merge(self, other: 'ConfusionMatrix'):
+        """Add the counts of another matrix."""
+        assert other.n_classes == self.n_classes, "matrices must have the same number of classes."
+        self.matrix += other.matrix
+        return self
+
+    def __add__(self, other: 'ConfusionMatrix'):
+        return ConfusionMatrix(self.n_classes).merge(self).merge(other)
+
+    def _counts(self):
+        tp = np.diag(self.matrix).astype(float)
+        fn = self.matrix.sum(axis=1) - tp
+        fp = self.matrix.sum(axis=0) - tp
+        tn = self.matrix.sum() - tp - fn - fp
+        return tp, fn, fp, tn
+
+    def accuracy(self) -> float:
+        """Fraction of samples correctly classified."""
+        return float(np.trace(self.matrix) / self.matrix.sum())
+
+    def sensitivity(self) -> np.ndarray:
+        """Sensitivity (recall) of each class against the others."""
+        tp, fn, _, _ = self._counts()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return tp / (tp + fn)
+
+    def specificity(self) -> np.ndarray:
+        """Specificity of each class against the others."""
+        _, _, fp, tn = self._counts()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return tn / (tn + fp)
+
+    def precision(self) -> np.ndarray:
+        """Precision (positive predictive value) of each class against the others."""
+        tp, _, fp, _ = self._counts()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return tp / (tp + fp)
+
+    def f1(self) -> np.ndarray:
+        """F1 score of each class against the others."""
+        tp, fn, fp, _ = self._counts()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return 2 * tp / (2 * tp + fp + fn)
+
+
+def _cumulative_counts(y_true: any, y_score: any):
+    """Return the true and false positive counts at each distinct score threshold, from high to low."""
+    y_true = np.asarray(y_true).ravel() == 1
+    y_score = np.asarray(y_score, dtype=float).ravel()
+    assert len(y_true) == len(y_score), "y_true and y_score must have the same length."
+    order = np.argsort(y_score, kind='mergesort')[::-1]
+    y_score = y_score[order]
+    y_true = y_true[order]
+    # the last index of each run of tied scores
+    last = np.r_[np.flatnonzero(np.diff(y_score)), len(y_score) - 1]
+    tps = np.cumsum(y_true)[last]
+    fps = (last + 1) - tps
+    return tps, fps, y_score[last]
+
+
+@instrument
+def roc_curve(y_true: any, y_score: any):
+    """Compute the receiver operating characteristic curve of a binary classifier.
+
+    Parameters
+    ----------
+    y_true: array_like
+        True binary labels, 1 being the positive class.
+
+    y_score: array_like
+        Score of the positive class, such as its predicted probability.
+
+    Returns
+    -------
+    fpr: ndarray
+        False positive rates, starting at 0.
+
+    tpr: ndarray
+        True positive rates, starting at 0.
+
+    thresholds: ndarray
+        Decreasing thresholds, the first one being inf.
+    """
+    tps, fps, thresholds = _cumulative_counts(y_true, y_score)
+    tps = np.r_[0, tps]
+    fps = np.r_[0, fps]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return fps / fps[-1], tps / tps[-1], np.r_[np.inf, thresholds]
+
+
+def roc_auc(y_true: any, y_score: any) -> float:
+    """Compute the area under the ROC curve.
+
+    See Also
+    --------
+    roc_curve: receiver operating characteristic curve.
+    """
+    fpr, tpr, _ = roc_curve(y_true, y_score)
+    return float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2))
+
+
+@instrument
+def pr_curve(y_true: any, y_score: any):
+    """Compute the precision-recall curve of a binary classifier.
+
+    Parameters
+    ----------
+    y_true: array_like
+        True binary labels, 1 being the positive class.
+
+    y_score: array_like
+        Score of the positive class.
+
+    Returns
+    -------
+    precision: ndarray
+        Precision at each threshold.
+
+    recall: ndarray
+        Recall at each threshold, increasing.
+
+    thresholds: ndarray
+        Decreasing thresholds.
+    """
+    tps, fps, thresholds = _cumulative_counts(y_true, y_score)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return tps / (tps + fps), tps / tps[-1], thresholds
+
+
+def pr_auc(y_true: any, y_score: any) -> float:
+    """Compute the area under the precision-recall curve as the average precision.
+
+    The average precision is the sum of the precisions weighted by the increase of recall
+    at each threshold, which does not interpolate optimistically between thresholds.
+    """
+    precision, recall, _ = pr_curve(y_true, y_score)
+    return float(np.sum(np.diff(np.r_[0, recall]) * precision))
+
+
+def bootstrap_ci(
+        metric: any,
+        y_true: any,
+        y_pred: any,
+        n_boot: int = 1000,
+        alpha: float = 0.05,
+        seed: int = None
+) -> tuple:
+    """Estimate a percentile bootstrap confidence interval of a metric.
+
+    Parameters
+    ----------
+    metric: callable
+        Function of (y_true, y_pred) returning a float, such as roc_auc.
+
+    y_true: array_like
+        True labels.
+
+    y_pred: array_like
+        Predictions or scores.
+
+    n_boot: int, optional
+        Number of bootstrap resamples. Defaults to 1000.
+
+    alpha: float, optional
+        The interval covers 1 - alpha. Defaults to 0.05.
+
+    seed: int, optional
+        Seed of the resampling.
+
+    Returns
+    -------
+    low, high: float
+        Bounds of the confidence interval.
+    """
+    y_true = np.asarray(y_true)
+    y_pred = np.asarray(y_pred)
+    rng = np.random.RandomState(seed)
+    stats = np.empty(n_boot)
+    for b in range(n_boot):
+        i = rng.randint(0, len(y_true), size=len(y_true))
+        stats[b] = metric(y_true[i], y_pred[i])
+    low, high = np.nanpercentile(stats, [100 * alpha / 2, 100 * (1 - alpha / 2)])
+    return float(low), float(high)
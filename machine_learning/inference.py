@@ -0,0 +1,282 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+import tensorflow as tf
+
+from manage.profiling import instrument
+
+try:
+    from ai_edge_litert.interpreter import Interpreter
+except ImportError:
+    Interpreter = tf.lite.Interpreter
+
+
+class InferenceRunner(object):
+    """Low-latency inference for the models built by lenet_1d and lenet_2d.
+
+    The forward pass is traced once by a tf.function with a fixed input signature,
+    which removes the per-call overhead of model.predict. Segments passed to submit
+    from concurrent callers are gathered into micro-batches of up to max_batch_size,
+    waiting at most max_wait_ms after the first segment of a batch.
+
+    Parameters
+    ----------
+    model: keras.Model
+        Built model.
+
+    max_batch_size: int, optional
+        Maximum number of segments per micro-batch. Defaults to 32.
+
+    max_wait_ms: float, optional
+        Maximum time a segment waits for others to fill its batch. Defaults to 2 ms.
+
+    Examples
+    --------
+    >>> runner = InferenceRunner(lenet_1d(input_shape=(640, 1), num_of_class=2))
+    >>> proba = runner.predict(np.zeros((640, 1)))
+    >>> future = runner.submit(np.zeros((640, 1)))
+    >>> runner.close()
+    """
+
+    def __init__(self, model, max_batch_size: int = 32, max_wait_ms: float = 2.):
+        self.model = model
+        self.input_shape = tuple(model.input_shape[1:])
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._forward = tf.function(lambda x: model(x, training=False),
+                                    input_signature=[tf.TensorSpec((None,) + self.input_shape, tf.float32)])
+        self._queue = queue.Queue()
+        self._thread = None
+        self._error = None
+        self._lock = threading.Lock()  # starting and stopping the thread
+        self._error_lock = threading.Lock()  # queuing segments and failing them when the thread stops
+
+    @instrument
+    def predict(self, x: any) -> np.ndarray:
+        """Run the model on one segment or a batch of segments.
+
+        Parameters
+        ----------
+        x: array_like
+            One segment of shape input_shape, or a batch of shape (n, *input_shape).
+
+        Returns
+        -------
+        y: ndarray
+            Model output of shape (num_of_class,) or (n, num_of_class).
+        """
+        x = np.asarray(x, dtype=np.float32)
+        single = x.shape == self.input_shape
+        y = self._forward(x[np.newaxis] if single else x).numpy()
+        return y[0] if single else y
+
+    def submit(self, x: any) -> Future:
+        """Queue one segment for micro-batched inference.
+
+        Returns
+        -------
+        future: concurrent.futures.Future
+            Future of the model output of shape (num_of_class,).
+        """
+        x = np.asarray(x, dtype=np.float32)
+        assert x.shape == self.input_shape, f"segment shape must be {self.input_shape}."
+        future = Future()
+        with self._lock:
+            if self._thread is None and self._error is None:
+                self._thread = threading.Thread(target=self._serve, daemon=True)
+                self._thread.start()
+        with self._error_lock:
+            if self._error is not None:
+                raise RuntimeError("the micro-batching thread of the runner has stopped.") from self._error
+            self._queue.put((x, future))
+        return future
+
+    def _run(self, batch: list):
+        """Run the model on a micro-batch and resolve its futures. Errors of the model fail this batch only."""
+        batch = [(x, future) for x, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            y = self._forward(np.stack([x for x, _ in batch])).numpy()
+        except BaseException as e:
+            for _, future in batch:
+                future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+        for (_, future), out in zip(batch, y):
+            future.set_result(out)
+
+    def _serve(self):
+        try:
+            self._serve_batches()
+        except BaseException as e:
+            # the thread cannot continue: fail the queued segments and refuse new ones instead of blocking callers
+            with self._error_lock:
+                self._error = e
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not None and item[1].set_running_or_notify_cancel():
+                        item[1].set_exception(e)
+
+    def _serve_batches(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.perf_counter() + self.max_wait_ms / 1000
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+            self._run(batch)
+
+    def close(self):
+        """Stop the micro-batching thread after the queued segments are served."""
+        with self._lock:
+            if self._thread is not None:
+                self._queue.put(None)
+                self._thread.join()
+                self._thread = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+@instrument
+def export_tflite(model, path: str, quantization: str = None, representative_data: any = None) -> str:
+    """Convert a model to TensorFlow Lite for CPU inference.
+
+    Parameters
+    ----------
+    model: keras.Model
+        Built model.
+
+    path: str
+        Output .tflite file.
+
+    quantization: str, optional
+        None to keep float32 weights, 'float16' for float16 weights,
+        or 'int8' for int8 weights and activations, which needs representative_data.
+
+    representative_data: array_like, optional
+        Batch of typical segments used to calibrate int8 quantization.
+
+    Returns
+    -------
+    path: str
+        The output file.
+    """
+    assert quantization in (None, 'float16', 'int8'), "quantization must be None, 'float16' or 'int8'."
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantization is not None:
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == 'int8':
+        assert representative_data is not None, "int8 quantization needs representative_data."
+        samples = np.asarray(representative_data, dtype=np.float32)
+        converter.representative_dataset = lambda: ([s[np.newaxis]] for s in samples)
+    with open(path, 'wb') as f:
+        f.write(converter.convert())
+    return path
+
+
+class TFLiteRunner(object):
+    """Run a model exported by export_tflite with the TensorFlow Lite interpreter.
+
+    Parameters
+    ----------
+    path: str
+        .tflite file.
+
+    num_threads: int, optional
+        Number of CPU threads used by the interpreter.
+    """
+
+    def __init__(self, path: str, num_threads: int = None):
+        self._interpreter = Interpreter(model_path=path, num_threads=num_threads)
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        self.input_shape = tuple(self._input['shape'][1:])
+        self._batch_size = None
+
+    @instrument
+    def predict(self, x: any) -> np.ndarray:
+        """Run the model on one segment or a batch of segments, as InferenceRunner.predict."""
+        x = np.asarray(x, dtype=self._input['dtype'])
+        single = x.shape == self.input_shape
+        if single:
+            x = x[np.newaxis]
+        if self._batch_size != len(x):
+            self._interpreter.resize_tensor_input(self._input['index'], x.shape)
+            self._interpreter.allocate_tensors()
+            self._batch_size = len(x)
+        self._interpreter.set_tensor(self._input['index'], x)
+        self._interpreter.invoke()
+        y = self._interpreter.get_tensor(self._output['index'])
+        return y[0] if single else y
+
+
+def benchmark(runner: any, x: any, n_requests: int = 1000, concurrency: int = 8) -> dict:
+    """Measure the throughput and latency of single-segment requests.
+
+    Requests are sent by concurrency threads. They go through submit for an InferenceRunner
+    and through predict otherwise, one at a time as the TFLite interpreter is not thread-safe.
+
+    Parameters
+    ----------
+    runner: InferenceRunner or TFLiteRunner
+        Runner benchmarked.
+
+    x: array_like
+        One segment of shape runner.input_shape.
+
+    n_requests: int, optional
+        Number of requests. Defaults to 1000.
+
+    concurrency: int, optional
+        Number of concurrent callers. Defaults to 8.
+
+    Returns
+    -------
+    result: dict
+        'throughput' in requests per second, and 'p50_ms', 'p99_ms' latencies in milliseconds.
+    """
+    lock = threading.Lock()
+    runner.predict(x)  # warm up
+
+    def request(_):
+        start = time.perf_counter()
+        if isinstance(runner, InferenceRunner):
+            runner.submit(x).result()
+        else:
+            with lock:
+                runner.predict(x)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        latency = np.array(list(pool.map(request, range(n_requests))))
+    elapsed = time.perf_counter() - start
+    return {'throughput': n_requests / elapsed,
+            'p50_ms': float(np.percentile(latency, 50) * 1000),
+            'p99_ms': float(np.percentile(latency, 99) * 1000)}
@@ -0,0 +1,183 @@
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from machine_learning import preprocessing
+from manage.profiling import instrument
+from signal_processing import feature_extraction, signal
+
+FEATURES = ('pse', 'pcent', 'pflux', 'zero_crossing')
+
+_worker = {}
+
+
+def _attach(spec: tuple):
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _init_worker(input_spec, output_spec, paths, params):
+    _worker.clear()
+    if input_spec is not None:
+        _worker['input_shm'], _worker['input'] = _attach(input_spec)
+    _worker['output_shm'], _worker['output'] = _attach(output_spec)
+    _worker['paths'] = paths
+    _worker['params'] = params
+    if 'zero_crossing' in params['features']:
+        feature_extraction.warmup()
+
+
+def _close_worker():
+    handles = [_worker[key] for key in ('input_shm', 'output_shm') if key in _worker]
+    _worker.clear()  # drops the arrays viewing the buffers before they are closed
+    for shm in handles:
+        shm.close()
+
+
+def _load(start: int, stop: int) -> np.ndarray:
+    if _worker['paths'] is None:
+        return _worker['input'][start:stop]
+    return np.stack([np.load(path, mmap_mode='r') for path in _worker['paths'][start:stop]])
+
+
+def _process(bounds: tuple):
+    start, stop = bounds
+    params = _worker['params']
+    x = _load(start, stop)
+    spg = signal.stft(x, params['winsize'], params['overlap'], params['nfft'])
+
+    out = _worker['output'][start:stop]
+    for i, name in enumerate(params['features']):
+        if name == 'zero_crossing':
+            out[:, i] = feature_extraction.zero_crossing(x, params['winsize'], params['overlap'])
+        elif name == 'pflux':
+            out[:, i] = feature_extraction.pflux(spg)
+        else:
+            out[:, i] = getattr(feature_extraction, name)(spg, params['fmin'], params['fmax'])
+    if params['normalize']:
+        out[:] = preprocessing.zscore(out, axis=-1)
+
+
+def _n_samples(records) -> tuple:
+    if isinstance(records, np.ndarray):
+        assert records.ndim == 2, "records array must be 2-D (n_records, n_samples)."
+        return records.shape[1], None
+    if len(records) == 0:
+        return 0, None
+    paths = [os.fspath(r) for r in records] if isinstance(records[0], (str, os.PathLike)) else None
+    if paths is not None:
+        lengths = {np.load(path, mmap_mode='r').shape for path in paths}
+    else:
+        lengths = {np.shape(r) for r in records}
+    assert len(lengths) == 1, "all records must be 1-D and have the same number of samples."
+    shape = lengths.pop()
+    assert len(shape) == 1, "all records must be 1-D and have the same number of samples."
+    return shape[0], paths
+
+
+@instrument
+def extract_features(
+        records: any,
+        winsize: int = 16,
+        overlap: float = 0.92,
+        nfft: int = 128,
+        features: tuple = FEATURES,
+        normalize: bool = True,
+        fmin: int = 0,
+        fmax: int = 64,
+        n_workers: int = None,
+        chunksize: int = 16
+) -> np.ndarray:
+    """Compute framewise features of many records on a process pool.
+
+    Each record goes through stft, the spectral features and zero_crossing,
+    then every feature is normalized with zscore along the frames.
+    Records given as arrays are copied once into shared memory, records given as paths
+    are memory-mapped by the workers, and workers write their results directly into
+    a shared, preallocated feature matrix, so no array is pickled between processes.
+
+    Parameters
+    ----------
+    records: array_like or list
+        2-D array of shape (n_records, n_samples), a list of 1-D arrays of the same length,
+        or a list of paths to .npy files holding such arrays.
+
+    winsize: int, optional
+        Number of samples of the analysis window size. Defaults to 16.
+
+    overlap: float, optional
+        Percentage of overlapping samples to window length. Defaults to 0.92 (92%).
+
+    nfft: int, optional
+        Length of the transformed axis of the STFT. Defaults to 128.
+
+    features: tuple, optional
+        Names of the features computed, among 'pse', 'pcent', 'pflux' and 'zero_crossing'.
+        Defaults to all of them.
+
+    normalize: bool, optional
+        If True, each feature of each record is z-scored along the frames. Defaults to True.
+
+    fmin: int, optional
+        The smallest frequency component of a signal. Defaults to 0.
+
+    fmax: int, optional
+        The maximum frequency component of a signal. Defaults to 64.
+
+    n_workers: int, optional
+        Number of worker processes. Defaults to os.cpu_count(). With 1, records are processed in this process.
+
+    chunksize: int, optional
+        Number of records handed to a worker at once. Defaults to 16.
+
+    Returns
+    -------
+    out: ndarray
+        Feature matrix of shape (n_records, len(features), n_frames), in the order of records.
+        An empty list of records gives a matrix of shape (0, len(features), 0).
+    """
+    assert set(features) <= set(FEATURES), f"features must be chosen from {FEATURES}."
+    n_samples, paths = _n_samples(records)
+    n_records = len(records)
+    overlaps = int(winsize * overlap)
+    n_frames = max(int((n_samples - overlaps) / (winsize - overlaps)), 0)
+    params = {'winsize': winsize, 'overlap': overlap, 'nfft': nfft, 'features': tuple(features),
+              'normalize': normalize, 'fmin': fmin, 'fmax': fmax}
+
+    shape = (n_records, len(features), n_frames)
+    if n_records == 0:
+        return np.empty(shape)
+    output_shm = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * 8, 1))
+    input_shm = None
+    try:
+        input_spec = None
+        if paths is None:
+            input_shm = shared_memory.SharedMemory(create=True, size=max(n_records * n_samples * 8, 1))
+            np.ndarray((n_records, n_samples), dtype=float, buffer=input_shm.buf)[:] = records
+            input_spec = (input_shm.name, (n_records, n_samples), float)
+        output_spec = (output_shm.name, shape, float)
+
+        bounds = [(i, min(i + chunksize, n_records)) for i in range(0, n_records, chunksize)]
+        n_workers = os.cpu_count() if n_workers is None else n_workers
+        if n_workers == 1:
+            _init_worker(input_spec, output_spec, paths, params)
+            try:
+                for b in bounds:
+                    _process(b)
+            finally:
+                _close_worker()
+        else:
+            ctx = multiprocessing.get_context('spawn')  # TensorFlow is not fork-safe
+            with ctx.Pool(n_workers, initializer=_init_worker,
+                          initargs=(input_spec, output_spec, paths, params)) as pool:
+                pool.map(_process, bounds, chunksize=1)
+
+        return np.ndarray(shape, dtype=float, buffer=output_shm.buf).copy()
+    finally:
+        for shm in (input_shm, output_shm):
+            if shm is not None:
+                shm.close()
+                shm.unlink()
@@ -1,7 +1,11 @@
+import abc
+
 import numpy as np
-import pandas as pd
+
+from manage.profiling import instrument
 
 
+@instrument
 def zscore(x: any, axis=None):
     """Compute the z score.
 
@@ -24,16 +28,20 @@ def zscore(x: any, axis=None):
     See Also
     --------
     min_max: normalized array.
+    ZScoreNormalizer: z score with statistics fitted on chunks.
 
     Notes
     -----
     This function preserves ndarray subclasses, and works also with matrices and masked arrays
     (it uses asanyarray instead of asarray for parameters).
     """
-    zs = (x - x.mean(axis=axis, keepdims=True)) / np.std(x, axis=axis, keepdims=True)
+    x = np.asanyarray(x)
+    zs = x - x.mean(axis=axis, keepdims=True)
+    zs /= np.sqrt(np.mean(np.square(zs), axis=axis, keepdims=True))
     return zs
 
 
+@instrument
 def min_max(x: any, axis=None):
     """Transform features by scaling each feature to the range of 0 to 1.
 
@@ -53,18 +61,216 @@ def min_max(x: any, axis=None):
     See Also
     --------
     zscore: Compute the z score.
+    MinMaxNormalizer: min-max scaling with extrema fitted on chunks.
     """
-    result = (x - x.min(axis=axis, keepdims=True)) / (x.max(axis=axis, keepdims=True) - x.min(axis=axis, keepdims=True))
+    x = np.asanyarray(x)
+    x_min = x.min(axis=axis, keepdims=True)
+    result = np.subtract(x, x_min, dtype=x.dtype if x.dtype.kind in 'fc' else float)
+    result /= x.max(axis=axis, keepdims=True) - x_min
     return result
 
 
+class _Normalizer(abc.ABC):
+    """Base class of the normalizers fitted on chunks of data.
+
+    Subclasses implement partial_fit, merge and transform with their statistics.
+    """
+
+    def __init__(self, axis=None):
+        self.axis = axis
+        self.reset()
+
+    def reset(self):
+        """Forget the fitted statistics."""
+        self.n_samples_ = 0
+
+    def _count(self, x: np.ndarray) -> int:
+        return x.size if self.axis is None else x.shape[self.axis]
+
+    @abc.abstractmethod
+    def partial_fit(self, x: any):
+        """Update the statistics with a chunk of data.
+
+        Chunks are concatenated along axis, or flattened if axis is None.
+        """
+
+    @abc.abstractmethod
+    def merge(self, other: '_Normalizer'):
+        """Combine the statistics fitted by another instance into this one."""
+
+    @abc.abstractmethod
+    def transform(self, x: any, out: np.ndarray = None) -> np.ndarray:
+        """Return x normalized with the fitted statistics."""
+
+    def fit(self, x: any):
+        """Fit the statistics on x, forgetting the previous ones."""
+        self.reset()
+        return self.partial_fit(x)
+
+    def _transform(self, x: any, shift: np.ndarray, scale: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        assert self.n_samples_ > 0, "normalizer must be fitted before transform."
+        x = np.asanyarray(x)
+        if out is None:
+            out = np.empty(x.shape, dtype=np.result_type(x.dtype, float))
+        np.subtract(x, shift, out=out)
+        np.divide(out, scale, out=out)
+        return out
+
+    def fit_transform(self, x: any, out: np.ndarray = None) -> np.ndarray:
+        """Fit on x and return it normalized."""
+        return self.fit(x).transform(x, out=out)
+
+
+class ZScoreNormalizer(_Normalizer):
+    """Compute the z score with a mean and standard deviation fitted on chunks.
+
+    The statistics are merged chunk by chunk with the parallel algorithm of Chan et al.,
+    so data bigger than memory can be fitted with partial_fit and fitted instances
+    from several workers can be combined with merge.
+
+    Parameters
+    ----------
+    axis: int or None, optional
+        Axis along which the statistics are computed. If None, compute over the whole array.
+
+    See Also
+    --------
+    zscore: Compute the z score in one call.
+
+    Examples
+    --------
+    >>> norm = ZScoreNormalizer(axis=0)
+    >>> for chunk in np.array_split(np.random.normal(3, 2, (1000, 4)), 10):
+    ...     norm = norm.partial_fit(chunk)
+    >>> zs = norm.transform(np.random.normal(3, 2, (10, 4)))
+    """
+
+    def reset(self):
+        super().reset()
+        self.mean_ = 0.
+        self._m2 = 0.
+
+    @property
+    def var_(self):
+        return self._m2 / self.n_samples_
+
+    @property
+    def std_(self):
+        return np.sqrt(self.var_)
+
+    def _merge(self, n: int, mean: any, m2: any):
+        total = self.n_samples_ + n
+        delta = mean - self.mean_
+        self.mean_ = self.mean_ + delta * (n / total)
+        self._m2 = self._m2 + m2 + np.square(delta) * (self.n_samples_ * n / total)
+        self.n_samples_ = total
+
+    @instrument
+    def partial_fit(self, x: any):
+        x = np.asanyarray(x)
+        n = self._count(x)
+        if n == 0:
+            return self
+        mean = x.mean(axis=self.axis, keepdims=True)
+        m2 = np.sum(np.square(x - mean), axis=self.axis, keepdims=True)
+        self._merge(n, mean, m2)
+        return self
+
+    def merge(self, other: 'ZScoreNormalizer'):
+        """Combine the statistics fitted by another instance into this one."""
+        if other.n_samples_ > 0:
+            self._merge(other.n_samples_, other.mean_, other._m2)
+        return self
+
+    @instrument
+    def transform(self, x: any, out: np.ndarray = None) -> np.ndarray:
+        """Return the z score of x with the fitted statistics.
+
+        Parameters
+        ----------
+        x: any, array_like
+            The data.
+
+        out: ndarray, optional
+            Array the result is written into. Pass x itself to normalize in place.
+
+        Returns
+        -------
+        zs : array_like
+            The z-scores.
+        """
+        return self._transform(x, self.mean_, self.std_, out)
+
+
+class MinMaxNormalizer(_Normalizer):
+    """Scale features to the range of 0 to 1 with extrema fitted on chunks.
+
+    Parameters
+    ----------
+    axis: int or None, optional
+        Axis along which the extrema are computed. If None, compute over the whole array.
+
+    See Also
+    --------
+    min_max: Scale in one call.
+    """
+
+    def reset(self):
+        super().reset()
+        self.min_ = np.inf
+        self.max_ = -np.inf
+
+    @instrument
+    def partial_fit(self, x: any):
+        x = np.asanyarray(x)
+        n = self._count(x)
+        if n == 0:
+            return self
+        self.min_ = np.minimum(self.min_, x.min(axis=self.axis, keepdims=True))
+        self.max_ = np.maximum(self.max_, x.max(axis=self.axis, keepdims=True))
+        self.n_samples_ += n
+        return self
+
+    def merge(self, other: 'MinMaxNormalizer'):
+        """Combine the extrema fitted by another instance into this one."""
+        if other.n_samples_ > 0:
+            self.min_ = np.minimum(self.min_, other.min_)
+            self.max_ = np.maximum(self.max_, other.max_)
+            self.n_samples_ += other.n_samples_
+        return self
+
+    @instrument
+    def transform(self, x: any, out: np.ndarray = None) -> np.ndarray:
+        """Return x scaled by the fitted extrema.
+
+        Parameters
+        ----------
+        x: any, array_like
+            The data.
+
+        out: ndarray, optional
+            Array the result is written into. Pass x itself to normalize in place.
+
+        Returns
+        -------
+        result : array_like
+            The scaled array.
+        """
+        return self._transform(x, self.min_, self.max_ - self.min_, out)
+
+
+@instrument
 def seqseg(
         x: any,
         length: int,
-        fs: int = 128
+        fs: int = 128,
+        hop: float = None
 ) -> np.array:
     """Returns a two-dimensional array of time-series signals divided into any lengths.
 
+    The segments are a strided view of x, so no sample is copied and np.memmap inputs stay on disk.
+    Write into a copy of the result, as writing into the view would modify x.
+
     Parameters
     ----------
     x: any, array_like
@@ -77,10 +283,19 @@ def seqseg(
     fs: int, optional
         Sampling frequency of the signal. Defaults to 128.
 
+    hop: int or float, optional
+        Shift between the starts of consecutive segments, in seconds.
+        Segments overlap if hop is shorter than length. Defaults to length (no overlap).
+
     Returns
     -------
     out : array_like
-        Array segmented into the shape of 2D.
+        Array segmented into the shape of 2D. The view is read-only when segments overlap.
+
+    See Also
+    --------
+    seqseg_file: Segment a signal stored in a file without loading it.
+    seqseg_record: Segment a time window of a compressed record file.
 
     Examples
     --------
@@ -90,28 +305,151 @@ def seqseg(
     >>> b = seqseg(x=a, length=10, fs=1)
     ... b.shape
     (10, 10)
+    >>> seqseg(x=a, length=10, fs=1, hop=5).shape
+    (19, 10)
     """
-    num = len(x) // (length * fs)
-    itr = map(lambda n: x[int(length * fs) * n:int(length * fs) * (n + 1)],
-              range(num))
-    return np.array([i for i in itr])
+    x = np.asanyarray(x)
+    size = int(length * fs)
+    step = size if hop is None else int(hop * fs)
+    assert size > 0 and step > 0, "length and hop must be longer than a sample."
+    num = max((len(x) - size) // step + 1, 0)
+    if step == size:
+        return x[0:num * size].reshape((num, size) + x.shape[1:])
+    return np.lib.stride_tricks.as_strided(x, shape=(num, size) + x.shape[1:],
+                                           strides=(step * x.strides[0],) + x.strides,
+                                           writeable=False)
+
+
+@instrument
+def seqseg_file(
+        path: str,
+        length: int,
+        fs: int = 128,
+        hop: float = None,
+        dtype: any = 'float64',
+        offset: int = 0
+) -> np.array:
+    """Segment a 1-D signal stored in a .npy or raw binary file without loading it into memory.
+
+    Parameters
+    ----------
+    path: str
+        Path to a .npy file, or to a raw file of samples of type dtype.
 
+    length: int or float
+        Segment length to divide. Unit is second.
+
+    fs: int, optional
+        Sampling frequency of the signal. Defaults to 128.
+
+    hop: int or float, optional
+        Shift between the starts of consecutive segments, in seconds. Defaults to length.
+
+    dtype: data-type, optional
+        Type of the samples of a raw file. Ignored for .npy files. Defaults to float64.
+
+    offset: int, optional
+        Number of header bytes to skip in a raw file. Ignored for .npy files. Defaults to 0.
 
-def check_array(x):
+    Returns
+    -------
+    out : array_like
+        Segments as a view of a read-only memory map of the file.
+
+    See Also
+    --------
+    seqseg: Segment an array.
+    """
+    if str(path).endswith('.npy'):
+        x = np.load(path, mmap_mode='r')
+    else:
+        x = np.memmap(path, dtype=dtype, mode='r', offset=offset)
+    return seqseg(x, length, fs, hop)
+
+
+@instrument
+def seqseg_record(
+        record: any,
+        length: int,
+        hop: float = None,
+        channels: any = None,
+        start: float = 0,
+        stop: float = None
+) -> np.array:
+    """Segment a time window of a record file, decompressing only the chunks of the window.
+
+    Parameters
+    ----------
+    record: str or signal_processing.record_store.Record
+        Record file, or an open record.
+
+    length: int or float
+        Segment length to divide. Unit is second.
+
+    hop: int or float, optional
+        Shift between the starts of consecutive segments, in seconds. Defaults to length.
+
+    channels: int, str or list, optional
+        Channel index or name, or a list of them. Defaults to all channels.
+
+    start, stop: float, optional
+        Time window to segment, in seconds. Defaults to the whole record.
+
+    Returns
+    -------
+    out : array_like
+        Segments of shape (segments, samples) if channels is a single channel,
+        otherwise (segments, samples, channels), as the input of convolutional_nn.lenet_1d.
+
+    See Also
+    --------
+    seqseg: Segment an array.
+    signal_processing.record_store.Record.segment: read one segment at a time.
+    """
+    from signal_processing import record_store
+    if not isinstance(record, record_store.Record):
+        with record_store.Record(record) as opened:
+            return seqseg_record(opened, length, hop, channels, start, stop)
+    x = record.window(start, stop, channels)
+    return seqseg(x.T, length, record.fs, hop)
+
+
+@instrument
+def check_array(x, chunk_size: int = 2 ** 20):
     """Input validation on an array, list, sparse matrix or similar for training model.
 
+    The input is not copied. Float arrays are scanned in chunks of about chunk_size elements,
+    so memory-mapped arrays are validated without being loaded as a whole.
+
     Parameters
     ----------
     x: ndarray
-        Input object to check.
+        Input object to check. Must have 2 or more dimensions.
+
+    chunk_size: int, optional
+        Approximate number of elements scanned at once. Defaults to 2 ** 20.
 
     Returns
     -------
-
+    x: ndarray
+        The input as an array.
     """
-    x = np.array(x)
+    x = np.asanyarray(x)
     assert len(x.shape) >= 2, "input array dimension must be greater than 2."
-    df = pd.DataFrame(x)
-    is_null = np.array(df.isnull().any(axis=1))
-    is_null = list(map(lambda n: not n, is_null))
-    assert all(is_null), "input array contains missing value or nan."
+    assert x.dtype.kind in 'biufc', f"input array dtype must be numeric, not {x.dtype}."
+    if x.dtype.kind not in 'fc' or x.size == 0:
+        return x
+
+    rows = max(chunk_size // (x.size // len(x)), 1)
+    for start in range(0, len(x), rows):
+        chunk = x[start:start + rows]
+        # A single sum is finite for finite inputs unless it overflows, so the mask is only built on failure.
+        with np.errstate(over='ignore', invalid='ignore'):
+            if np.isfinite(np.sum(chunk)):
+                continue
+        finite = np.isfinite(chunk)
+        if not finite.all():
+            index = np.unravel_index(np.argmin(finite), chunk.shape)
+            index = (start + int(index[0]),) + tuple(int(i) for i in index[1:])
+            raise AssertionError(f"input array contains missing value, nan or inf at index {index}.")
+    return x
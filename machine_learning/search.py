@@ -0,0 +1,243 @@
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+TRAINING_KEYS = ('batch_size', 'learning_rate')
+
+
+def grid(param_grid: dict) -> list:
+    """Expand a dict of lists of values into the list of all parameter combinations.
+
+    Examples
+    --------
+    >>> grid({'head': ['flatten', 'gap'], 'batch_size': [32]})
+    [{'head': 'flatten', 'batch_size': 32}, {'head': 'gap', 'batch_size': 32}]
+    """
+    keys = list(param_grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(param_grid[k] for k in keys))]
+
+
+def trial_key(params: dict) -> str:
+    """Return the identifier of a trial in the store."""
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+
+class TrialStore(object):
+    """SQLite store of the trials of a search, safe to share between processes.
+
+    Parameters
+    ----------
+    path: str
+        Database file, created if it does not exist.
+    """
+
+    def __init__(self, path: str):
+        self.path = os.fspath(path)
+        with self._connect() as db:
+            db.execute('CREATE TABLE IF NOT EXISTS trials ('
+                       'key TEXT PRIMARY KEY, params TEXT, state TEXT, score REAL, fold_scores TEXT, updated REAL)')
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=60)
+
+    def record(self, params: dict, state: str, fold_scores: list = ()):
+        """Insert or update a trial. state is 'running', 'complete' or 'pruned'.
+
+        Only complete trials get a score: the fold scores of a pruned trial are kept,
+        but their mean covers fewer folds and is not comparable with the complete ones.
+        """
+        score = float(np.mean(fold_scores)) if state == 'complete' and len(fold_scores) > 0 else None
+        with self._connect() as db:
+            db.execute('INSERT OR REPLACE INTO trials VALUES (?, ?, ?, ?, ?, ?)',
+                       (trial_key(params), json.dumps(params, sort_keys=True), state, score,
+                        json.dumps([float(s) for s in fold_scores]), time.time()))
+
+    def state(self, params: dict):
+        """Return the state of a trial, or None if it was never started."""
+        with self._connect() as db:
+            row = db.execute('SELECT state FROM trials WHERE key = ?', (trial_key(params),)).fetchone()
+        return None if row is None else row[0]
+
+    def results(self, state: str = None) -> list:
+        """Return the trials as dicts, the complete ones first from the best (lowest) score."""
+        query = 'SELECT params, state, score, fold_scores FROM trials'
+        with self._connect() as db:
+            rows = db.execute(query + (' WHERE state = ?' if state else ''), (state,) if state else ()).fetchall()
+        results = [{'params': json.loads(p), 'state': s, 'score': score, 'fold_scores': json.loads(f)}
+                   for p, s, score, f in rows]
+        return sorted(results, key=lambda r: np.inf if r['score'] is None else r['score'])
+
+    def best(self):
+        """Return the complete trial of lowest score, or None."""
+        results = self.results('complete')
+        return results[0] if results else None
+
+    def median_at(self, n_folds: int):
+        """Median over the complete trials of their mean score on the first n_folds folds, or None."""
+        scores = [np.mean(r['fold_scores'][0:n_folds]) for r in self.results('complete')
+                  if len(r['fold_scores']) >= n_folds]
+        return float(np.median(scores)) if len(scores) > 0 else None
+
+
+def kfold(n_samples: int, n_splits: int = 5, seed: int = 0) -> list:
+    """Return (train, validation) index arrays of a shuffled k-fold split."""
+    order = np.random.RandomState(seed).permutation(n_samples)
+    folds = np.array_split(order, n_splits)
+    return [(np.sort(np.concatenate(folds[0:i] + folds[i + 1:])), np.sort(folds[i])) for i in range(n_splits)]
+
+
+FOLD_ARRAYS = ('x_train', 'y_train', 'x_valid', 'y_valid')
+
+
+def _fold_path(data_dir: str, i: int, name: str) -> str:
+    return os.path.join(data_dir, f'fold{i}_{name}.npy')
+
+
+def _write_folds(data_dir: str, x: np.ndarray, y: np.ndarray, n_splits: int, seed: int, num_of_class: int):
+    """Write the train and validation arrays of each fold of kfold, with one-hot labels, to data_dir."""
+    onehot = np.eye(num_of_class, dtype=np.float32)
+    for i, (train, valid) in enumerate(kfold(len(x), n_splits, seed)):
+        arrays = {'x_train': x[train], 'y_train': onehot[y[train]], 'x_valid': x[valid], 'y_valid': onehot[y[valid]]}
+        for name in FOLD_ARRAYS:
+            np.save(_fold_path(data_dir, i, name), arrays[name])
+
+
+_worker = {}
+
+
+def _init_worker(data_dir: str, config: dict, threads: int):
+    import tensorflow as tf
+    if threads is not None:
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    _worker['folds'] = [{name: np.load(_fold_path(data_dir, i, name), mmap_mode='r') for name in FOLD_ARRAYS}
+                        for i in range(config['n_splits'])]
+    _worker['config'] = config
+
+
+def _run_trial(params: dict) -> str:
+    import keras
+
+    config = _worker['config']
+    store = TrialStore(config['store'])
+    store.record(params, 'running')
+
+    model_params = {k: v for k, v in params.items() if k not in TRAINING_KEYS}
+    fold_scores = []
+    for i, fold in enumerate(_worker['folds']):
+        keras.backend.clear_session()
+        model = config['build_fn'](input_shape=fold['x_train'].shape[1:], num_of_class=config['num_of_class'],
+                                   **model_params)
+        model.compile(optimizer=keras.optimizers.Adam(params.get('learning_rate', 1e-3)),
+                      loss='categorical_crossentropy')
+        history = model.fit(fold['x_train'], fold['y_train'], validation_data=(fold['x_valid'], fold['y_valid']),
+                            batch_size=params.get('batch_size', 32), epochs=config['epochs'], verbose=0,
+                            callbacks=[keras.callbacks.EarlyStopping(patience=config['patience'],
+                                                                     restore_best_weights=True)])
+        fold_scores.append(float(np.min(history.history['val_loss'])))
+
+        median = store.median_at(i + 1) if config['prune'] else None
+        if median is not None and i + 1 < config['n_splits'] and np.mean(fold_scores) > median:
+            store.record(params, 'pruned', fold_scores)
+            return 'pruned'
+    store.record(params, 'complete', fold_scores)
+    return 'complete'
+
+
+def run_search(
+        params_list: list,
+        x: any,
+        y: any,
+        store: str,
+        build_fn: any = None,
+        n_splits: int = 5,
+        epochs: int = 20,
+        patience: int = 3,
+        prune: bool = True,
+        n_workers: int = None,
+        seed: int = 0
+) -> list:
+    """Cross-validate model hyperparameters on a process pool, with early stopping and pruning.
+
+    Each trial trains build_fn(input_shape, num_of_class, **params) on every fold of a k-fold split
+    and is scored by its mean best validation loss. The split is computed once, and the train and
+    validation arrays of each fold, with one-hot labels, are written to .npy files that all workers
+    memory-map and train on directly. After each fold, a trial whose mean score is worse than the median of the
+    complete trials on the same folds is pruned. Trials are recorded in an SQLite store, and the
+    complete or pruned ones are skipped when the search is run again, so an interrupted search resumes.
+
+    Parameters
+    ----------
+    params_list: list
+        One dict of parameters per trial, such as returned by grid. 'batch_size' and 'learning_rate'
+        are used for training, the others are passed to build_fn.
+
+    x: array_like
+        Samples, shaped as the input_shape of the model plus a leading sample axis.
+
+    y: array_like
+        Integer class of each sample.
+
+    store: str
+        SQLite file recording the trials.
+
+    build_fn: callable, optional
+        Model builder. Defaults to convolutional_nn.build_cnn.
+
+    n_splits: int, optional
+        Number of folds. Defaults to 5.
+
+    epochs: int, optional
+        Maximum number of epochs per fold. Defaults to 20.
+
+    patience: int, optional
+        Number of epochs without improvement of the validation loss before stopping. Defaults to 3.
+
+    prune: bool, optional
+        If True, bad trials are stopped early. Defaults to True.
+
+    n_workers: int, optional
+        Number of worker processes. Defaults to os.cpu_count(). With 1, trials run in this process.
+
+    seed: int, optional
+        Seed of the fold split. Defaults to 0.
+
+    Returns
+    -------
+    results: list
+        All trials of the store, as returned by TrialStore.results: the complete ones first, best first,
+        then the pruned ones.
+    """
+    if build_fn is None:
+        from machine_learning.convolutional_nn import build_cnn
+        build_fn = build_cnn
+    store = os.path.abspath(store)
+    trials = TrialStore(store)
+    todo = [p for p in params_list if trials.state(p) not in ('complete', 'pruned')]
+    y = np.asarray(y, dtype=int)
+    config = {'store': store, 'build_fn': build_fn, 'n_splits': n_splits, 'epochs': epochs, 'patience': patience,
+              'prune': prune, 'seed': seed, 'num_of_class': int(y.max()) + 1}
+    n_workers = os.cpu_count() if n_workers is None else n_workers
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        _write_folds(data_dir, np.asarray(x, dtype=np.float32), y, n_splits, seed, config['num_of_class'])
+        if n_workers == 1:
+            _init_worker(data_dir, config, None)
+            try:
+                for p in todo:
+                    _run_trial(p)
+            finally:
+                _worker.clear()
+        elif len(todo) > 0:
+            threads = max(os.cpu_count() // n_workers, 1)
+            ctx = multiprocessing.get_context('spawn')  # TensorFlow is not fork-safe
+            with ctx.Pool(n_workers, initializer=_init_worker, initargs=(data_dir, config, threads)) as pool:
+                pool.map(_run_trial, todo, chunksize=1)
+    return trials.results()
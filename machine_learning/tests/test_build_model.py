@@ -15,5 +15,21 @@ class Tests(object):
         a = model.get_weights()[-1]
         assert a.shape[0] == 2
 
+    def test_build_cnn_gap(self):
+        spec = [{'filters': 16, 'kernel_size': 7, 'strides': 2},
+                {'type': 'separable', 'filters': 32, 'kernel_size': 5, 'pool': 4},
+                {'type': 'depthwise', 'kernel_size': 3, 'pool': 0}]
+        short = convolutional_nn.build_cnn((1000, 1), 2, spec, dense=[16], head='gap')
+        long = convolutional_nn.build_cnn((10000, 1), 2, spec, dense=[16], head='gap')
+        assert short.count_params() == long.count_params()
+        assert short.output_shape == (None, 2)
+
+    def test_model_cost(self):
+        model = convolutional_nn.build_cnn((100, 1), 3, [{'filters': 4, 'kernel_size': 3, 'pool': 0}], dense=[],
+                                           head='gap')
+        cost = convolutional_nn.model_cost(model)
+        assert cost['params'] == (3 * 4 + 4) + (4 * 3 + 3)
+        assert cost['flops'] == 2 * 3 * 4 * 100 + 2 * 4 * 3
+
 
 testing.do_test(Tests)
@@ -8,5 +8,19 @@ class Tests(object):
         a = np.vstack([np.array([1, 2, 3, 4, 5]), np.array([1, 2, 3, 4, 5])])
         preprocessing.check_array(a)
 
+    def test_check_array_nan(self):
+        a = np.random.normal(0, 1, (10, 3, 4))
+        a[7, 1, 2] = np.inf
+        try:
+            preprocessing.check_array(a, chunk_size=12)
+        except AssertionError as e:
+            assert '(7, 1, 2)' in str(e)
+        else:
+            assert False
+
+    def test_check_array_no_copy(self):
+        a = np.full((10, 2), 1e308)
+        assert preprocessing.check_array(a) is a
+
 
 testing.do_test(Tests)
@@ -0,0 +1,45 @@
+import os
+import tempfile
+
+import numpy as np
+
+from manage import testing
+from machine_learning import convolutional_nn, dataset, preprocessing
+from signal_processing import signal
+
+
+class Tests(object):
+    def test_lenet_2d(self):
+        with tempfile.TemporaryDirectory() as d:
+            paths = [os.path.join(d, f'{i}.npy') for i in range(3)]
+            for p in paths:
+                np.save(p, np.random.normal(0, 1, 128 * 20))
+            ds = dataset.make_dataset(paths, [0, 1, 0], length=5, num_of_class=2, batch_size=4)
+            shape = dataset.input_shape(length=5)
+            x, y = next(iter(ds))
+            assert tuple(x.shape[1:]) == shape and tuple(y.shape) == (4, 2)
+            model = convolutional_nn.lenet_2d(input_shape=shape, num_of_class=2)
+            model.compile(optimizer='adam', loss='categorical_crossentropy')
+            model.fit(ds, epochs=1, verbose=0)
+
+    def test_lenet_1d_order(self):
+        with tempfile.TemporaryDirectory() as d:
+            a = np.random.normal(0, 1, 128 * 20)
+            np.save(os.path.join(d, 'a.npy'), a)
+            ds = dataset.make_dataset([os.path.join(d, 'a.npy')], [1], length=5, model='lenet_1d', shuffle=False)
+            x, y = next(iter(ds))
+            assert x.shape == (4, 640, 1)
+            assert np.allclose(x[1, :, 0], preprocessing.zscore(a[640:1280]), atol=1e-5)
+
+    def test_lenet_2d_batch(self):
+        with tempfile.TemporaryDirectory() as d:
+            a = np.random.normal(0, 1, 128 * 20)
+            np.save(os.path.join(d, 'a.npy'), a)
+            ds = dataset.make_dataset([os.path.join(d, 'a.npy')], [1], length=5, shuffle=False, cache='')
+            x, _ = next(iter(ds))
+            assert np.allclose(x[2, ..., 0], preprocessing.zscore(signal.stft(a[1280:1920])), atol=1e-5)
+            shuffled = dataset.make_dataset([os.path.join(d, 'a.npy')], [1], length=5, batch_size=3, cache='', seed=0)
+            assert sorted(len(x) for x, _ in shuffled) == [1, 3]
+
+
+testing.do_test(Tests)
@@ -0,0 +1,51 @@
+import numpy as np
+
+from manage import testing
+from machine_learning import evaluation
+
+
+class Tests(object):
+    def test_confusion_matrix(self):
+        cm = evaluation.confusion_matrix([0, 1, 1, 2], [0, 1, 2, 2])
+        assert np.array_equal(cm, [[1, 0, 0], [0, 1, 1], [0, 0, 1]])
+
+    def test_confusion_matrix_labels(self):
+        for y_true, y_pred, label in (([0, 1, 2], [0, 1, 1], 'y_true has label 2'),
+                                      ([0, 1, 1], [0, -1, 1], 'y_pred has label -1')):
+            try:
+                evaluation.confusion_matrix(y_true, y_pred, n_classes=2)
+            except ValueError as e:
+                assert str(e).startswith(label)
+            else:
+                raise AssertionError("out of range labels must raise ValueError.")
+
+    def test_streaming(self):
+        y_true = np.random.randint(0, 3, 1000)
+        y_pred = np.random.randint(0, 3, 1000)
+        cm = evaluation.ConfusionMatrix(3)
+        for t, p in zip(np.array_split(y_true, 7), np.array_split(y_pred, 7)):
+            cm.update(t, p)
+        assert np.array_equal(cm.matrix, evaluation.confusion_matrix(y_true, y_pred))
+        half = evaluation.ConfusionMatrix(3).update(y_true[:500], y_pred[:500])
+        assert np.array_equal((half + evaluation.ConfusionMatrix(3).update(y_true[500:], y_pred[500:])).matrix,
+                              cm.matrix)
+
+    def test_binary_metrics(self):
+        cm = evaluation.ConfusionMatrix(2).update([1, 1, 1, 0, 0], [1, 1, 0, 0, 1])
+        assert np.isclose(cm.sensitivity()[1], 2 / 3)
+        assert np.isclose(cm.specificity()[1], 1 / 2)
+        assert np.isclose(cm.f1()[1], 2 / 3)
+
+    def test_auc(self):
+        assert evaluation.roc_auc([0, 0, 1, 1], [0.1, 0.4, 0.35, 0.8]) == 0.75
+        assert evaluation.roc_auc([0, 1, 0, 1], [0.5, 0.5, 0.5, 0.5]) == 0.5
+        assert np.isclose(evaluation.pr_auc([0, 0, 1, 1], [0.1, 0.4, 0.35, 0.8]), 0.8333333)
+
+    def test_bootstrap_ci(self):
+        y_true = np.random.randint(0, 2, 500)
+        y_score = y_true + np.random.normal(0, 1, 500)
+        low, high = evaluation.bootstrap_ci(evaluation.roc_auc, y_true, y_score, n_boot=100, seed=0)
+        assert low <= evaluation.roc_auc(y_true, y_score) <= high
+
+
+testing.do_test(Tests)
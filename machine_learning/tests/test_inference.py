@@ -0,0 +1,65 @@
+import os
+import tempfile
+
+import numpy as np
+
+from manage import testing
+from machine_learning import convolutional_nn, inference
+
+
+class Tests(object):
+    def test_runner(self):
+        model = convolutional_nn.lenet_1d(input_shape=(100, 1), num_of_class=2)
+        a = np.random.normal(0, 1, (5, 100, 1)).astype(np.float32)
+        expected = model.predict(a, verbose=0)
+        with inference.InferenceRunner(model, max_batch_size=4) as runner:
+            assert np.allclose(runner.predict(a), expected, atol=1e-5)
+            assert np.allclose(runner.predict(a[2]), expected[2], atol=1e-5)
+            futures = [runner.submit(x) for x in a]
+            assert np.allclose([f.result() for f in futures], expected, atol=1e-5)
+
+    def test_runner_errors(self):
+        model = convolutional_nn.lenet_1d(input_shape=(100, 1), num_of_class=2)
+        a = np.zeros((100, 1), dtype=np.float32)
+        with inference.InferenceRunner(model, max_wait_ms=0) as runner:
+            forward = runner._forward
+
+            def failing(x):
+                runner._forward = forward
+                raise ValueError("model failed")
+            runner._forward = failing
+            try:
+                runner.submit(a).result(timeout=10)
+            except ValueError:
+                pass
+            else:
+                raise AssertionError("the error of the model must be set on the future.")
+            cancelled = runner.submit(a)
+            cancelled.cancel()
+            assert runner.submit(a).result(timeout=10).shape == (2,)
+
+            def interrupted(x):
+                raise KeyboardInterrupt
+            runner._forward = interrupted
+            future = runner.submit(a)
+            runner._thread.join(timeout=10)
+            assert isinstance(future.exception(timeout=10), KeyboardInterrupt)
+            try:
+                runner.submit(a)
+            except RuntimeError:
+                pass
+            else:
+                raise AssertionError("submit must raise once the thread has stopped.")
+
+    def test_tflite(self):
+        model = convolutional_nn.lenet_1d(input_shape=(100, 1), num_of_class=2)
+        a = np.random.normal(0, 1, (3, 100, 1)).astype(np.float32)
+        with tempfile.TemporaryDirectory() as d:
+            path = inference.export_tflite(model, os.path.join(d, 'lenet.tflite'), quantization='float16')
+            runner = inference.TFLiteRunner(path)
+            assert np.allclose(runner.predict(a), model.predict(a, verbose=0), atol=1e-2)
+            result = inference.benchmark(runner, a[0], n_requests=20, concurrency=2)
+            assert result['p99_ms'] >= result['p50_ms']
+
+
+testing.do_test(Tests)
@@ -13,5 +13,37 @@ class Tests(object):
         b = preprocessing.min_max(a)
         assert int(np.max(b) - np.min(b)) == 1
 
+    def test_min_max_int(self):
+        a = np.array([[0, 5, 10], [2, 4, 6]], dtype=np.int16)
+        assert np.allclose(preprocessing.min_max(a, axis=1), [[0, 0.5, 1], [0, 0.5, 1]])
+
+    def test_normalizer_abstract(self):
+        try:
+            preprocessing._Normalizer()
+        except TypeError:
+            return
+        raise AssertionError("_Normalizer must not be instantiable.")
+
+    def test_zscore_partial_fit(self):
+        a = np.random.normal(3, 2, (640, 4))
+        norm = preprocessing.ZScoreNormalizer(axis=0)
+        for chunk in np.array_split(a, 7):
+            norm.partial_fit(chunk)
+        assert np.allclose(norm.transform(a), preprocessing.zscore(a, axis=0))
+
+    def test_zscore_merge(self):
+        a = np.random.normal(3, 2, 640)
+        norm = preprocessing.ZScoreNormalizer().fit(a[:100]).merge(preprocessing.ZScoreNormalizer().fit(a[100:]))
+        assert np.isclose(norm.mean_, np.mean(a)) and np.isclose(norm.std_, np.std(a))
+
+    def test_min_max_in_place(self):
+        a = np.random.normal(-2, 3, (640, 4))
+        expected = preprocessing.min_max(a, axis=0)
+        norm = preprocessing.MinMaxNormalizer(axis=0)
+        for chunk in np.array_split(a, 5):
+            norm.partial_fit(chunk)
+        norm.transform(a, out=a)
+        assert np.allclose(a, expected)
+
 
 testing.do_test(Tests)
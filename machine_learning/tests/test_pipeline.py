@@ -0,0 +1,28 @@
+import numpy as np
+
+from manage import testing
+from machine_learning import pipeline, preprocessing
+from signal_processing import feature_extraction, signal
+
+
+class Tests(object):
+    def test_extract_features(self):
+        a = np.random.normal(0, 1, (5, 640))
+        out = pipeline.extract_features(a, n_workers=2, chunksize=2)
+        assert out.shape == (5, 4, 313)
+        spg = signal.stft(a[3])
+        assert np.allclose(out[3, 0], preprocessing.zscore(feature_extraction.pse(spg)))
+
+    def test_order(self):
+        a = np.random.normal(0, 1, (5, 640))
+        single = pipeline.extract_features(list(a), n_workers=1, normalize=False)
+        assert np.array_equal(single, pipeline.extract_features(a, n_workers=3, chunksize=1, normalize=False))
+
+    def test_empty(self):
+        assert pipeline.extract_features([], n_workers=1).shape == (0, 4, 0)
+        assert pipeline.extract_features(np.empty((0, 640)), features=('pse',)).shape == (0, 1, 313)
+        pipeline.extract_features(np.random.normal(0, 1, (2, 640)), n_workers=1)
+        assert pipeline._worker == {}
+
+
+testing.do_test(Tests)
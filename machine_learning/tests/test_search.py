@@ -0,0 +1,65 @@
+import os
+import tempfile
+
+import numpy as np
+
+from manage import testing
+from machine_learning import search
+
+
+class Tests(object):
+    def test_kfold(self):
+        folds = search.kfold(10, n_splits=3)
+        assert len(folds) == 3
+        assert np.array_equal(np.sort(np.concatenate([v for _, v in folds])), np.arange(10))
+
+    def test_pruned_not_ranked(self):
+        with tempfile.TemporaryDirectory() as d:
+            store = search.TrialStore(os.path.join(d, 'search.sqlite'))
+            store.record({'dense': [4]}, 'complete', [0.5, 0.6])
+            store.record({'dense': [8]}, 'pruned', [0.1])
+            results = store.results()
+            assert [r['state'] for r in results] == ['complete', 'pruned']
+            assert results[1]['score'] is None and results[1]['fold_scores'] == [0.1]
+            assert store.best()['params'] == {'dense': [4]}
+
+    def test_folds_shared(self):
+        a = np.random.normal(0, 1, (20, 32, 1)).astype(np.float32)
+        y = (a[:, 0, 0] > 0).astype(int)
+        params = search.grid({'conv_layers': [[{'filters': 4, 'kernel_size': 3}]], 'dense': [[4], [8]],
+                              'head': ['gap'], 'batch_size': [16]})
+        with tempfile.TemporaryDirectory() as d:
+            search._write_folds(d, a, y, 2, 0, 2)
+            written = {f: os.stat(os.path.join(d, f)).st_mtime_ns for f in os.listdir(d)}
+            assert len(written) == 2 * len(search.FOLD_ARRAYS)
+            from machine_learning.convolutional_nn import build_cnn
+            config = {'store': os.path.join(d, 'search.sqlite'), 'build_fn': build_cnn, 'n_splits': 2, 'epochs': 1,
+                      'patience': 1, 'prune': False, 'seed': 0, 'num_of_class': 2}
+            search._init_worker(d, config, None)
+            try:
+                folds = search._worker['folds']
+                for p in params:
+                    assert search._run_trial(p) == 'complete'
+                    assert search._worker['folds'] is folds
+            finally:
+                search._worker.clear()
+            assert {f: os.stat(os.path.join(d, f)).st_mtime_ns for f in written} == written
+            for (train, valid), fold in zip(search.kfold(len(a), 2), folds):
+                assert isinstance(fold['x_train'], np.memmap)
+                assert np.array_equal(fold['x_valid'], a[valid]) and np.array_equal(fold['y_train'], np.eye(2)[y[train]])
+
+    def test_run_search_resume(self):
+        a = np.random.normal(0, 1, (40, 32, 1))
+        y = (a[:, 0, 0] > 0).astype(int)
+        params = search.grid({'conv_layers': [[{'filters': 4, 'kernel_size': 3}]], 'dense': [[4], [8]],
+                              'head': ['gap'], 'batch_size': [16]})
+        with tempfile.TemporaryDirectory() as d:
+            store = os.path.join(d, 'search.sqlite')
+            results = search.run_search(params, a, y, store, n_splits=2, epochs=1, n_workers=1)
+            assert len(results) == 2 and results[0]['state'] in ('complete', 'pruned')
+            search.TrialStore(store).record(params[0], 'running')
+            results = search.run_search(params, a, y, store, n_splits=2, epochs=1, n_workers=1)
+            assert all(r['state'] != 'running' for r in results)
+
+
+testing.do_test(Tests)
@@ -0,0 +1,32 @@
+import os
+import tempfile
+
+import numpy as np
+
+from manage import testing
+from machine_learning import preprocessing
+
+
+class Tests(object):
+    def test_seqseg(self):
+        a = np.arange(100.)
+        b = preprocessing.seqseg(a, length=10, fs=1)
+        assert b.shape == (10, 10)
+        assert np.shares_memory(a, b)
+
+    def test_seqseg_hop(self):
+        a = np.arange(100.)
+        b = preprocessing.seqseg(a, length=10, fs=1, hop=5)
+        assert b.shape == (19, 10)
+        assert b[3, 0] == 15 and not b.flags.writeable
+
+    def test_seqseg_file(self):
+        a = np.arange(100, dtype='int16')
+        with tempfile.TemporaryDirectory() as d:
+            a.tofile(os.path.join(d, 'record.bin'))
+            b = preprocessing.seqseg_file(os.path.join(d, 'record.bin'), length=10, fs=1, dtype='int16')
+            assert np.array_equal(b[2], a[20:30])
+            del b
+
+
+testing.do_test(Tests)
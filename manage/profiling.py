@@ -0,0 +1,260 @@
+"""Opt-in instrumentation of the library's public functions.
+
+Functions decorated with instrument record their call count, wall and CPU time,
+input size, time spent compiling or loading numba kernels and, optionally, allocation peak
+while profiling is enabled.
+When it is disabled, the decorator costs a single flag check per call.
+
+Profiling is enabled by the profile context manager, by enable, or for a whole process by
+the environment variable TMLABPY_PROFILE (1 for timings, 'memory' to also trace allocations).
+In the latter case the summary is printed to stderr at exit, and a Chrome trace is written
+to TMLABPY_PROFILE_TRACE if it is set.
+
+stats and summary aggregate every recorded call, while only the last MAX_EVENTS calls are kept
+as events for the trace, so long runs use bounded memory.
+
+Examples
+--------
+>>> from manage import profiling
+>>> with profiling.profile():
+...     spg = signal.stft(x)
+...     with profiling.stage('features'):
+...         se = feature_extraction.pse(spg)
+>>> print(profiling.summary())
+>>> profiling.export_chrome_trace('trace.json')
+"""
+import atexit
+import collections
+import contextlib
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+MAX_EVENTS = 100000
+
+_state = {'enabled': False, 'memory': False}
+_events = collections.deque(maxlen=MAX_EVENTS)
+_aggregates = {}
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def enable(memory: bool = False, max_events: int = None):
+    """Start recording the instrumented calls. With memory=True, allocation peaks are traced too.
+
+    max_events sets the number of last calls kept as events, MAX_EVENTS by default.
+    """
+    global _events
+    if max_events is not None and max_events != _events.maxlen:
+        with _lock:
+            _events = collections.deque(_events, maxlen=max_events)
+    _state['memory'] = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _state['enabled'] = True
+
+
+def disable():
+    """Stop recording. Recorded calls are kept until reset."""
+    _state['enabled'] = False
+    if _state['memory'] and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _state['memory'] = False
+
+
+def reset():
+    """Discard the recorded calls and their aggregates."""
+    with _lock:
+        _events.clear()
+        _aggregates.clear()
+
+
+def is_enabled() -> bool:
+    """Return True while the instrumented calls are recorded."""
+    return _state['enabled']
+
+
+@contextlib.contextmanager
+def profile(memory: bool = False, max_events: int = None):
+    """Record the instrumented calls made inside the with block."""
+    enable(memory, max_events)
+    try:
+        yield
+    finally:
+        disable()
+
+
+def _input_bytes(args: tuple, kwargs: dict) -> int:
+    size = 0
+    for a in list(args) + list(kwargs.values()):
+        size += getattr(a, 'nbytes', 0) or 0
+    return size
+
+
+def _stack(attr: str) -> list:
+    stack = getattr(_local, attr, None)
+    if stack is None:
+        stack = []
+        setattr(_local, attr, stack)
+    return stack
+
+
+def _begin() -> tuple:
+    stack = _stack('stack')
+    memory = _state['memory'] and tracemalloc.is_tracing()
+    if memory:
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1][1] = max(stack[-1][1], peak)  # keep the enclosing call's peak before resetting it
+        tracemalloc.reset_peak()
+        stack.append([current, current])
+    _stack('compile').append([0.])
+    return memory, time.perf_counter(), time.process_time()
+
+
+def _end(token: tuple, name: str, args: tuple, kwargs: dict):
+    memory, start, cpu = token
+    wall, cpu = time.perf_counter() - start, time.process_time() - cpu
+    event = {'name': name, 'start': start, 'wall': wall, 'cpu': cpu, 'bytes_in': _input_bytes(args, kwargs),
+             'tid': threading.get_ident(), 'peak_bytes': None, 'compile': _stack('compile').pop()[0]}
+    if memory:
+        stack = _local.stack
+        start_bytes, peak = stack.pop()
+        if tracemalloc.is_tracing():
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            event['peak_bytes'] = peak - start_bytes
+            if stack:
+                stack[-1][1] = max(stack[-1][1], peak)
+    with _lock:
+        _events.append(event)
+        _aggregate(event)
+
+
+def _aggregate(event: dict):
+    s = _aggregates.get(event['name'])
+    if s is None:
+        s = _aggregates[event['name']] = {'calls': 0, 'wall': 0., 'wall_max': 0., 'cpu': 0., 'bytes_in': 0,
+                                          'peak_bytes': None, 'compile': 0.}
+    s['calls'] += 1
+    s['wall'] += event['wall']
+    s['wall_max'] = max(s['wall_max'], event['wall'])
+    s['cpu'] += event['cpu']
+    s['bytes_in'] += event['bytes_in']
+    s['compile'] += event['compile']
+    if event['peak_bytes'] is not None:
+        s['peak_bytes'] = max(s['peak_bytes'] or 0, event['peak_bytes'])
+
+
+def instrument(func: any = None, name: str = None):
+    """Decorate a function so that its calls are recorded while profiling is enabled.
+
+    Parameters
+    ----------
+    func: callable
+        Function decorated.
+
+    name: str, optional
+        Name of the records. Defaults to the module and qualified name of func.
+    """
+    if func is None:
+        return functools.partial(instrument, name=name)
+    name = name or f'{func.__module__}.{func.__qualname__}'
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _state['enabled']:
+            return func(*args, **kwargs)
+        token = _begin()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _end(token, name, args, kwargs)
+    return wrapper
+
+
+@contextlib.contextmanager
+def stage(name: str):
+    """Record the with block as a call named name, to attribute time to a pipeline stage."""
+    if not _state['enabled']:
+        yield
+        return
+    token = _begin()
+    try:
+        yield
+    finally:
+        _end(token, name, (), {})
+
+
+@contextlib.contextmanager
+def compiling():
+    """Attribute the with block, such as the import of numba kernels, to the 'compile' time of the open calls."""
+    if not _state['enabled']:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        for entry in _stack('compile'):
+            entry[0] += seconds
+
+
+def events() -> list:
+    """Return a copy of the last recorded calls, at most max_events (see enable)."""
+    with _lock:
+        return list(_events)
+
+
+def stats() -> dict:
+    """Aggregate all the recorded calls by name, including those no longer kept as events.
+
+    Returns
+    -------
+    stats: dict
+        For each name: 'calls', 'wall' (total seconds), 'wall_mean', 'wall_max', 'cpu' (total seconds),
+        'bytes_in' (total input bytes), 'peak_bytes' (largest allocation peak, or None) and 'compile'
+        (total seconds spent compiling or loading numba kernels, as recorded by compiling).
+    """
+    with _lock:
+        out = {name: dict(s) for name, s in _aggregates.items()}
+    for s in out.values():
+        s['wall_mean'] = s['wall'] / s['calls']
+    return out
+
+
+def summary() -> str:
+    """Return the aggregates as a table, sorted by total wall time."""
+    rows = sorted(stats().items(), key=lambda item: -item[1]['wall'])
+    lines = [f'{"function":<56}{"calls":>8}{"wall [s]":>11}{"mean [ms]":>11}{"cpu [s]":>10}'
+             f'{"in [MiB]":>10}{"peak [MiB]":>12}{"jit [s]":>9}']
+    for name, s in rows:
+        peak = '-' if s['peak_bytes'] is None else f'{s["peak_bytes"] / 2 ** 20:.1f}'
+        lines.append(f'{name:<56}{s["calls"]:>8}{s["wall"]:>11.4f}{s["wall_mean"] * 1000:>11.3f}{s["cpu"]:>10.4f}'
+                     f'{s["bytes_in"] / 2 ** 20:>10.1f}{peak:>12}{s["compile"]:>9.3f}')
+    return '\n'.join(lines)
+
+
+def export_chrome_trace(path: str):
+    """Write the recorded calls as complete events of the Chrome trace format (chrome://tracing, Perfetto)."""
+    trace = [{'name': e['name'], 'ph': 'X', 'ts': e['start'] * 1e6, 'dur': e['wall'] * 1e6, 'pid': os.getpid(),
+              'tid': e['tid'], 'args': {'cpu_s': e['cpu'], 'bytes_in': e['bytes_in'], 'peak_bytes': e['peak_bytes'],
+                                        'compile_s': e['compile']}}
+             for e in events()]
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+
+
+def _report_at_exit():
+    print(summary(), file=sys.stderr)
+    if os.environ.get('TMLABPY_PROFILE_TRACE'):
+        export_chrome_trace(os.environ['TMLABPY_PROFILE_TRACE'])
+
+
+if os.environ.get('TMLABPY_PROFILE', '0') not in ('', '0'):
+    enable(memory=os.environ['TMLABPY_PROFILE'] == 'memory')
+    atexit.register(_report_at_exit)
@@ -8,5 +8,7 @@ def do_test(obj):
         test_name = methods[i][0]
         try:
             eval(f'object_tested.{test_name}()')
-        finally:
-            print(f'Test {i+1}/{len(methods)} Passed.')
+        except Exception:
+            print(f'Test {i+1}/{len(methods)} Failed.')
+            raise
+        print(f'Test {i+1}/{len(methods)} Passed.')
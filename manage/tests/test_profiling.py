@@ -0,0 +1,91 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+from manage import profiling, testing
+from signal_processing import signal, feature_extraction
+
+
+class Tests(object):
+    def test_disabled(self):
+        profiling.reset()
+        signal.stft(np.random.normal(0, 1, 1024))
+        assert profiling.events() == []
+
+    def test_records_calls(self):
+        a = np.random.normal(0, 1, 1024)
+        profiling.reset()
+        with profiling.profile():
+            spg = signal.stft(a)
+            feature_extraction.pse(spg)
+            feature_extraction.pse(spg)
+        stats = profiling.stats()
+        assert stats['signal_processing.signal.stft']['calls'] == 1
+        assert stats['signal_processing.signal.stft']['bytes_in'] == a.nbytes
+        assert stats['signal_processing.feature_extraction.pse']['calls'] == 2
+        assert stats['signal_processing.signal.stft']['peak_bytes'] is None
+        assert 'signal_processing.signal.stft' in profiling.summary()
+        profiling.reset()
+
+    def test_compile(self):
+        # a new process with an empty numba cache directory compiles the kernels on the first call
+        code = ('import numpy as np\n'
+                'from manage import profiling\n'
+                'from signal_processing import feature_extraction\n'
+                'with profiling.profile():\n'
+                '    with profiling.stage("features"):\n'
+                '        feature_extraction.grad_change(np.random.normal(0, 1, 64))\n'
+                '    feature_extraction.grad_change(np.random.normal(0, 1, 64))\n'
+                'stats = profiling.stats()\n'
+                'call = stats["signal_processing.feature_extraction.grad_change"]\n'
+                'assert call["calls"] == 2 and stats["features"]["compile"] >= call["compile"] > 0\n'
+                'first, second = [e["compile"] for e in profiling.events() if e["name"].endswith("grad_change")]\n'
+                'assert first > 0 and second == 0\n')
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        with tempfile.TemporaryDirectory() as directory:
+            env = dict(os.environ, NUMBA_CACHE_DIR=directory, PYTHONPATH=root)
+            env.pop('TMLABPY_PROFILE', None)
+            subprocess.run([sys.executable, '-c', code], check=True, env=env)
+
+    def test_bounded_events(self):
+        profiling.reset()
+        with profiling.profile(max_events=10):
+            for _ in range(25):
+                signal.diff(np.arange(10.))
+        assert len(profiling.events()) == 10
+        assert profiling.stats()['signal_processing.signal.diff']['calls'] == 25
+        profiling.enable(max_events=profiling.MAX_EVENTS)
+        profiling.disable()
+        profiling.reset()
+
+    def test_memory(self):
+        profiling.reset()
+        with profiling.profile(memory=True):
+            with profiling.stage('features'):
+                spg = signal.stft(np.random.normal(0, 1, 4096))
+                feature_extraction.pcent(spg)
+        stats = profiling.stats()
+        assert stats['signal_processing.signal.stft']['peak_bytes'] >= spg.nbytes
+        assert stats['features']['peak_bytes'] >= stats['signal_processing.signal.stft']['peak_bytes']
+        assert stats['features']['wall'] >= stats['signal_processing.signal.stft']['wall']
+        profiling.reset()
+
+    def test_chrome_trace(self):
+        profiling.reset()
+        with profiling.profile():
+            signal.diff(np.arange(10.))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'trace.json')
+            profiling.export_chrome_trace(path)
+            with open(path) as f:
+                trace = json.load(f)
+        assert [e['name'] for e in trace['traceEvents']] == ['signal_processing.signal.diff']
+        assert trace['traceEvents'][0]['ph'] == 'X'
+        profiling.reset()
+
+
+testing.do_test(Tests)
@@ -0,0 +1,49 @@
+"""Compiled loop kernels of feature_extraction, processing one signal per row of a 2-D array.
+
+The kernels are compiled for explicit signatures when this module is imported,
+and the machine code is cached next to it (numba cache=True), so only the first import
+on a machine compiles them; later imports, including in new worker processes, load the cache.
+This module is imported on first use of the kernels, so importing feature_extraction
+does not import numba.
+"""
+import numpy as np
+from numba import njit
+
+_ROWS = 'float64[:, :]'  # one signal per row
+
+
+@njit(f'int64[:]({_ROWS})', cache=True)
+def grad_change(x):
+    count = np.zeros(x.shape[0], dtype=np.int64)
+    for c in range(x.shape[0]):
+        for i in range(x.shape[1]-1):
+            if x[c, i+1]-x[c, i] < 0:
+                count[c] += 1
+    return count
+
+
+# The prefix kernels fill a preallocated array, int32 when the counts fit in it, to halve its size.
+_PREFIX = [f'void({_ROWS}, int32[:, :])', f'void({_ROWS}, int64[:, :])']
+
+
+@njit(_PREFIX, cache=True)
+def sign_changes(x, out):
+    """out[c, m] = sum over k in [1, m] of |sign(x[c, k]) - sign(x[c, k-1])|, skipping NaN."""
+    if x.shape[1] == 0:
+        return
+    for c in range(x.shape[0]):
+        out[c, 0] = 0
+        for k in range(1, x.shape[1]):
+            step = np.abs(np.sign(x[c, k]) - np.sign(x[c, k-1]))
+            out[c, k] = out[c, k-1] + (int(step) if step == step else 0)
+
+
+@njit(_PREFIX, cache=True)
+def negative_steps(x, out):
+    """out[c, m] = number of k in [1, m] with x[c, k] - x[c, k-1] < 0."""
+    if x.shape[1] == 0:
+        return
+    for c in range(x.shape[0]):
+        out[c, 0] = 0
+        for k in range(1, x.shape[1]):
+            out[c, k] = out[c, k-1] + (x[c, k]-x[c, k-1] < 0)
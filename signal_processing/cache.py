@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+
+import numpy as np
+
+from signal_processing import signal
+
+
+class SpectralCache(object):
+    """Content-addressed cache for spectrograms and wavelet decompositions.
+
+    Results are keyed by a hash of the input array and the call parameters.
+    They are stored on disk as .npy files, one directory per entry, and returned as read-only
+    memory maps. The least recently used entries are evicted once the directory grows over max_bytes.
+    The most recently used entries are also kept in memory.
+
+    Parameters
+    ----------
+    directory: str
+        Directory where the entries are stored. Created if it does not exist.
+
+    max_bytes: int, optional
+        Maximum total size of the entries on disk. Defaults to 1 GiB.
+
+    max_memory_items: int, optional
+        Number of entries kept in memory. 0 disables the in-memory tier. Defaults to 32.
+
+    Examples
+    --------
+    >>> cache = SpectralCache('/tmp/tmlab_cache')
+    >>> spg = cache.stft(np.random.normal(0, 1, 640), winsize=16)
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 2 ** 30, max_memory_items: int = 32):
+        self.directory = os.fspath(directory)
+        self.max_bytes = max_bytes
+        self.max_memory_items = max_memory_items
+        self._memory = OrderedDict()
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(name: str, x: any, **params) -> str:
+        """Return the hash identifying a call of function name on x with params."""
+        x = np.ascontiguousarray(x)
+        h = hashlib.blake2b(digest_size=20)
+        h.update(json.dumps([name, x.dtype.str, x.shape, params], sort_keys=True).encode())
+        h.update(x.view(np.uint8).ravel() if x.size else b'')
+        return h.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def _remember(self, key: str, arrays: list):
+        if self.max_memory_items <= 0:
+            return
+        self._memory[key] = arrays
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _touch(self, key: str):
+        """Mark the entry on disk as used now, as eviction removes the entries used least recently."""
+        try:
+            os.utime(self._path(key))
+        except FileNotFoundError:  # evicted by another process; the arrays in memory stay valid
+            pass
+
+    def get(self, key: str):
+        """Return the list of arrays stored under key, or None on a miss."""
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self._touch(key)
+            return self._memory[key]
+        path = self._path(key)
+        if not os.path.isdir(path):
+            return None
+        n = len(os.listdir(path))
+        arrays = [np.load(os.path.join(path, f'{i}.npy'), mmap_mode='r') for i in range(n)]
+        self._touch(key)
+        self._remember(key, arrays)
+        return arrays
+
+    def put(self, key: str, arrays: list):
+        """Store a list of arrays under key and evict old entries if the cache is full.
+
+        The arrays are made read-only, as they are shared with later hits.
+        """
+        for a in arrays:
+            a.flags.writeable = False
+        path = self._path(key)
+        if not os.path.isdir(path):
+            tmp = tempfile.mkdtemp(dir=self.directory, prefix='.tmp-')
+            for i, a in enumerate(arrays):
+                np.save(os.path.join(tmp, f'{i}.npy'), a)
+            try:
+                os.rename(tmp, path)
+            except OSError:  # written concurrently by another process
+                shutil.rmtree(tmp, ignore_errors=True)
+        self._remember(key, arrays)
+        self.evict(keep=key)
+
+    def entries(self) -> list:
+        """Return (key, size in bytes, last access time) of the entries on disk, oldest first."""
+        entries = []
+        for key in os.listdir(self.directory):
+            path = self._path(key)
+            if key.startswith('.') or not os.path.isdir(path):
+                continue
+            size = sum(e.stat().st_size for e in os.scandir(path))
+            entries.append((key, size, os.stat(path).st_mtime))
+        return sorted(entries, key=lambda e: e[2])
+
+    def evict(self, keep: str = None):
+        """Remove the least recently used entries, except keep, until the total size fits in max_bytes."""
+        entries = self.entries()
+        total = sum(e[1] for e in entries)
+        for key, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(self._path(key), ignore_errors=True)
+            self._memory.pop(key, None)
+            total -= size
+
+    def clear(self):
+        """Remove every entry."""
+        for key, _, _ in self.entries():
+            shutil.rmtree(self._path(key), ignore_errors=True)
+        self._memory.clear()
+
+    def stft(self, x: any, winsize: float = 16, overlap: float = 0.92, nfft: int = 128):
+        """Cached signal_processing.signal.stft."""
+        # params are normalized so that equal calls, such as winsize 16 and 16.0, share an entry
+        key = self.key('stft', x, winsize=float(winsize), overlap=float(overlap), nfft=int(nfft))
+        arrays = self.get(key)
+        if arrays is None:
+            arrays = [signal.stft(x, winsize, overlap, nfft)]
+            self.put(key, arrays)
+        return arrays[0]
+
+    def multi_resolution_analysis(
+            self,
+            x: any,
+            wname: str = 'sym4',
+            level: int = 7,
+            omit_level: list = None,
+            mode: str = 'sym'
+    ):
+        """Cached signal_processing.wavelet.multi_resolution_analysis."""
+        key = self.key('multi_resolution_analysis', x, wname=wname, level=int(level),
+                       omit_level=None if omit_level is None else sorted(int(i) for i in omit_level), mode=mode)
+        arrays = self.get(key)
+        if arrays is None:
+            from signal_processing import wavelet
+            out, coefs = wavelet.multi_resolution_analysis(x, wname, level, omit_level, mode)
+            arrays = [out] + list(coefs)
+            self.put(key, arrays)
+        return arrays[0], list(arrays[1:])
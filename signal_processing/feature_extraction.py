@@ -1,9 +1,14 @@
+import sys
+
 import numpy as np
-from numba import jit
+
+from manage.profiling import compiling, instrument
+
+_PREFIX_BLOCK = 1 << 20  # values per block of prefix counts, which bounds their memory on long recordings
 
 
-@jit
-def pse(spg: any, fmin: int = 0, fmax: int = 64):
+@instrument
+def pse(spg: any, fmin: int = 0, fmax: int = 64, axis: int = -2):
     """Compute the spectral entropy from input spectrogram.
 
     Spectral entropy (SE) is a measure of the frequency distribution og the signal.
@@ -13,7 +18,7 @@ def pse(spg: any, fmin: int = 0, fmax: int = 64):
     Parameters
     ----------
     spg: array_like
-        2-D Spectrogram.
+        2-D Spectrogram of shape (freq, time), or N-D such as (channels, freq, time).
 
     fmin: int, optional
         The smallest frequency component of a signal. Defaults to 0.
@@ -21,27 +26,29 @@ def pse(spg: any, fmin: int = 0, fmax: int = 64):
     fmax: int, optional
         The maximum frequency component of a signal. Defaults to 64.
 
+    axis: int, optional
+        Frequency axis of spg. Defaults to -2.
+
     Returns
     -------
     se : array_like
-        Spectral entropy normalized by the maximum entropy.
+        Spectral entropy normalized by the maximum entropy, of the shape of spg without the frequency axis.
     """
-    se = np.zeros(spg.shape[1])
-    for i in range(spg.shape[0]):
-        p_k = spg[i, :] / np.sum(spg, axis=0)
-        p_k = np.where((p_k == 0), 0.0001, p_k)
-        se += p_k * np.log2(p_k)
+    spg = np.moveaxis(np.asarray(spg, dtype=float), axis, -2)
+    p_k = spg / np.sum(spg, axis=-2, keepdims=True)
+    p_k[p_k == 0] = 0.0001
+    se = np.sum(p_k * np.log2(p_k), axis=-2)
     return -se / np.log2(fmax + 1 - fmin)
 
 
-@jit
-def pcent(spg: any, fmin: int = 0, fmax: int = 64):
+@instrument
+def pcent(spg: any, fmin: int = 0, fmax: int = 64, axis: int = -2):
     """Compute the spectral centroid of the signal from its spectrogram.
 
     Parameters
     ----------
     spg: array_like
-        Spectrogram of the signal.
+        Spectrogram of the signal of shape (freq, time), or N-D such as (channels, freq, time).
 
     fmin: int, optional
         The smallest frequency component of a signal. Defaults to 0.
@@ -49,46 +56,66 @@ def pcent(spg: any, fmin: int = 0, fmax: int = 64):
     fmax: int, optional
         The maximum frequency component of a signal. Defaults to 64.
 
+    axis: int, optional
+        Frequency axis of spg. Defaults to -2.
+
     Returns
     -------
     sc : array_like
-        Spectral centroid of the signal.
+        Spectral centroid of the signal, of the shape of spg without the frequency axis.
 
     See Also
     --------
     pse : calculate spectral entropy from spectrogram.
     """
+    spg = np.moveaxis(np.asarray(spg, dtype=float), axis, -2)
     res = spg.shape[-2] // fmax
     f = np.arange(spg.shape[-2], fmin+1, -res) - 1
-    den = np.sum(spg[0:-1, :], axis=0)
-    num = np.zeros_like(den)
-    for i in range(len(num)):
-        num[i] = np.sum(f*spg[0:-1, i], axis=0)
+    den = np.sum(spg[..., 0:-1, :], axis=-2)
+    num = np.matmul(f, spg[..., 0:-1, :])
     return num/den
 
 
-@jit
-def pflux(spg: any):
+@instrument
+def pflux(spg: any, axis: int = -2):
     """Compute the spectral flux of the signal.
 
     Parameters
     ----------
     spg : array_like
-        Spectrogram of the signal.
+        Spectrogram of the signal of shape (freq, time), or N-D such as (channels, freq, time).
+
+    axis: int, optional
+        Frequency axis of spg. Time is the last of the other axes. Defaults to -2.
 
     Returns
     -------
     flux : array_like
-        Spectral flux of the signal.
+        Spectral flux of the signal, of the shape of spg without the frequency axis. The last frame is 0.
     """
-    flux = np.zeros(spg.shape[-1])
-    for i in range(len(flux) - 1):
-        flux[i] = (np.sum(spg[:, i + 1]) - np.sum(spg[:, i])) ** 2
+    power = np.sum(np.moveaxis(np.asarray(spg, dtype=float), axis, -2), axis=-2)
+    flux = np.zeros(power.shape)
+    flux[..., 0:-1] = np.square(np.diff(power, axis=-1))
     return flux
 
 
-@jit
-def grad_change(x):
+def _load_kernels():
+    """Import _kernels on first use, attributing the time of loading or compiling them to the profiled calls."""
+    kernels = sys.modules.get('signal_processing._kernels')
+    if kernels is None:
+        with compiling():
+            from signal_processing import _kernels as kernels
+    return kernels
+
+
+def _rows(x: any, axis: int) -> tuple:
+    """Return x as a float64 array of one signal per row, and the shape of the other axes."""
+    x = np.moveaxis(np.asarray(x, dtype=np.float64), axis, -1)
+    return x.reshape(-1, x.shape[-1]), x.shape[:-1]
+
+
+@instrument
+def grad_change(x: any, axis: int = -1):
     """Compute the number of times the positive and negative of the signal's slope is inverted.
 
     This is different from the zero crossing rate.
@@ -96,28 +123,113 @@ def grad_change(x):
     Parameters
     ----------
     x: any, array_like
-        Input 1-D array.
+        Input 1-D array, or N-D array such as (channels, samples).
+
+    axis: int, optional
+        Time axis of x. Defaults to -1.
 
     Returns
     -------
-    count: int
-        The number of times the positive and negative of the signal's slope is inverted.
+    count: int or ndarray
+        The number of times the positive and negative of the signal's slope is inverted,
+        or an array of the counts of each channel for N-D input.
     """
-    count = 0
-    for i in range(len(x)-1):
-        if x[i+1]-x[i] < 0:
-            count += 1
-    return count
+    _kernels = _load_kernels()
+    rows, shape = _rows(x, axis)
+    count = _kernels.grad_change(rows)
+    return int(count[0]) if len(shape) == 0 else count.reshape(shape)
+
+
+def _prefix(kernel, rows: np.ndarray, max_step: int) -> np.ndarray:
+    """Return the prefix counts of a kernel of _kernels, in int32 when max_step * n fits in it."""
+    dtype = np.int32 if max_step * rows.shape[1] < 2**31 else np.int64
+    out = np.empty(rows.shape, dtype=dtype)
+    kernel(rows, out)
+    return out
+
+
+def _sweep(rows: np.ndarray, winsizes: list, overlap: float, rate) -> list:
+    """Compute a framewise rate for several window sizes, block by block of samples.
+
+    rate(span, w, at, out) writes the rate of the frames whose sample o is span[:, at(o)] into out,
+    span being the samples of a block and the following samples its last frames need.
+    """
+    n = rows.shape[1]
+    params = []
+    for winsize in winsizes:
+        overlaps = int(winsize * overlap)
+        shift = int(winsize - overlaps)
+        params.append((int(winsize), shift, max(int((n - overlaps) / (winsize - overlaps)), 0)))
+    rates = [np.empty((rows.shape[0], n_frames)) for _, _, n_frames in params]
+    margin = max([w for w, _, _ in params], default=0)
+    block = max(_PREFIX_BLOCK // max(rows.shape[0], 1), margin, 1)
+    for start in range(0, n, block):
+        stop = min(start + block, n)
+        span = rows[:, start:min(stop + margin, n)]
+        for (w, shift, n_frames), out in zip(params, rates):
+            first, last = -(-start // shift), min(-(-stop // shift), n_frames)  # frames starting in the block
+            if last > first:
+                offset = first * shift - start
+                rate(span, w, lambda o: slice(offset + o, offset + o + shift * (last - first - 1) + 1, shift),
+                     out[:, first:last])
+    return rates
+
+
+@instrument
+def zero_crossing_sweep(x: any, winsizes: list, overlap: float = 0.92, axis: int = -1) -> list:
+    """Compute the zero crossing rate for several window sizes in one pass over the signal.
+
+    The sign changes are accumulated into prefix sums, block by block of samples so that their memory
+    stays bounded, and each window size costs O(number of frames) whatever its length and overlap.
+
+    Parameters
+    ----------
+    x : array_like
+        Input array, 1-D or N-D such as (channels, samples).
 
+    winsizes: list
+        Window sizes, in samples.
 
-@jit
-def zero_crossing(x: any, winsize: float = 16, overlap: float = 0.92):
+    overlap: float, optional
+        Percentage of overlapping samples to window length.
+        Defaults to 0.92 (92%).
+
+    axis: int, optional
+        Time axis of x. Defaults to -1.
+
+    Returns
+    -------
+    rates : list
+        Zero crossing rate for each window size, as returned by zero_crossing.
+    """
+    _kernels = _load_kernels()
+    rows, shape = _rows(x, axis)
+
+    def rate(span, w, at, out):
+        changes = _prefix(_kernels.sign_changes, span, 2)
+        # the frame is compared with itself delayed by one sample and zero-padded at both ends
+        np.abs(np.sign(span[:, at(0)]), out=out)
+        if w > 1:
+            out += changes[:, at(w-2)]
+            out -= changes[:, at(0)]
+            out += np.abs(np.sign(span[:, at(w-1)]))
+        out *= 1/(2*w)
+        if np.isnan(span.sum()):  # nans[:, m] is the number of NaN in span[:, 0:m]
+            nans = np.zeros((span.shape[0], span.shape[1] + 1), dtype=changes.dtype)
+            np.cumsum(np.isnan(span), axis=1, out=nans[:, 1:])
+            out[nans[:, at(w)] > nans[:, at(0)]] = np.nan
+
+    return [r.reshape(shape + (-1,)) for r in _sweep(rows, winsizes, overlap, rate)]
+
+
+@instrument
+def zero_crossing(x: any, winsize: float = 16, overlap: float = 0.92, axis: int = -1):
     """Compute zero crossing rate.
 
     Parameters
     ----------
     x : array_like
-        Input array.
+        Input array, 1-D or N-D such as (channels, samples).
 
     winsize: float, optional
         Number of samples of the analysis window size.
@@ -127,22 +239,100 @@ def zero_crossing(x: any, winsize: float = 16, overlap: float = 0.92):
         Percentage of overlapping samples to window length.
         Defaults to 0.92 (92%).
 
+    axis: int, optional
+        Time axis of x. Defaults to -1.
+
     Returns
     -------
     zero_crossing_rate : array_like
-        Zero crossing rate of the signal.
+        Zero crossing rate of the signal. For N-D input, the other axes of x come first,
+        such as (channels, frames), as the features computed from stft.
+
+    See Also
+    --------
+    zero_crossing_sweep: rates for several window sizes at once.
+    """
+    return zero_crossing_sweep(x, [winsize], overlap, axis)[0]
+
+
+@instrument
+def grad_change_sweep(x: any, winsizes: list, overlap: float = 0.92, axis: int = -1) -> list:
+    """Compute the framewise rate of negative slopes for several window sizes in one pass over the signal.
+
+    Parameters
+    ----------
+    x : array_like
+        Input array, 1-D or N-D such as (channels, samples).
+
+    winsizes: list
+        Window sizes, in samples. At least 2.
+
+    overlap: float, optional
+        Percentage of overlapping samples to window length.
+        Defaults to 0.92 (92%).
+
+    axis: int, optional
+        Time axis of x. Defaults to -1.
+
+    Returns
+    -------
+    rates : list
+        Rate for each window size, as returned by grad_change_rate.
     """
+    _kernels = _load_kernels()
+    assert min([int(w) for w in winsizes], default=2) >= 2, "winsize must be at least 2 samples."
+    rows, shape = _rows(x, axis)
+
+    def rate(span, w, at, out):
+        negatives = _prefix(_kernels.negative_steps, span, 1)
+        np.subtract(negatives[:, at(w-1)], negatives[:, at(0)], out=out)
+        out /= w - 1
+
+    return [r.reshape(shape + (-1,)) for r in _sweep(rows, winsizes, overlap, rate)]
+
+
+@instrument
+def grad_change_rate(x: any, winsize: float = 16, overlap: float = 0.92, axis: int = -1):
+    """Compute grad_change in each analysis frame, aligned with the frames of signal.stft.
+
+    Parameters
+    ----------
+    x : array_like
+        Input array, 1-D or N-D such as (channels, samples).
+
+    winsize: float, optional
+        Number of samples of the analysis window size.
+        Defaults to 16.
+
+    overlap: float, optional
+        Percentage of overlapping samples to window length.
+        Defaults to 0.92 (92%).
 
-    overlaps = int(winsize * overlap)
-    zero_crossing_rate = np.zeros(int((len(x) - overlaps) / (winsize - overlaps)))
-    shift = int(winsize - overlaps)
+    axis: int, optional
+        Time axis of x. Defaults to -1.
 
-    for i in range(len(zero_crossing_rate)):
+    Returns
+    -------
+    rate : array_like
+        Fraction of the winsize - 1 consecutive differences of each frame that are negative,
+        of shape (frames,), or with the other axes of x first for N-D input.
 
-        frame = x[shift * i:shift * i + int(winsize)]
-        next_frame = np.zeros_like(frame)
-        next_frame[1:-1] = frame[0:-2]
+    See Also
+    --------
+    grad_change: count over the whole signal.
+    grad_change_sweep: rates for several window sizes at once.
+    """
+    return grad_change_sweep(x, [winsize], overlap, axis)[0]
 
-        zero_crossing_rate[i] = 1/(2*len(frame)) * np.sum(np.abs(np.sign(frame)-np.sign(next_frame)))
 
-    return zero_crossing_rate
+def warmup():
+    """Load the compiled kernels of grad_change, zero_crossing and their framewise variants.
+
+    The kernels are loaded from the on-disk cache, or compiled and cached on the first run on a machine.
+    Call it when a worker process starts, so that the first feature computation does not pay the load.
+    """
+    _kernels = _load_kernels()
+    x = np.zeros((1, 16))
+    _kernels.grad_change(x)
+    _kernels.sign_changes(x, np.empty(x.shape, dtype=np.int32))
+    _kernels.negative_steps(x, np.empty(x.shape, dtype=np.int32))
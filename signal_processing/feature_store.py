@@ -0,0 +1,360 @@
+"""Columnar storage of framewise features in partitioned Parquet or Arrow files.
+
+Each row holds the features of one frame of one channel of one record, with the columns::
+
+    record_id | channel | frame | time | <feature 0> | <feature 1> | ... | <extra columns>
+
+Rows are buffered by FeatureWriter and written in batches, one file per batch and partition,
+under hive-style directories such as root/subject=s01/part-....parquet. Readers open the whole
+directory as one dataset: only the columns asked for are read, and filters on the partition
+columns skip directories while filters on the other columns skip Parquet row groups by their
+statistics. 'arrow' files are uncompressed Arrow IPC, which is read by memory-mapping without
+decoding; 'parquet' files are compressed and smaller.
+"""
+import json
+import os
+import uuid
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from pyarrow import fs as pafs
+
+from manage.profiling import instrument
+
+FORMATS = {'parquet': 'parquet', 'arrow': 'arrow'}  # format: file extension
+KEYS = ('record_id', 'channel', 'frame', 'time')
+SCHEMA_FILE = '_schema.arrow'  # files starting with '_' are not part of the dataset
+
+
+def _repeat(values: pa.Array, indices: np.ndarray) -> pa.Array:
+    return values.take(pa.array(indices))
+
+
+def _read_schema(root: str) -> pa.Schema:
+    path = os.path.join(root, SCHEMA_FILE)
+    assert os.path.exists(path), f"{root} is not a feature store."
+    with pa.OSFile(path, 'rb') as f:
+        return pa.ipc.open_file(f).schema
+
+
+class FeatureWriter(object):
+    """Append framewise features of records to a feature store, written in batches.
+
+    Parameters
+    ----------
+    root: str
+        Directory of the store, created if it does not exist. Files already in it are kept,
+        so a store can be filled by several writers, one after another or in parallel.
+
+    features: list
+        Names of the feature columns, such as ['pse', 'pcent', 'pflux', 'zero_crossing', 'ssa'].
+        Features not given to an append are stored as null.
+
+    columns: dict, optional
+        Name and data-type of extra columns holding one value per record, such as {'subject': 'string'}.
+
+    partition_by: tuple, optional
+        Columns among 'record_id', 'channel' and columns whose values name the directories of the files.
+        Defaults to no partitioning.
+
+    format: str, optional
+        'parquet' or 'arrow'. Defaults to 'parquet'.
+
+    compression: str, optional
+        Parquet codec, such as 'zstd', 'snappy' or 'none'. Defaults to 'zstd'.
+
+    dtype: data-type, optional
+        Type of the feature columns. Defaults to float32.
+
+    batch_rows: int, optional
+        Number of buffered rows above which a batch is written. Defaults to 1,000,000.
+
+    Examples
+    --------
+    >>> with FeatureWriter('features', ['pse', 'zero_crossing'], columns={'subject': 'string'},
+    ...                    partition_by=('subject',)) as writer:
+    ...     for record_id, x in records.items():
+    ...         spg = signal.stft(x)
+    ...         writer.append(record_id, {'pse': pse(spg), 'zero_crossing': zero_crossing(x)},
+    ...                       fs=128, hop=2, subject=subjects[record_id])
+    """
+
+    def __init__(
+            self,
+            root: str,
+            features: list,
+            columns: dict = None,
+            partition_by: tuple = (),
+            format: str = 'parquet',
+            compression: str = 'zstd',
+            dtype: any = 'float32',
+            batch_rows: int = 1000000
+    ):
+        assert format in FORMATS, f"format must be one of {tuple(FORMATS)}."
+        columns = {} if columns is None else dict(columns)
+        names = list(KEYS) + list(features) + list(columns)
+        assert len(set(names)) == len(names), f"feature and column names must be unique and differ from {KEYS}."
+        assert set(partition_by) <= {'record_id', 'channel'} | set(columns), \
+            "partition_by must be chosen from 'record_id', 'channel' and columns."
+
+        self.root = os.fspath(root)
+        self.features = list(features)
+        self.columns = columns
+        self.partition_by = tuple(partition_by)
+        self.format = format
+        self.compression = compression
+        self.dtype = np.dtype(dtype)
+        self.batch_rows = batch_rows
+        fields = [pa.field('record_id', pa.string()), pa.field('channel', pa.string()),
+                  pa.field('frame', pa.int32()), pa.field('time', pa.float64())]
+        fields += [pa.field(name, pa.from_numpy_dtype(self.dtype)) for name in self.features]
+        fields += [pa.field(name, t if isinstance(t, pa.DataType) else pa.type_for_alias(str(t)))
+                   for name, t in columns.items()]
+        meta = {'features': self.features, 'partition_by': list(self.partition_by), 'format': format}
+        self.schema = pa.schema(fields, metadata={'feature_store': json.dumps(meta)})
+        self._token = uuid.uuid4().hex[:12]  # keeps the files of concurrent writers apart
+        self._batches = []
+        self._n_pending = 0
+        self._n_written = 0
+        self.n_rows = 0
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, SCHEMA_FILE)
+        if os.path.exists(path):
+            assert _read_schema(self.root).equals(self.schema, check_metadata=True), \
+                f"{self.root} holds a feature store of other features, columns, partitioning or format."
+        else:
+            with pa.OSFile(path, 'wb') as f, pa.ipc.new_file(f, self.schema):
+                pass
+
+    @instrument
+    def append(
+            self,
+            record_id: str,
+            features: dict,
+            fs: float = 1,
+            hop: int = 1,
+            t0: float = 0,
+            channels: list = None,
+            **columns
+    ):
+        """Append the features of one record.
+
+        Parameters
+        ----------
+        record_id: str
+            Identifier of the record.
+
+        features: dict
+            Feature name: framewise values, of shape (frames,) or (channels, frames).
+            All features must have the same shape.
+
+        fs: float, optional
+            Sampling frequency of the signal. Defaults to 1.
+
+        hop: int, optional
+            Number of samples between consecutive frames, int(winsize - int(winsize * overlap))
+            for the features of stft. Frame i is stored at time t0 + i * hop / fs. Defaults to 1.
+
+        t0: float, optional
+            Time of the first frame, in seconds. Defaults to 0.
+
+        channels: list, optional
+            Name of each channel. Defaults to '0', '1', ...
+
+        columns: optional
+            Value of each extra column given to the writer for this record.
+        """
+        assert set(features) <= set(self.features), f"features must be chosen from {self.features}."
+        assert set(columns) == set(self.columns), f"the values of the columns {list(self.columns)} are required."
+        values = {name: np.asarray(v, dtype=self.dtype) for name, v in features.items()}
+        shapes = {v.shape for v in values.values()}
+        assert len(shapes) == 1, "all features must have the same shape."
+        shape = shapes.pop()
+        assert len(shape) in (1, 2), "features must be of shape (frames,) or (channels, frames)."
+        n_channels, n_frames = (1, shape[0]) if len(shape) == 1 else shape
+        channels = [str(c) for c in range(n_channels)] if channels is None else [str(c) for c in channels]
+        assert len(channels) == n_channels, "channels must have one name per channel."
+
+        n = n_channels * n_frames
+        frame = np.tile(np.arange(n_frames, dtype=np.int32), n_channels)
+        arrays = [_repeat(pa.array([str(record_id)]), np.zeros(n, dtype=np.int32)),
+                  _repeat(pa.array(channels), np.repeat(np.arange(n_channels, dtype=np.int32), n_frames)),
+                  pa.array(frame),
+                  pa.array(t0 + frame * (hop / fs))]
+        for name in self.features:
+            v = values.get(name)
+            arrays.append(pa.nulls(n, self.schema.field(name).type) if v is None else pa.array(v.reshape(-1)))
+        for name, value in columns.items():
+            arrays.append(_repeat(pa.array([value], self.schema.field(name).type), np.zeros(n, dtype=np.int32)))
+        self._batches.append(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        self._n_pending += n
+        self.n_rows += n
+        if self._n_pending >= self.batch_rows:
+            self.flush()
+        return self
+
+    @instrument
+    def flush(self):
+        """Write the buffered rows."""
+        if not self._batches:
+            return
+        table = pa.Table.from_batches(self._batches, schema=self.schema)
+        if self.format == 'parquet':
+            file_format = ds.ParquetFileFormat()
+            options = file_format.make_write_options(compression=self.compression)
+        else:
+            file_format = ds.IpcFileFormat()
+            options = None
+        ds.write_dataset(
+            table, self.root, format=file_format, file_options=options,
+            partitioning=ds.partitioning(pa.schema([self.schema.field(c) for c in self.partition_by]),
+                                         flavor='hive') if self.partition_by else None,
+            basename_template=f'part-{self._token}-{self._n_written:05d}-{{i}}.{FORMATS[self.format]}',
+            existing_data_behavior='overwrite_or_ignore',
+            max_rows_per_group=min(self.batch_rows, 1 << 20)
+        )
+        self._n_written += 1
+        self._batches = []
+        self._n_pending = 0
+
+    def close(self):
+        """Write the remaining rows."""
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class FeatureStore(object):
+    """Read-only access to a feature store written by FeatureWriter.
+
+    Parameters
+    ----------
+    root: str
+        Directory of the store.
+
+    memory_map: bool, optional
+        If True (default), files are memory-mapped, so that Arrow files are read without a copy.
+
+    Examples
+    --------
+    >>> store = FeatureStore('features')
+    >>> table = store.read(['record_id', 'time', 'pse'], filter=pc.field('subject') == 's01', t_stop=600)
+    >>> store.record('r0001', ['pse'])['pse'].shape
+    (1, 11519)
+    """
+
+    def __init__(self, root: str, memory_map: bool = True):
+        self.root = os.fspath(root)
+        schema = _read_schema(self.root)
+        meta = json.loads(schema.metadata[b'feature_store'])
+        self.features = meta['features']
+        self.partition_by = tuple(meta['partition_by'])
+        self.format = meta['format']
+        partitioning = ds.partitioning(pa.schema([schema.field(c) for c in self.partition_by]), flavor='hive') \
+            if self.partition_by else None
+        self.dataset = ds.dataset(self.root, schema=schema, format='parquet' if self.format == 'parquet' else 'ipc',
+                                  partitioning=partitioning, filesystem=pafs.LocalFileSystem(use_mmap=memory_map))
+
+    @property
+    def schema(self) -> pa.Schema:
+        return self.dataset.schema
+
+    @staticmethod
+    def _filter(records: any, channels: any, t_start: float, t_stop: float, filter: any):
+        expressions = [] if filter is None else [filter]
+        for name, values in (('record_id', records), ('channel', channels)):
+            if values is not None:
+                values = [values] if isinstance(values, (str, int)) else values
+                expressions.append(pc.field(name).isin([str(v) for v in values]))
+        if t_start is not None:
+            expressions.append(pc.field('time') >= t_start)
+        if t_stop is not None:
+            expressions.append(pc.field('time') < t_stop)
+        if not expressions:
+            return None
+        expression = expressions[0]
+        for e in expressions[1:]:
+            expression = expression & e
+        return expression
+
+    @instrument
+    def read(
+            self,
+            columns: list = None,
+            records: any = None,
+            channels: any = None,
+            t_start: float = None,
+            t_stop: float = None,
+            filter: any = None
+    ) -> pa.Table:
+        """Read the rows matching the conditions, with only the columns asked for.
+
+        Parameters
+        ----------
+        columns: list, optional
+            Columns read. Defaults to all columns.
+
+        records: str or list, optional
+            Identifiers of the records read. Defaults to all records.
+
+        channels: str or list, optional
+            Names of the channels read. Defaults to all channels.
+
+        t_start, t_stop: float, optional
+            Only frames with t_start <= time < t_stop are read.
+
+        filter: Expression, optional
+            Further condition on any column, such as pyarrow.compute.field('subject') == 's01'.
+
+        Returns
+        -------
+        table: pyarrow.Table
+            The rows, with .to_pandas() or .column(name).to_numpy() for analysis.
+        """
+        return self.dataset.to_table(columns=columns, filter=self._filter(records, channels, t_start, t_stop, filter))
+
+    def records(self, filter: any = None) -> list:
+        """Identifiers of the records stored, in sorted order."""
+        table = self.dataset.to_table(columns=['record_id'], filter=filter)
+        return sorted(pc.unique(table.column('record_id')).to_pylist())
+
+    @instrument
+    def record(self, record_id: str, features: list = None, channels: any = None) -> dict:
+        """Framewise features of one record, as given to FeatureWriter.append.
+
+        Parameters
+        ----------
+        record_id: str
+            Identifier of the record.
+
+        features: list, optional
+            Names of the features read. Defaults to all features.
+
+        channels: str or list, optional
+            Names of the channels read. Defaults to all channels, in the order they were written.
+
+        Returns
+        -------
+        features: dict
+            Feature name: ndarray of shape (channels, frames). Frames that were not stored are NaN.
+        """
+        features = self.features if features is None else list(features)
+        table = self.read(['channel', 'frame'] + features, records=record_id, channels=channels)
+        if channels is None:
+            order = pc.unique(table.column('channel'))
+        else:
+            order = pa.array([str(c) for c in ([channels] if isinstance(channels, (str, int)) else channels)])
+        channel = pc.index_in(table.column('channel'), value_set=order).to_numpy()
+        frame = table.column('frame').to_numpy()
+        shape = (len(order), int(frame.max()) + 1 if len(frame) else 0)
+        out = {}
+        for name in features:
+            out[name] = np.full(shape, np.nan, dtype=table.schema.field(name).type.to_pandas_dtype())
+            out[name][channel, frame] = table.column(name).to_numpy(zero_copy_only=False)
+        return out
@@ -0,0 +1,170 @@
+"""Pluggable real FFT of the spectral transforms.
+
+signal.stft, and the streaming STFT through signal._spectrogram, transform their frames with
+the backend returned by get_backend():
+
+- 'numpy': numpy.fft, always available.
+- 'scipy': scipy.fft, which can split a batch of frames over worker threads.
+- 'pyfftw': FFTW through pyFFTW when it is installed, with one plan built per frame matrix shape
+  and thread, kept in a bounded cache.
+
+The backend is chosen by set_backend, or on first use from the environment variable TMLABPY_FFT
+('numpy', 'scipy', 'pyfftw' or 'auto'). With 'auto', select_backend times the available backends
+on a typical frame matrix and keeps the fastest. Defaults to 'numpy'.
+Analysis windows are cached per (winsize, dtype), and the FFT plans of scipy and pyFFTW are
+reused per transform shape, so repeated transforms of the same size only pay for the FFT itself.
+Backends implement rfft(x, n, axis, overwrite_x, transient), where transient=True tells that the shape
+of x is unlikely to be transformed again, so it is not worth an expensive plan.
+"""
+import functools
+import importlib.util
+import os
+import threading
+import timeit
+
+import numpy as np
+
+
+@functools.lru_cache(maxsize=64)
+def window(winsize: int, dtype: str = 'float64') -> np.ndarray:
+    """Return a read-only hamming window of winsize samples, computed once per (winsize, dtype)."""
+    w = np.hamming(winsize).astype(dtype)
+    w.flags.writeable = False
+    return w
+
+
+class NumpyBackend(object):
+    """numpy.fft. workers is accepted for a common interface and ignored."""
+    name = 'numpy'
+
+    def __init__(self, workers: int = 1):
+        self.workers = 1
+
+    def rfft(self, x: np.ndarray, n: int, axis: int = -1, overwrite_x: bool = False,
+             transient: bool = False) -> np.ndarray:
+        return np.fft.rfft(x, n, axis=axis)
+
+
+class ScipyBackend(object):
+    """scipy.fft, with the transforms of a batch split over workers threads (-1 for all CPUs)."""
+    name = 'scipy'
+
+    def __init__(self, workers: int = 1):
+        import scipy.fft
+        self._fft = scipy.fft
+        self.workers = workers
+
+    def rfft(self, x: np.ndarray, n: int, axis: int = -1, overwrite_x: bool = False,
+             transient: bool = False) -> np.ndarray:
+        return self._fft.rfft(x, n, axis=axis, overwrite_x=overwrite_x, workers=self.workers)
+
+
+class FFTWBackend(object):
+    """FFTW through pyFFTW, with workers threads and the plans of the last max_plans shapes cached.
+
+    A plan owns its input and output buffers, so each thread keeps its own plans.
+    Shapes transformed once, such as the last, shorter block of a long STFT, are planned
+    with FFTW_ESTIMATE instead of planner_effort, as measuring them would cost more than it saves.
+    """
+    name = 'pyfftw'
+
+    def __init__(self, workers: int = 1, planner_effort: str = 'FFTW_MEASURE', max_plans: int = 32):
+        import pyfftw.builders
+        self._builders = pyfftw.builders
+        self.workers = os.cpu_count() if workers == -1 else workers
+        self.planner_effort = planner_effort
+        self.max_plans = max_plans
+        self._local = threading.local()
+
+    def _build(self, shape: tuple, dtype: str, n: int, axis: int, planner_effort: str):
+        return self._builders.rfft(np.empty(shape, dtype=dtype), n, axis=axis, threads=self.workers,
+                                   planner_effort=planner_effort, overwrite_input=True)
+
+    def _plan(self, *key):
+        plan = getattr(self._local, 'plan', None)
+        if plan is None:
+            plan = self._local.plan = functools.lru_cache(maxsize=self.max_plans)(self._build)
+        return plan(*key)
+
+    def rfft(self, x: np.ndarray, n: int, axis: int = -1, overwrite_x: bool = False,
+             transient: bool = False) -> np.ndarray:
+        effort = 'FFTW_ESTIMATE' if transient else self.planner_effort
+        plan = self._plan(x.shape, x.dtype.str, n, axis % x.ndim, effort)
+        return plan(x).copy()  # the output buffer of a plan is reused by its next call
+
+
+BACKENDS = {'numpy': NumpyBackend, 'scipy': ScipyBackend, 'pyfftw': FFTWBackend}
+_MODULES = {'numpy': 'numpy', 'scipy': 'scipy', 'pyfftw': 'pyfftw'}
+
+_backend = None
+
+
+def available() -> list:
+    """Names of the backends whose package is installed."""
+    return [name for name in BACKENDS if importlib.util.find_spec(_MODULES[name]) is not None]
+
+
+def set_backend(name: str, workers: int = 1, **kwargs):
+    """Use a backend for the following transforms and return it.
+
+    Parameters
+    ----------
+    name: str
+        'numpy', 'scipy', 'pyfftw' or 'auto' to use the fastest, as select_backend.
+
+    workers: int, optional
+        Number of threads of a transform, -1 for all CPUs. Keep 1 inside process pools,
+        where the processes already use the CPUs. Defaults to 1.
+
+    kwargs: optional
+        Further options of the backend, such as planner_effort of 'pyfftw'.
+    """
+    global _backend
+    if name == 'auto':
+        select_backend(workers=workers)
+        return _backend
+    assert name in BACKENDS, f"name must be one of {tuple(BACKENDS)} or 'auto'."
+    assert name in available(), f"backend {name!r} requires the {_MODULES[name]} package."
+    _backend = BACKENDS[name](workers, **kwargs)
+    return _backend
+
+
+def get_backend():
+    """Return the backend in use, chosen from TMLABPY_FFT on first call."""
+    if _backend is None:
+        set_backend(os.environ.get('TMLABPY_FFT', 'numpy'))
+    return _backend
+
+
+def select_backend(winsize: int = 16, nfft: int = 128, n_frames: int = 8192, workers: int = 1,
+                   repeat: int = 5) -> dict:
+    """Time the available backends on a frame matrix, and use the fastest.
+
+    Parameters
+    ----------
+    winsize, nfft: int, optional
+        Frame length and transform length, as signal.stft. Defaults to 16 and 128.
+
+    n_frames: int, optional
+        Number of frames transformed at once. Defaults to 8192, the block size of signal.stft.
+
+    workers: int, optional
+        Number of threads of a transform, as set_backend. Defaults to 1.
+
+    repeat: int, optional
+        Number of timed transforms per backend, of which the fastest is kept. Defaults to 5.
+
+    Returns
+    -------
+    timings: dict
+        Backend name: seconds of one transform.
+    """
+    global _backend
+    frames = np.random.RandomState(0).normal(0, 1, (n_frames, winsize)) * window(winsize)
+    backends = {name: BACKENDS[name](workers) for name in available()}
+    timings = {}
+    for name, backend in backends.items():
+        backend.rfft(frames, nfft)  # builds the plans outside of the timing
+        timings[name] = min(timeit.repeat(lambda: backend.rfft(frames, nfft), number=1, repeat=repeat))
+    _backend = backends[min(timings, key=timings.get)]
+    return timings
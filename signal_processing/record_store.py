@@ -0,0 +1,396 @@
+"""Chunked, compressed storage of multi-channel recordings.
+
+A record file holds a (channels, samples) signal split along time into chunks of chunk_size samples,
+each filtered and compressed independently, followed by a JSON index of the chunks and the metadata::
+
+    MAGIC | chunk 0 | chunk 1 | ... | index (JSON) | index size (uint64) | MAGIC
+
+Reading a time window decompresses only the chunks it overlaps, and the last chunks read are
+kept in memory, so segments can be read in any order without loading the whole recording.
+
+Filters are applied before compression: 'delta' stores the difference between consecutive samples
+of integer signals, which makes slowly varying ADC counts small, and 'shuffle' groups the bytes
+of the samples by significance, which makes floats compress better. Both are exact.
+"""
+import json
+import lzma
+import mmap
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from manage.profiling import instrument
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAGIC = b'TMLREC01'
+_SIZE = struct.Struct('<Q')
+FILTERS = ('delta', 'shuffle')
+
+
+def _zstd_compress(data: bytes, level: int) -> bytes:
+    assert zstandard is not None, "codec 'zstd' requires the zstandard package."
+    return zstandard.ZstdCompressor(level=3 if level is None else level).compress(data)
+
+
+def _zstd_decompress(data: bytes) -> bytes:
+    assert zstandard is not None, "codec 'zstd' requires the zstandard package."
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+# name: (compress(data, level), decompress(data))
+CODECS = {
+    'none': (lambda data, level: bytes(data), bytes),
+    'zlib': (lambda data, level: zlib.compress(data, 1 if level is None else level), zlib.decompress),
+    'lzma': (lambda data, level: lzma.compress(data, preset=0 if level is None else level), lzma.decompress),
+    'zstd': (_zstd_compress, _zstd_decompress),
+}
+
+
+def _shuffle(data: np.ndarray, itemsize: int) -> np.ndarray:
+    """Group the bytes of the samples by position: all first bytes, then all second bytes, ..."""
+    out = np.empty(len(data), dtype=np.uint8)
+    n = len(data) // itemsize
+    for j in range(itemsize):  # one strided copy per byte plane is faster than a 2-D transpose
+        out[j * n:(j + 1) * n] = data[j::itemsize]
+    return out
+
+
+def _unshuffle(data: np.ndarray, itemsize: int) -> np.ndarray:
+    out = np.empty(len(data), dtype=np.uint8)
+    n = len(data) // itemsize
+    for j in range(itemsize):
+        out[j::itemsize] = data[j * n:(j + 1) * n]
+    return out
+
+
+def _encode(block: np.ndarray, filters: tuple, codec: str, level: int) -> bytes:
+    if 'delta' in filters:
+        delta = block.copy()
+        delta[:, 1:] = np.diff(block, axis=1)  # integer differences wrap around, and so does the cumsum decoding
+        block = delta
+    data = np.ascontiguousarray(block).reshape(-1).view(np.uint8)
+    if 'shuffle' in filters:
+        data = _shuffle(data, block.dtype.itemsize)
+    return CODECS[codec][0](data.data, level)
+
+
+def _decode(data: bytes, shape: tuple, dtype: np.dtype, filters: tuple, codec: str) -> np.ndarray:
+    data = np.frombuffer(CODECS[codec][1](data), dtype=np.uint8)
+    if 'shuffle' in filters:
+        data = _unshuffle(data, dtype.itemsize)
+    block = data.view(dtype).reshape(shape)
+    if 'delta' in filters:
+        block = np.cumsum(block, axis=1, dtype=dtype)
+    return block
+
+
+class RecordWriter(object):
+    """Write a record file from chunks of samples appended in time order.
+
+    Parameters
+    ----------
+    path: str
+        Record file, overwritten if it exists.
+
+    n_channels: int
+        Number of channels.
+
+    fs: float
+        Sampling frequency.
+
+    dtype: data-type, optional
+        Type of the stored samples. Defaults to float64.
+
+    chunk_size: int, optional
+        Number of samples per chunk. Smaller chunks make short reads cheaper and compress less. Defaults to 65536.
+
+    codec: str, optional
+        'zlib', 'zstd' (requires the zstandard package), 'lzma' or 'none'. Defaults to 'zlib'.
+
+    level: int, optional
+        Compression level of the codec. Defaults to a fast level.
+
+    filters: tuple, optional
+        Filters applied before compression, among FILTERS. Defaults to ('delta', 'shuffle') for integers
+        and ('shuffle',) for floats. 'delta' is only exact, and so only allowed, for integers.
+
+    channels: list, optional
+        Name of each channel. Defaults to '0', '1', ...
+
+    attrs: dict, optional
+        JSON-serializable metadata stored with the record, such as units or the subject.
+
+    Examples
+    --------
+    >>> with RecordWriter('ecg.rec', n_channels=2, fs=500, dtype='int16') as writer:
+    ...     for block in acquisition:
+    ...         writer.append(block)
+    """
+
+    def __init__(
+            self,
+            path: str,
+            n_channels: int,
+            fs: float,
+            dtype: any = 'float64',
+            chunk_size: int = 65536,
+            codec: str = 'zlib',
+            level: int = None,
+            filters: tuple = None,
+            channels: list = None,
+            attrs: dict = None
+    ):
+        self.dtype = np.dtype(dtype)
+        if filters is None:
+            filters = FILTERS if self.dtype.kind in 'iu' else ('shuffle',)
+        assert codec in CODECS, f"codec must be one of {tuple(CODECS)}."
+        assert set(filters) <= set(FILTERS), f"filters must be among {FILTERS}."
+        assert 'delta' not in filters or self.dtype.kind in 'iu', "the delta filter requires an integer dtype."
+        channels = [str(c) for c in range(n_channels)] if channels is None else [str(c) for c in channels]
+        assert len(channels) == n_channels, "channels must have one name per channel."
+
+        self.path = os.fspath(path)
+        self.n_channels = n_channels
+        self.chunk_size = chunk_size
+        self.codec = codec
+        self.level = level
+        self.filters = tuple(filters)
+        self._meta = {'version': 1, 'fs': float(fs), 'dtype': self.dtype.str, 'n_channels': n_channels,
+                      'chunk_size': chunk_size, 'codec': codec, 'filters': list(self.filters),
+                      'channels': channels, 'attrs': {} if attrs is None else attrs}
+        self._chunks = []
+        self._pending = []
+        self._n_pending = 0
+        self.n_samples = 0
+        self._file = open(self.path, 'wb')
+        self._file.write(MAGIC)
+
+    def _write_chunk(self, block: np.ndarray):
+        data = _encode(block, self.filters, self.codec, self.level)
+        self._chunks.append([self._file.tell(), len(data)])
+        self._file.write(data)
+
+    def append(self, x: any):
+        """Append samples, of shape (samples,) for one channel or (channels, samples)."""
+        x = np.asarray(x, dtype=self.dtype)
+        x = x.reshape(1, -1) if x.ndim == 1 else x
+        assert x.ndim == 2 and x.shape[0] == self.n_channels, "x must be of shape (channels, samples)."
+        self._pending.append(x)
+        self._n_pending += x.shape[1]
+        self.n_samples += x.shape[1]
+        if self._n_pending >= self.chunk_size:
+            pending = np.concatenate(self._pending, axis=1)
+            n_full = pending.shape[1] // self.chunk_size * self.chunk_size
+            for start in range(0, n_full, self.chunk_size):
+                self._write_chunk(pending[:, start:start + self.chunk_size])
+            self._pending = [pending[:, n_full:]]
+            self._n_pending = pending.shape[1] - n_full
+        return self
+
+    def close(self):
+        """Write the last chunk and the index. The file is complete only once closed."""
+        if self._file.closed:
+            return
+        if self._n_pending > 0:
+            self._write_chunk(np.concatenate(self._pending, axis=1))
+        self._pending = []
+        self._n_pending = 0
+        self._meta['n_samples'] = self.n_samples
+        self._meta['chunks'] = self._chunks
+        index = json.dumps(self._meta).encode()
+        self._file.write(index)
+        self._file.write(_SIZE.pack(len(index)))
+        self._file.write(MAGIC)
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def write_record(path: str, x: any, fs: float, **kwargs) -> str:
+    """Write a signal of shape (samples,) or (channels, samples) to a record file.
+
+    Parameters
+    ----------
+    path: str
+        Record file, overwritten if it exists.
+
+    x: array_like
+        Signal. Its dtype is kept unless dtype is given.
+
+    fs: float
+        Sampling frequency.
+
+    kwargs: properties, optional
+        dtype, chunk_size, codec, level, filters, channels and attrs, as RecordWriter.
+
+    Returns
+    -------
+    path: str
+        The record file.
+    """
+    x = np.asarray(x)
+    x = x.reshape(1, -1) if x.ndim == 1 else x
+    kwargs.setdefault('dtype', x.dtype)
+    with RecordWriter(path, x.shape[0], fs, **kwargs) as writer:
+        writer.append(x)
+    return writer.path
+
+
+class Record(object):
+    """Read-only access to a record file.
+
+    Parameters
+    ----------
+    path: str
+        Record file written by RecordWriter or write_record.
+
+    max_cached_chunks: int, optional
+        Number of decompressed chunks kept in memory, so that overlapping and consecutive reads
+        do not decompress them again. Defaults to 8.
+
+    Attributes
+    ----------
+    fs: float
+        Sampling frequency.
+
+    n_channels, n_samples: int
+        Shape of the signal.
+
+    channels: list
+        Name of each channel.
+
+    attrs: dict
+        Metadata stored with the record.
+
+    Examples
+    --------
+    >>> record = Record('ecg.rec')
+    >>> x = record.window(3600, 3660)  # one minute, one hour in, of shape (channels, samples)
+    >>> spg = signal.stft(record.window(0, 60, channels=0))
+    """
+
+    def __init__(self, path: str, max_cached_chunks: int = 8):
+        self.path = os.fspath(path)
+        with open(self.path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        tail = len(MAGIC) + _SIZE.size
+        assert self._map[0:len(MAGIC)] == MAGIC and self._map[-len(MAGIC):] == MAGIC, \
+            "not a complete record file."
+        size = _SIZE.unpack(self._map[-tail:-len(MAGIC)])[0]
+        meta = json.loads(self._map[-tail - size:-tail].decode())
+        self.fs = meta['fs']
+        self.dtype = np.dtype(meta['dtype'])
+        self.n_channels = meta['n_channels']
+        self.n_samples = meta['n_samples']
+        self.chunk_size = meta['chunk_size']
+        self.codec = meta['codec']
+        self.filters = tuple(meta['filters'])
+        self.channels = meta['channels']
+        self.attrs = meta['attrs']
+        self._chunks = meta['chunks']
+        self.max_cached_chunks = max_cached_chunks
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def shape(self) -> tuple:
+        return self.n_channels, self.n_samples
+
+    @property
+    def duration(self) -> float:
+        """Length of the recording in seconds."""
+        return self.n_samples / self.fs
+
+    def _chunk(self, i: int) -> np.ndarray:
+        with self._lock:
+            if i in self._cache:
+                self._cache.move_to_end(i)
+                return self._cache[i]
+        offset, size = self._chunks[i]
+        n = min(self.chunk_size, self.n_samples - i * self.chunk_size)
+        block = _decode(self._map[offset:offset + size], (self.n_channels, n), self.dtype, self.filters, self.codec)
+        block.flags.writeable = False
+        with self._lock:
+            if self.max_cached_chunks > 0:
+                self._cache[i] = block
+                while len(self._cache) > self.max_cached_chunks:
+                    self._cache.popitem(last=False)
+        return block
+
+    def _channel_index(self, channels: any):
+        if channels is None:
+            return slice(None)
+        if isinstance(channels, (str, int, np.integer)):
+            return self._channel_index([channels])[0]
+        return [self.channels.index(c) if isinstance(c, str) else int(c) for c in channels]
+
+    @instrument
+    def read(self, start: int = 0, stop: int = None, channels: any = None) -> np.ndarray:
+        """Read the samples [start, stop), decompressing only the chunks they overlap.
+
+        Parameters
+        ----------
+        start, stop: int, optional
+            Sample range. Default to the whole record.
+
+        channels: int, str or list, optional
+            Channel index or name, or a list of them. Defaults to all channels.
+
+        Returns
+        -------
+        x: ndarray
+            Samples of shape (channels, samples), or (samples,) for a single channel.
+        """
+        stop = self.n_samples if stop is None else min(stop, self.n_samples)
+        assert 0 <= start <= stop, "start must be in [0, stop]."
+        index = self._channel_index(channels)
+        first, last = start // self.chunk_size, -(-stop // self.chunk_size)
+        if last - first == 1:
+            offset = first * self.chunk_size
+            return np.array(self._chunk(first)[index, start - offset:stop - offset])
+        blocks = [self._chunk(i)[index] for i in range(first, last)]
+        x = np.concatenate(blocks, axis=-1) if blocks else np.empty((self.n_channels, 0), self.dtype)[index]
+        offset = first * self.chunk_size
+        return x[..., start - offset:stop - offset]
+
+    def window(self, t_start: float = 0, t_stop: float = None, channels: any = None) -> np.ndarray:
+        """Read the samples between t_start and t_stop seconds, as read."""
+        stop = None if t_stop is None else int(round(t_stop * self.fs))
+        return self.read(int(round(t_start * self.fs)), stop, channels)
+
+    def n_segments(self, length: float, hop: float = None) -> int:
+        """Number of segments of length seconds, shifted by hop seconds (defaults to length)."""
+        size, step = int(length * self.fs), int((length if hop is None else hop) * self.fs)
+        return 0 if self.n_samples < size else (self.n_samples - size) // step + 1
+
+    def segment(self, i: int, length: float, hop: float = None, channels: any = None) -> np.ndarray:
+        """Read the i-th segment of length seconds, shifted by hop seconds (defaults to length).
+
+        The segments are those of machine_learning.preprocessing.seqseg, read one at a time,
+        for random access such as shuffled training.
+        """
+        assert 0 <= i < self.n_segments(length, hop), "segment index out of range."
+        size, step = int(length * self.fs), int((length if hop is None else hop) * self.fs)
+        return self.read(i * step, i * step + size, channels)
+
+    def close(self):
+        self._cache.clear()
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
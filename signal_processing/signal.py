@@ -1,38 +1,77 @@
 import numpy as np
 
+from manage.profiling import instrument
+from signal_processing import fft
 
-def diff(x: any):
+_STFT_BLOCK = 8192  # number of frames transformed per FFT call
+_SSA_BLOCK = 1024  # number of SSA steps decomposed per batched SVD call
+
+
+@instrument
+def diff(x: any, axis: int = -1):
     """Differentiate an array by numeric difference.
 
     Parameters
     ----------
     x: array_like
-        Input array.
+        Input array, such as (channels, samples).
+
+    axis: int, optional
+        Axis along which the difference is taken. Defaults to -1.
 
     Returns
     -------
     dif : array_like
-        Differentiated array.
+        Differentiated array, one sample shorter along axis.
     """
-    dif = [x[i+1]-x[i] for i in range(len(x)-1)]
-    return np.array(dif)
+    return np.diff(np.asarray(x), axis=axis)
+
+
+def _frames(x: np.ndarray, frame_len: int, shift: int, n_frames: int) -> np.ndarray:
+    """Return a read-only strided view of shape (..., n_frames, frame_len) over the last axis of x."""
+    shape = x.shape[:-1] + (n_frames, frame_len)
+    strides = x.strides[:-1] + (shift * x.strides[-1], x.strides[-1])
+    return np.lib.stride_tricks.as_strided(x, shape=shape, strides=strides, writeable=False)
+
+
+def _spectrogram(frames: np.ndarray, nfft: int) -> np.ndarray:
+    """Return the hamming-windowed amplitude spectra of frames (..., n_frames, winsize) as (..., nfft/2+1, n_frames)."""
+    n_frames = frames.shape[-2]
+    window = fft.window(frames.shape[-1])
+    backend = fft.get_backend()
+    spg = np.empty(frames.shape[:-2] + (int(nfft/2+1), n_frames))
 
+    # Frames are transformed in blocks so that the complex FFT buffer stays bounded on long recordings.
+    for j in range(0, n_frames, _STFT_BLOCK):
+        block = frames[..., j:j+_STFT_BLOCK, :]
+        amp = backend.rfft(block * window, nfft, axis=-1, overwrite_x=True,
+                           transient=block.shape[-2] < _STFT_BLOCK)
+        spg[..., j:j+_STFT_BLOCK] = np.swapaxes(np.abs(amp[..., 0:int(nfft/2+1)]), -1, -2)
 
+    return spg
+
+
+@instrument
 def stft(
         x: any,
         winsize: float = 16,
         overlap: float = 0.92,
-        nfft: int = 128
+        nfft: int = 128,
+        axis: int = -1
 ):
     """Calculate a spectrogram with short-time Fourier transform (STFT).
 
     Spectrograms can be used as a way of visualizing
     the change of a non-stationary signal’s, such as ECG, frequency content over time.
 
+    All frames are taken as a strided view of the input and transformed together,
+    so the cost is dominated by a single real FFT over the frame matrix,
+    computed by the backend of signal_processing.fft.
+
     Parameters
     ----------
     x: array_like
-        Input 1-D array.
+        Input 1-D array, or N-D array such as (channels, samples) to transform all channels at once.
 
     winsize: float, optional
         Number of samples of the analysis window size.
@@ -47,41 +86,72 @@ def stft(
         If n is smaller than the length of the input, the input is cropped.
         Defaults to 128.
 
+    axis: int, optional
+        Time axis of x. Defaults to -1.
+
     Returns
     -------
     spg : array_like
-        Calculated spectrogram.
+        Calculated spectrogram of shape (nfft/2+1, n_frames) for 1-D input. For N-D input,
+        the other axes of x come first, such as (channels, nfft/2+1, n_frames).
 
     See Also
     --------
-    numpy.fft.fft : Compute the one-dimensional discrete Fourier Transform.
+    numpy.fft.rfft : Compute the one-dimensional discrete Fourier Transform for real input.
+    signal_processing.fft.set_backend : Choose the FFT implementation.
     scipy.signal.spectrogram : Compute a spectrogram with consecutive Fourier transforms.
     """
-    assert winsize < len(x)
+    x = np.moveaxis(np.asarray(x, dtype=float), axis, -1)
+    assert winsize < x.shape[-1]
 
     overlaps = int(winsize*overlap)
-    spg = np.zeros((int(nfft/2+1),
-                    int((len(x)-overlaps)/(winsize-overlaps))))
+    n_frames = int((x.shape[-1]-overlaps)/(winsize-overlaps))
     shift = int(winsize-overlaps)
 
-    for j in range(len(spg[0, :])):
-        frame = x[shift*j:shift*j+int(winsize)]
-        frame = np.hamming(int(winsize)) * frame
-
-        amp = np.fft.fft(frame, nfft)
-        amp = amp[0:int(len(amp)/2+1)]
-        spg[:, j] = np.abs(amp)
+    return _spectrogram(_frames(x, int(winsize), shift, n_frames), nfft)
 
-    return spg
 
+def _subspace(x: np.ndarray, r: int, q: np.ndarray = None, n_iter: int = 1, oversample: int = 4):
+    """Track the top-r left singular subspace of x.
 
-def ssa(x, window_size: int = 50, do_normalize: bool = True):
+    q is an orthonormal basis of width r+oversample carried between calls. If it is None,
+    it is initialized from a thin SVD, otherwise refined by n_iter orthogonal (power) iterations.
+    Returns the updated q and the top-r basis extracted from it by Rayleigh-Ritz projection.
+    """
+    if q is None:
+        q = np.linalg.svd(x, full_matrices=False)[0][:, 0:min(r + oversample, x.shape[1])]
+    else:
+        for _ in range(n_iter):
+            q, _ = np.linalg.qr(x.dot(x.T.dot(q)))
+    u = np.linalg.svd(q.T.dot(x), full_matrices=False)[0][:, 0:r]
+    return q, q.dot(u)
+
+
+@instrument
+def ssa(
+        x,
+        window_size: int = 50,
+        do_normalize: bool = True,
+        r: int = 2,
+        lag: int = None,
+        method: str = 'svd',
+        n_iter: int = 1,
+        oversample: int = 4,
+        axis: int = -1
+):
     """calculates abnormality by singular spectral analysis (SSA).
 
+    The trajectory (Hankel) matrices are zero-copy strided views of x.
+    With method='svd' every step uses an exact thin SVD, computed for blocks of steps at once.
+    With method='power' the top-r subspaces are tracked by orthogonal iteration
+    warm-started from the previous step, so each step costs O(window_size * window_size/2 * r)
+    regardless of the signal length. This is an approximation whose accuracy depends on
+    the gap between the r-th and following singular values.
+
     Parameters
     ----------
     x:
-        time series data.
+        time series data, 1-D or N-D such as (channels, samples).
 
     window_size: int, optional
         window (test) size of test matrix. Default to 50.
@@ -89,37 +159,70 @@ def ssa(x, window_size: int = 50, do_normalize: bool = True):
     do_normalize: bool, optional
         If True, calculated abnormality is normalized by its maximum value.
 
+    r: int, optional
+        Dimension of the signal subspaces compared. Default to 2.
+
+    lag: int, optional
+        Shift width between the history and test matrices. Default to window_size // 4.
+
+    method: str, optional
+        'svd' (exact) or 'power' (incremental orthogonal iteration). Default to 'svd'.
+
+    n_iter: int, optional
+        Number of orthogonal iterations per step when method='power'. Default to 1.
+
+    oversample: int, optional
+        Number of extra basis vectors tracked when method='power'. Default to 4.
+
+    axis: int, optional
+        Time axis of x. Default to -1.
+
     Returns
     -------
     score: ndarray
-        Abnormality calculated by SSA.
+        Abnormality calculated by SSA, of the shape of x. Each channel is normalized separately.
     """
-
-    def __embed(lst, dim):
-        emb = np.empty((0, dim), float)
-        for i in range(lst.size - dim + 1):
-            tmp = np.array(lst[i:i + dim]).reshape((1, -1))
-            emb = np.append(emb, tmp, axis=0)
-        return emb
+    assert method in ('svd', 'power'), "method must be 'svd' or 'power'."
+    x = np.moveaxis(np.asarray(x, dtype=float), axis, -1)
+    shape = x.shape
+    x = x.reshape(-1, shape[-1])
+    n = x.shape[-1]
 
     k = window_size // 2
-    lag = k // 2  # lag, corresponds shift width
-
-    score = np.zeros_like(x)
-    for t in range(window_size + k, len(x) - lag + 1 + 1):
-        t_start = t - window_size - k + 1
-        t_end = t - 1
-        x1 = __embed(x[t_start:t_end], window_size).T[::-1, :]
-        x2 = __embed(x[(t_start + lag):(t_end + lag)], window_size).T[::-1, :]  # Test mtx.
-
-        u1, s1, v1 = np.linalg.svd(x1, full_matrices=True)
-        u1 = u1[:, 0:2]
-        u2, s2, v2 = np.linalg.svd(x2, full_matrices=True)
-        u2 = u2[:, 0:2]
-        u, s, v = np.linalg.svd(u1.T.dot(u2), full_matrices=True)
-
-        score[t] = 1 - np.square(s[0])
+    if lag is None:
+        lag = k // 2  # lag, corresponds shift width
+
+    t_first = window_size + k
+    t_last = min(n - lag + 1, n - 1)
+    steps = np.arange(t_first, t_last + 1)
+    t0 = steps - window_size - k + 1
+
+    score = np.zeros(x.shape)
+    if len(steps) == 0:  # x is too short for a single pair of history and test matrices
+        return np.moveaxis(score.reshape(shape), -1, axis)
+
+    # hankel[c, i] = x[c, i:i+window_size]; the history matrix at step t is hankel[c, t0:t0+k-1].T
+    hankel = _frames(x, window_size, 1, n - window_size + 1)
+    if method == 'svd':
+        n_rows = hankel.shape[1] - k + 2
+        trajectory = _frames(np.swapaxes(hankel, -2, -1), k - 1, 1, n_rows)  # (channels, window_size, n_rows, k-1)
+        trajectory = np.swapaxes(trajectory, 1, 2)  # trajectory[c, t0] == hankel[c, t0:t0+k-1].T
+        block = max(_SSA_BLOCK // len(x), 1)  # all channels of a block of steps are decomposed together
+        for j in range(0, len(steps), block):
+            s0 = t0[j:j+block]
+            u1 = np.linalg.svd(trajectory[:, s0], full_matrices=False)[0][..., 0:r]
+            u2 = np.linalg.svd(trajectory[:, s0 + lag], full_matrices=False)[0][..., 0:r]
+            s = np.linalg.svd(np.matmul(np.swapaxes(u1, -1, -2), u2), compute_uv=False)
+            score[:, steps[j:j+block]] = 1 - np.square(s[..., 0])
+    else:
+        for c in range(len(x)):
+            q1 = q2 = None
+            for t, s0 in zip(steps, t0):
+                q1, u1 = _subspace(hankel[c, s0:s0+k-1].T, r, q1, n_iter, oversample)
+                q2, u2 = _subspace(hankel[c, s0+lag:s0+lag+k-1].T, r, q2, n_iter, oversample)
+                s = np.linalg.svd(u1.T.dot(u2), compute_uv=False)
+                score[c, t] = 1 - np.square(s[0])
 
     if do_normalize:
-        score /= np.max(score)
-    return score
+        score /= np.max(score, axis=-1, keepdims=True)
+    return np.moveaxis(score.reshape(shape), -1, axis)
@@ -0,0 +1,133 @@
+import numpy as np
+
+from manage.profiling import instrument
+from signal_processing import signal, feature_extraction
+
+
+class StreamingFeatureExtractor(object):
+    """Compute the STFT and framewise features of a signal delivered in chunks.
+
+    Samples can be fed in chunks of any size. The samples that overlap the next frame are kept
+    between calls, so the columns emitted by successive calls of update, followed by flush,
+    are identical to the output of the batch functions on the whole signal.
+    The work done by one call is proportional to the number of samples fed.
+
+    Parameters
+    ----------
+    winsize: int, optional
+        Number of samples of the analysis window size. Must be an integer. Defaults to 16.
+
+    overlap: float, optional
+        Percentage of overlapping samples to window length. Defaults to 0.92 (92%).
+
+    nfft: int, optional
+        Length of the transformed axis of the STFT. Defaults to 128.
+
+    fmin: int, optional
+        The smallest frequency component of a signal. Defaults to 0.
+
+    fmax: int, optional
+        The maximum frequency component of a signal. Defaults to 64.
+
+    See Also
+    --------
+    signal_processing.signal.stft : Calculate a spectrogram with short-time Fourier transform.
+
+    Examples
+    --------
+    >>> extractor = StreamingFeatureExtractor()
+    >>> for chunk in np.array_split(np.random.normal(0, 1, 640), 7):
+    ...     out = extractor.update(chunk)
+    >>> last = extractor.flush()
+    """
+
+    def __init__(self, winsize: int = 16, overlap: float = 0.92, nfft: int = 128, fmin: int = 0, fmax: int = 64):
+        assert int(winsize) == winsize, "winsize must be an integer number of samples."
+        self.winsize = int(winsize)
+        self.overlap = overlap
+        self.nfft = nfft
+        self.fmin = fmin
+        self.fmax = fmax
+        self.reset()
+
+    def reset(self):
+        """Discard the buffered samples and the running state."""
+        self.n_samples = 0
+        self.n_frames = 0
+        self.grad_change = 0
+        self._buffer = np.zeros(0)
+        self._last_sample = np.zeros(0)
+        self._last_column = None
+
+    def _frames_until(self, n_samples: int) -> int:
+        overlaps = int(self.winsize * self.overlap)
+        if n_samples < self.winsize:
+            return 0
+        return int((n_samples - overlaps) / (self.winsize - overlaps))
+
+    def _empty(self) -> dict:
+        return {'spg': np.zeros((int(self.nfft/2+1), 0)),
+                'pse': np.zeros(0),
+                'pcent': np.zeros(0),
+                'pflux': np.zeros(0),
+                'zero_crossing': np.zeros(0)}
+
+    @instrument
+    def update(self, chunk: any) -> dict:
+        """Feed new samples and return the features of the frames they complete.
+
+        Parameters
+        ----------
+        chunk: array_like
+            New 1-D samples of the signal.
+
+        Returns
+        -------
+        out: dict
+            'spg' holds the new STFT columns, 'pse', 'pcent' and 'zero_crossing' one value per new frame.
+            'pflux' needs the following frame, so it lags by one frame; the last value is emitted by flush.
+        """
+        chunk = np.asarray(chunk, dtype=float).ravel()
+        if len(chunk) > 0:
+            self.grad_change += feature_extraction.grad_change(np.concatenate([self._last_sample, chunk]))
+            self._last_sample = chunk[-1:]
+        self._buffer = np.concatenate([self._buffer, chunk])
+        self.n_samples += len(chunk)
+
+        n_new = self._frames_until(self.n_samples) - self.n_frames
+        if n_new <= 0:
+            return self._empty()
+
+        shift = self.winsize - int(self.winsize * self.overlap)
+        segment = self._buffer[0:shift * (n_new - 1) + self.winsize]
+        spg = signal._spectrogram(signal._frames(segment, self.winsize, shift, n_new), self.nfft)
+
+        if self._last_column is None:
+            flux = feature_extraction.pflux(spg)[0:-1]
+        else:
+            flux = feature_extraction.pflux(np.hstack([self._last_column, spg]))[0:-1]
+
+        out = {'spg': spg,
+               'pse': feature_extraction.pse(spg, self.fmin, self.fmax),
+               'pcent': feature_extraction.pcent(spg, self.fmin, self.fmax),
+               'pflux': flux,
+               'zero_crossing': feature_extraction.zero_crossing(segment, self.winsize, self.overlap)}
+
+        self._last_column = spg[:, -1:]
+        self._buffer = self._buffer[shift * n_new:]
+        self.n_frames += n_new
+        return out
+
+    def flush(self) -> dict:
+        """Emit the pending value of the spectral flux at the end of the signal.
+
+        Returns
+        -------
+        out: dict
+            Same keys as update. Only 'pflux' holds a value, if any frame was emitted.
+        """
+        out = self._empty()
+        if self._last_column is not None:
+            out['pflux'] = np.zeros(1)
+            self._last_column = None
+        return out
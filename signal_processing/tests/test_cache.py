@@ -0,0 +1,65 @@
+import os
+import tempfile
+
+import numpy as np
+
+from manage import testing
+from signal_processing import signal, wavelet
+from signal_processing.cache import SpectralCache
+
+
+class Tests(object):
+    def test_stft_hit(self):
+        a = np.random.normal(0, 1, 640)
+        with tempfile.TemporaryDirectory() as d:
+            spg = SpectralCache(d).stft(a, nfft=64)
+            cached = SpectralCache(d).stft(a, nfft=64)
+            assert isinstance(cached, np.memmap)
+            assert np.array_equal(cached, spg)
+            assert np.array_equal(cached, signal.stft(a, nfft=64))
+
+    def test_key(self):
+        a = np.random.normal(0, 1, 640)
+        assert SpectralCache.key('stft', a, nfft=64) == SpectralCache.key('stft', a.copy(), nfft=64)
+        assert SpectralCache.key('stft', a, nfft=64) != SpectralCache.key('stft', a, nfft=128)
+
+    def test_params_normalized(self):
+        a = np.random.normal(0, 1, 640)
+        with tempfile.TemporaryDirectory() as d:
+            cache = SpectralCache(d)
+            cache.stft(a, winsize=16, overlap=0.92, nfft=128)
+            cache.stft(a, winsize=16.0, overlap=0.92, nfft=np.int64(128))
+            assert len(cache.entries()) == 1
+
+    def test_mra(self):
+        a = np.random.normal(0, 1, 1024)
+        with tempfile.TemporaryDirectory() as d:
+            cache = SpectralCache(d, max_memory_items=0)
+            cache.multi_resolution_analysis(a, level=4, omit_level=[0])
+            out, coefs = cache.multi_resolution_analysis(a, level=4, omit_level=[0])
+            assert np.allclose(out, wavelet.multi_resolution_analysis(a, level=4, omit_level=[0])[0])
+            assert len(coefs) == 5
+
+    def test_evict(self):
+        with tempfile.TemporaryDirectory() as d:
+            cache = SpectralCache(d, max_bytes=3 * 65 * 313 * 8)
+            for i in range(5):
+                cache.stft(np.random.normal(0, 1, 640))
+            assert len(cache.entries()) == 2
+
+    def test_evict_lru(self):
+        a, b, c = (np.random.normal(0, 1, 640) for _ in range(3))
+        with tempfile.TemporaryDirectory() as d:
+            cache = SpectralCache(d, max_bytes=2 * 65 * 313 * 8 + 1024)
+            cache.stft(a)
+            cache.stft(b)
+            for key, _, _ in cache.entries():
+                os.utime(cache._path(key), (0, 0))
+            cache.stft(a)  # hit in memory
+            cache.stft(c)
+            keys = [key for key, _, _ in cache.entries()]
+            assert SpectralCache.key('stft', a, winsize=16.0, overlap=0.92, nfft=128) in keys
+            assert SpectralCache.key('stft', b, winsize=16.0, overlap=0.92, nfft=128) not in keys
+
+
+testing.do_test(Tests)
@@ -0,0 +1,98 @@
+import subprocess
+import sys
+
+import numpy as np
+
+from manage import testing
+from signal_processing import feature_extraction, signal
+
+
+def _zero_crossing_reference(a, winsize, overlap):
+    overlaps = int(winsize * overlap)
+    shift = int(winsize - overlaps)
+    expected = []
+    for i in range(int((len(a) - overlaps) / (winsize - overlaps))):
+        frame = a[shift * i:shift * i + int(winsize)]
+        next_frame = np.zeros_like(frame)
+        next_frame[1:-1] = frame[0:-2]
+        expected.append(1/(2*len(frame)) * np.sum(np.abs(np.sign(frame)-np.sign(next_frame))))
+    return expected
+
+
+class Tests(object):
+    def test_pse_white_noise(self):
+        spg = signal.stft(np.random.normal(0, 1, 640))
+        assert np.all(feature_extraction.pse(spg) > 0.5)
+
+    def test_batch(self):
+        spg = signal.stft(np.random.normal(0, 1, (3, 640)))
+        for feature in (feature_extraction.pse, feature_extraction.pcent, feature_extraction.pflux):
+            assert feature(spg).shape == (3, 313)
+            assert np.allclose(feature(spg)[2], feature(spg[2]))
+
+    def test_pflux(self):
+        spg = np.vstack([np.arange(5.), np.zeros(5)])
+        assert np.array_equal(feature_extraction.pflux(spg), [1, 1, 1, 1, 0])
+
+    def test_kernels(self):
+        feature_extraction.warmup()
+        assert feature_extraction.grad_change([0, 1, 0, 1, 0]) == 2
+        assert feature_extraction.grad_change(np.arange(5)[::-1]) == 4
+        a = np.random.normal(0, 1, 640).astype(np.float32)
+        a[np.abs(a) < 1e-3] = 0
+        assert np.allclose(feature_extraction.zero_crossing(a), _zero_crossing_reference(a, 16, 0.92))
+
+    def test_channels(self):
+        a = np.random.normal(0, 1, (2, 3, 640))
+        assert np.array_equal(feature_extraction.grad_change(a), [[feature_extraction.grad_change(c) for c in b]
+                                                                  for b in a])
+        zc = feature_extraction.zero_crossing(a)
+        assert zc.shape == (2, 3, 313) and np.array_equal(zc[1, 2], feature_extraction.zero_crossing(a[1, 2]))
+        assert np.array_equal(feature_extraction.zero_crossing(np.moveaxis(a, -1, 0), axis=0), zc)
+        spg = signal.stft(a[0])
+        for feature in (feature_extraction.pse, feature_extraction.pcent, feature_extraction.pflux):
+            assert np.allclose(feature(np.swapaxes(spg, -1, -2), axis=-1), feature(spg))
+
+    def test_zero_crossing_reference(self):
+        a = np.random.normal(0, 1, 700)
+        a[a > 2] = 0
+        for winsize, overlap in ((16, 0.92), (1, 0), (2, 0.5), (33, 0.3)):
+            assert np.array_equal(feature_extraction.zero_crossing(a, winsize, overlap),
+                                  _zero_crossing_reference(a, winsize, overlap))
+        a[350] = np.nan
+        zc = feature_extraction.zero_crossing(a)
+        assert np.isnan(zc[168:176]).all() and not np.isnan(zc[0:168]).any() and not np.isnan(zc[176:]).any()
+
+    def test_blocks(self):
+        a = np.random.normal(0, 1, (2, 3001))
+        a[1, 1234] = np.nan
+        winsizes = (2, 16, 33)
+        expected = (feature_extraction.zero_crossing_sweep(a, winsizes),
+                    feature_extraction.grad_change_sweep(a, winsizes))
+        block = feature_extraction._PREFIX_BLOCK
+        try:
+            feature_extraction._PREFIX_BLOCK = 100  # 50 samples per block
+            for rates, reference in zip((feature_extraction.zero_crossing_sweep(a, winsizes),
+                                         feature_extraction.grad_change_sweep(a, winsizes)), expected):
+                for r, e in zip(rates, reference):
+                    assert np.array_equal(r, e, equal_nan=True)
+        finally:
+            feature_extraction._PREFIX_BLOCK = block
+
+    def test_sweep(self):
+        a = np.random.normal(0, 1, (2, 2000))
+        winsizes = (8, 16, 64)
+        for w, zc, gc in zip(winsizes, feature_extraction.zero_crossing_sweep(a, winsizes),
+                             feature_extraction.grad_change_sweep(a, winsizes)):
+            assert np.array_equal(zc, feature_extraction.zero_crossing(a, w))
+            assert np.array_equal(gc, feature_extraction.grad_change_rate(a, w))
+        rate = feature_extraction.grad_change_rate(a[0])
+        assert rate.shape[-1] == signal.stft(a[0]).shape[-1]
+        assert rate[10] == feature_extraction.grad_change(a[0, 20:36]) / 15
+
+    def test_lazy_import(self):
+        code = 'import sys; from signal_processing import feature_extraction; assert "numba" not in sys.modules'
+        subprocess.run([sys.executable, '-c', code], check=True)
+
+
+testing.do_test(Tests)
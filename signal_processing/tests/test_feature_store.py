@@ -0,0 +1,48 @@
+import os
+import tempfile
+
+import numpy as np
+import pyarrow.compute as pc
+
+from manage import testing
+from signal_processing import feature_extraction, feature_store, signal
+
+
+class Tests(object):
+    def test_roundtrip(self):
+        x = np.random.normal(0, 1, (2, 2048))
+        spg = signal.stft(x)
+        features = {'pse': feature_extraction.pse(spg), 'pcent': feature_extraction.pcent(spg),
+                    'zero_crossing': feature_extraction.zero_crossing(x)}
+        with tempfile.TemporaryDirectory() as directory:
+            for fmt in ('parquet', 'arrow'):
+                root = os.path.join(directory, fmt)
+                with feature_store.FeatureWriter(root, ['pse', 'pcent', 'zero_crossing', 'ssa'], format=fmt,
+                                                 dtype='float64', batch_rows=1000) as writer:
+                    writer.append('001', features, fs=128, hop=2, channels=['Fz', 'Cz'])
+                    writer.append('002', {'ssa': np.arange(10.)})
+                store = feature_store.FeatureStore(root)
+                assert store.records() == ['001', '002'] and store.features == ['pse', 'pcent', 'zero_crossing', 'ssa']
+                record = store.record('001')
+                for name, values in features.items():
+                    assert np.array_equal(record[name], values)
+                assert np.isnan(record['ssa']).all()
+                assert np.array_equal(store.record('001', ['pse'], channels='Cz')['pse'], features['pse'][1:])
+                assert np.array_equal(store.record('002', ['ssa'])['ssa'], [np.arange(10.)])
+
+    def test_pushdown(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with feature_store.FeatureWriter(directory, ['pse'], columns={'subject': 'string'},
+                                             partition_by=('subject',), batch_rows=100) as writer:
+                for i in range(6):
+                    writer.append(f'r{i}', {'pse': np.full((1, 50), i)}, fs=10, t0=i, subject=f's{i % 2}')
+            assert sorted(os.listdir(directory)) == ['_schema.arrow', 'subject=s0', 'subject=s1']
+            store = feature_store.FeatureStore(directory)
+            table = store.read(['record_id', 'time', 'pse'], filter=pc.field('subject') == 's1', t_start=3, t_stop=4)
+            assert table.column_names == ['record_id', 'time', 'pse']
+            assert set(table.column('record_id').to_pylist()) == {'r1', 'r3'}
+            assert table.num_rows == 10 + 10
+            assert store.records(pc.field('subject') == 's0') == ['r0', 'r2', 'r4']
+
+
+testing.do_test(Tests)
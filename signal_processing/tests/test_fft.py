@@ -0,0 +1,47 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from manage import testing
+from signal_processing import fft, signal
+
+
+class Tests(object):
+    def test_backends(self):
+        a = np.random.normal(0, 1, (2, 4096))
+        fft.set_backend('numpy')
+        reference = signal.stft(a)
+        frames = np.random.normal(0, 1, (100, 16))
+        for name in fft.available():
+            backend = fft.set_backend(name, workers=2)
+            assert backend.name == name and fft.get_backend() is backend
+            assert np.allclose(backend.rfft(frames, 128), np.fft.rfft(frames, 128))
+            assert np.allclose(backend.rfft(frames.T, 128, axis=0), np.fft.rfft(frames.T, 128, axis=0))
+            assert np.allclose(signal.stft(a), reference)
+        fft.set_backend('numpy')
+
+    def test_threads(self):
+        if 'pyfftw' not in fft.available():
+            return
+        backend = fft.FFTWBackend(planner_effort='FFTW_ESTIMATE')
+        inputs = [np.random.normal(0, 1, (500, 16)) for _ in range(8)]
+        with ThreadPoolExecutor(4) as pool:
+            outputs = list(pool.map(lambda f: [backend.rfft(f, 128) for _ in range(20)], inputs))
+        for f, out in zip(inputs, outputs):
+            assert all(np.allclose(o, np.fft.rfft(f, 128)) for o in out)
+        backend.rfft(inputs[0][:7], 128, transient=True)
+        assert backend._local.plan.cache_info().currsize == 1  # plans of the main thread only
+
+    def test_window(self):
+        assert fft.window(16) is fft.window(16)
+        assert np.array_equal(fft.window(16), np.hamming(16))
+        assert not fft.window(16).flags.writeable
+
+    def test_select(self):
+        timings = fft.select_backend(n_frames=256, repeat=2)
+        assert set(timings) == set(fft.available())
+        assert fft.get_backend().name == min(timings, key=timings.get)
+        fft.set_backend('numpy')
+
+
+testing.do_test(Tests)
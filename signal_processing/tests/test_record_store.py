@@ -0,0 +1,67 @@
+import os
+import tempfile
+
+import numpy as np
+
+from machine_learning import preprocessing
+from manage import testing
+from signal_processing import record_store, signal
+
+
+class Tests(object):
+    def test_roundtrip(self):
+        ecg = np.cumsum(np.random.randint(-20, 20, (2, 10000)), axis=1).astype(np.int16)
+        eeg = np.random.normal(0, 1, (3, 10000))
+        with tempfile.TemporaryDirectory() as directory:
+            for x in (ecg, eeg):
+                for codec in ('zlib', 'lzma', 'none'):
+                    path = os.path.join(directory, f'{codec}.rec')
+                    record_store.write_record(path, x, fs=500, chunk_size=1000, codec=codec,
+                                              channels=[f'ch{i}' for i in range(len(x))], attrs={'unit': 'mV'})
+                    with record_store.Record(path) as record:
+                        assert record.shape == x.shape and record.dtype == x.dtype
+                        assert record.fs == 500 and record.duration == 20 and record.attrs == {'unit': 'mV'}
+                        assert np.array_equal(record.read(), x)
+            assert os.path.getsize(os.path.join(directory, 'zlib.rec')) < eeg.nbytes
+
+    def test_delta_compression(self):
+        ecg = (np.sin(np.arange(100000) / 50) * 1000).astype(np.int16)
+        with tempfile.TemporaryDirectory() as directory:
+            sizes = []
+            for filters in ((), ('shuffle',), ('delta', 'shuffle')):
+                path = os.path.join(directory, 'ecg.rec')
+                record_store.write_record(path, ecg, fs=500, filters=filters)
+                with record_store.Record(path) as record:
+                    assert np.array_equal(record.read(channels=0), ecg)
+                sizes.append(os.path.getsize(path))
+            assert sizes[2] < sizes[0]
+
+    def test_window(self):
+        x = np.random.normal(0, 1, (2, 9999))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'x.rec')
+            with record_store.RecordWriter(path, 2, fs=100, chunk_size=1000, channels=['a', 'b']) as writer:
+                for block in np.array_split(x, 7, axis=1):
+                    writer.append(block)
+            with record_store.Record(path, max_cached_chunks=2) as record:
+                for start, stop in ((0, 10), (995, 1005), (1000, 2000), (2500, 7777), (9990, 9999), (9999, 9999)):
+                    assert np.array_equal(record.read(start, stop), x[:, start:stop])
+                assert np.array_equal(record.read(10, 3000, channels='b'), x[1, 10:3000])
+                assert np.array_equal(record.window(12.5, 20, channels=['b', 0]), x[[1, 0], 1250:2000])
+                assert record.n_segments(10, 5) == 18
+                assert np.array_equal(record.segment(3, 10, 5), x[:, 1500:2500])
+                assert len(record._cache) == 2
+
+    def test_loader(self):
+        x = np.random.normal(0, 1, 6400)
+        with tempfile.TemporaryDirectory() as directory:
+            path = record_store.write_record(os.path.join(directory, 'x.rec'), x, fs=128, chunk_size=512)
+            assert np.array_equal(preprocessing.seqseg_record(path, 5, channels=0), preprocessing.seqseg(x, 5))
+            assert preprocessing.seqseg_record(path, 5).shape == (10, 640, 1)
+            assert np.array_equal(preprocessing.seqseg_record(path, 5, hop=2.5, channels=0, start=10, stop=40),
+                                  preprocessing.seqseg(x[1280:5120], 5, hop=2.5))
+            with record_store.Record(path) as record:
+                assert np.array_equal(signal.stft(record.window(0, 10)), signal.stft(x[np.newaxis, 0:1280]))
+
+
+testing.do_test(Tests)
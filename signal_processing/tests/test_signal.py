@@ -13,9 +13,60 @@ class Tests(object):
         a = np.random.normal(0, 1, 640)
         assert signal.stft(a).shape == (65, 313)
 
+    def test_stft_batch(self):
+        a = np.random.normal(0, 1, (3, 640))
+        spg = signal.stft(a)
+        assert spg.shape == (3, 65, 313)
+        assert np.allclose(spg[1], signal.stft(a[1]))
+
+    def test_stft_frame(self):
+        a = np.random.normal(0, 1, 640)
+        frame = np.hamming(16) * a[2*10:2*10+16]
+        assert np.allclose(signal.stft(a)[:, 10], np.abs(np.fft.fft(frame, 128))[0:65])
+
     def test_ssa(self):
         a = np.random.normal(0, 1, 640)
         assert len(a) == len(signal.ssa(a, 20))
 
+    def test_ssa_reference(self):
+        def embed(lst, dim):
+            emb = np.empty((0, dim), float)
+            for i in range(lst.size - dim + 1):
+                emb = np.append(emb, np.array(lst[i:i + dim]).reshape((1, -1)), axis=0)
+            return emb
+
+        a = np.random.normal(0, 1, 200)
+        window_size, k, lag = 20, 10, 5
+        reference = np.zeros_like(a)
+        for t in range(window_size + k, len(a) - lag + 1 + 1):
+            t_start, t_end = t - window_size - k + 1, t - 1
+            u1 = np.linalg.svd(embed(a[t_start:t_end], window_size).T[::-1, :])[0][:, 0:2]
+            u2 = np.linalg.svd(embed(a[t_start + lag:t_end + lag], window_size).T[::-1, :])[0][:, 0:2]
+            reference[t] = 1 - np.square(np.linalg.svd(u1.T.dot(u2))[1][0])
+        reference /= np.max(reference)
+        assert np.allclose(signal.ssa(a, window_size), reference)
+
+    def test_ssa_short(self):
+        for n in (10, 25):
+            assert np.array_equal(signal.ssa(np.random.normal(0, 1, n), 20), np.zeros(n))
+        assert signal.ssa(np.zeros((2, 10)), 20, method='power').shape == (2, 10)
+
+    def test_ssa_power(self):
+        a = np.sin(np.arange(640) / 10)
+        a[400:] += np.sin(np.arange(240) / 3)
+        exact = signal.ssa(a, 20, r=2, lag=5)
+        approx = signal.ssa(a, 20, r=2, lag=5, method='power', n_iter=2)
+        assert np.argmax(exact) == np.argmax(approx)
+
+    def test_channels(self):
+        a = np.random.normal(0, 1, (3, 640))
+        assert np.array_equal(signal.diff(a), np.stack([signal.diff(c) for c in a]))
+        assert np.array_equal(signal.diff(a.T, axis=0), signal.diff(a).T)
+        assert np.array_equal(signal.stft(a.T, axis=0), np.stack([signal.stft(c) for c in a]))
+        for method in ('svd', 'power'):
+            score = signal.ssa(a[:, 0:300], method=method)
+            assert np.allclose(score, np.stack([signal.ssa(c, method=method) for c in a[:, 0:300]]))
+            assert np.allclose(signal.ssa(a[:, 0:300].T, method=method, axis=0), score.T)
+
 
 testing.do_test(Tests)
@@ -0,0 +1,27 @@
+import numpy as np
+
+from manage import testing
+from signal_processing import signal, feature_extraction
+from signal_processing.streaming import StreamingFeatureExtractor
+
+
+class Tests(object):
+    def test_matches_batch(self):
+        a = np.random.normal(0, 1, 640)
+        extractor = StreamingFeatureExtractor()
+        outs = [extractor.update(chunk) for chunk in np.array_split(a, 9)] + [extractor.flush()]
+        spg = signal.stft(a)
+        assert np.array_equal(np.hstack([o['spg'] for o in outs]), spg)
+        assert np.array_equal(np.concatenate([o['pse'] for o in outs]), feature_extraction.pse(spg))
+        assert np.array_equal(np.concatenate([o['pflux'] for o in outs]), feature_extraction.pflux(spg))
+        assert np.array_equal(np.concatenate([o['zero_crossing'] for o in outs]), feature_extraction.zero_crossing(a))
+
+    def test_grad_change(self):
+        a = np.random.normal(0, 1, 100)
+        extractor = StreamingFeatureExtractor(winsize=16, overlap=0)
+        for chunk in np.array_split(a, 7):
+            extractor.update(chunk)
+        assert extractor.grad_change == feature_extraction.grad_change(a)
+
+
+testing.do_test(Tests)
@@ -0,0 +1,23 @@
+import numpy as np
+
+from manage import testing
+from signal_processing import wavelet
+
+
+class Tests(object):
+    def test_batch(self):
+        a = np.random.normal(0, 1, (3, 1024))
+        out, coefs = wavelet.multi_resolution_analysis(a, level=4)
+        assert out.shape == (3, 1024)
+        assert np.allclose(out[1], wavelet.multi_resolution_analysis(a[1], level=4)[0])
+
+    def test_band_reconstruct(self):
+        a = np.random.normal(0, 1, (3, 1000))
+        components, coefs = wavelet.mra_components(a, level=4)
+        assert components.shape == (5, 3, 1000)
+        for omit_level in (None, [0], [1, 4]):
+            expected = wavelet.multi_resolution_analysis(a, level=4, omit_level=omit_level)[0]
+            assert np.allclose(wavelet.band_reconstruct(components, omit_level), expected)
+
+
+testing.do_test(Tests)
@@ -1,20 +1,24 @@
 import numpy as np
 import pywt
 
+from manage.profiling import instrument
 
+
+@instrument
 def multi_resolution_analysis(
         x: any,
         wname: str = 'sym4',
         level: int = 7,
         omit_level: list = None,
-        mode: str = 'sym'
+        mode: str = 'sym',
+        axis: int = -1
 ):
     """multi-resolution analysis from raw signal with discrete wavelet analysis.
 
     Parameters
     ----------
     x: any
-        signal analyzed.
+        signal analyzed. N-D arrays, such as (records, samples), are transformed along axis.
 
     wname: str, optional
         specifies the name of mother wavelet. Default to sym4.
@@ -28,6 +32,9 @@ def multi_resolution_analysis(
     mode: str, optional
         signal extension mode.
 
+    axis: int, optional
+        Axis over which the signal is analyzed. Default to -1.
+
     Returns
     -------
     out: array_like
@@ -35,9 +42,89 @@ def multi_resolution_analysis(
 
     coefs: list
         Approximation and details coefficients.
+
+    See Also
+    --------
+    mra_components: per-level reconstructions to sweep omit_level without decomposing again.
     """
-    coefs = pywt.wavedec(data=x, wavelet=wname, level=level, mode=mode)
+    coefs = pywt.wavedec(data=x, wavelet=wname, level=level, mode=mode, axis=axis)
     if omit_level is not None:
         for lv in omit_level:
             coefs[lv] = np.zeros_like(coefs[lv])
-    return pywt.waverec(coeffs=coefs, wavelet=wname, mode=mode), coefs
+    return pywt.waverec(coeffs=coefs, wavelet=wname, mode=mode, axis=axis), coefs
+
+
+@instrument
+def mra_components(
+        x: any,
+        wname: str = 'sym4',
+        level: int = 7,
+        mode: str = 'sym',
+        axis: int = -1
+):
+    """Decompose a signal once and reconstruct each decomposition level separately.
+
+    The reconstruction is linear in the coefficients, so the signal reconstructed without
+    some levels is the sum of the components of the other levels (see band_reconstruct).
+
+    Parameters
+    ----------
+    x: any
+        signal analyzed. N-D arrays, such as (records, samples), are transformed along axis.
+
+    wname: str, optional
+        specifies the name of mother wavelet. Default to sym4.
+
+    level: int, optional
+        Specifies the decomposition level. Default to 7.
+
+    mode: str, optional
+        signal extension mode.
+
+    axis: int, optional
+        Axis over which the signal is analyzed. Default to -1.
+
+    Returns
+    -------
+    components: ndarray
+        Array of shape (level + 1, *reconstructed shape). components[i] is the signal
+        reconstructed from the i-th coefficients of wavedec alone (0 is the approximation).
+
+    coefs: list
+        Approximation and details coefficients.
+    """
+    coefs = pywt.wavedec(data=x, wavelet=wname, level=level, mode=mode, axis=axis)
+    zeros = [np.zeros_like(c) for c in coefs]
+    components = None
+    for lv in range(len(coefs)):
+        rec = pywt.waverec(coeffs=zeros[:lv] + [coefs[lv]] + zeros[lv + 1:], wavelet=wname, mode=mode, axis=axis)
+        if components is None:
+            components = np.empty((len(coefs),) + rec.shape, dtype=rec.dtype)
+        components[lv] = rec
+    return components, coefs
+
+
+@instrument
+def band_reconstruct(components: np.ndarray, omit_level: list = None):
+    """Reconstruct a signal without some decomposition levels from precomputed components.
+
+    Parameters
+    ----------
+    components: ndarray
+        Per-level reconstructions returned by mra_components.
+
+    omit_level: list, optional
+        Specifies a list of decomposition levels to ignore when reconstructing the signal.
+
+    Returns
+    -------
+    out: array_like
+        Reconstructed signal, equal to the output of multi_resolution_analysis with the same omit_level.
+    """
+    keep = np.ones(len(components), dtype=bool)
+    if omit_level is not None:
+        keep[list(omit_level)] = False
+    out = np.zeros(components.shape[1:], dtype=components.dtype)
+    for lv in np.flatnonzero(keep):
+        out += components[lv]
+    return out